@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+
+from cliffy.bencher import Baseline
+
+DEFAULT_BASELINE_PATH = Path(__file__).parent / "startup_baseline.json"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("startup", "startup benchmarks")
+    group.addoption(
+        "--startup-baseline",
+        default=str(DEFAULT_BASELINE_PATH),
+        help="JSON file with the baseline startup times to compare against. Created if missing.",
+    )
+    group.addoption(
+        "--update-baseline", action="store_true", help="Record this run's startup times as the new baseline."
+    )
+    group.addoption(
+        "--max-regression",
+        type=float,
+        default=25.0,
+        help="Fail when a startup time exceeds its baseline by more than this percentage.",
+    )
+    group.addoption("--startup-runs", type=int, default=5, help="Warm runs per case, the best one is kept.")
+
+
+class StartupBaseline(Baseline):
+    """Cold and warm startup times of earlier runs, by case"""
+
+    __slots__ = ()
+    entries_key = "cases"
+
+    def check(self, case: str, result: dict) -> None:
+        """Records a case's startup times and fails if they regressed past the baseline"""
+        regressions = [
+            f"{stat.removesuffix('_ms')} start {ms:.0f}ms vs baseline {baseline_ms:.0f}ms"
+            for stat, ms, baseline_ms in self.compare(case, result, ("cold_ms", "warm_ms"))
+        ]
+        slowest_imports = "\n".join(f"  {name}: {ms:.1f}ms" for name, ms in result["imports"].items())
+        assert not regressions, (
+            f"{case} startup regressed more than {self.max_regression:g}%: {', '.join(regressions)}\n"
+            f"slowest imports:\n{slowest_imports}"
+        )
+
+
+@pytest.fixture(scope="session")
+def startup_baseline(request):
+    baseline = StartupBaseline(
+        request.config.getoption("--startup-baseline"),
+        update=request.config.getoption("--update-baseline"),
+        max_regression=request.config.getoption("--max-regression"),
+    )
+    yield baseline
+    if baseline.needs_saving():
+        baseline.save()
+
+
+@pytest.fixture(scope="session")
+def startup_runs(request):
+    return request.config.getoption("--startup-runs")
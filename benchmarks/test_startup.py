@@ -0,0 +1,121 @@
+"""Startup benchmarks for `cli` and loaded CLIs.
+
+Run with `make bench`. Each case is timed cold, with no cached bytecode, and warm,
+as the best of `--startup-runs` runs. Times are compared against the JSON baseline,
+which is created on the first run and rewritten with `--update-baseline`.
+"""
+
+import os
+import re
+import subprocess
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from cliffy.helper import PYTHON_BIN, compare_versions, get_installed_package_versions, parse_requirement
+from cliffy.homer import has_metadata
+from cliffy.loader import Loader
+from cliffy.transformer import Transformer
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+CLI_PATH = os.path.join(PYTHON_BIN, "cli")
+# loaded example CLIs, one per backend
+LOADED_CLIS = {"typer": ("hello.yaml", "hello"), "click": ("click_hello.yaml", "clickhello")}
+IMPORT_TIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+SLOWEST_IMPORTS = 10
+
+
+def get_slowest_imports(importtime_output: str) -> dict[str, float]:
+    """Gets the slowest top-level imports from `-X importtime` output, in ms"""
+    imports = {}
+    for line in importtime_output.splitlines():
+        # top-level imports aren't indented
+        if match := IMPORT_TIME_RE.match(line):
+            imports[match.group(2)] = int(match.group(1)) / 1000
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_IMPORTS]
+    return {name: round(ms, 1) for name, ms in slowest}
+
+
+def get_missing_requires(manifest_path: Path) -> list[str]:
+    """Gets a manifest's requirements that aren't installed, or are installed at another version"""
+    with open(manifest_path) as manifest_io:
+        requires = Transformer(manifest_io, validate_requires=False).manifest.requires
+    installed_package_versions = get_installed_package_versions()
+    missing = []
+    for dep in requires:
+        dep_spec = parse_requirement(dep)
+        installed_version = installed_package_versions.get(dep_spec.name.lower())
+        if not installed_version or (
+            dep_spec.version and not compare_versions(installed_version, dep_spec.version, dep_spec.operator)
+        ):
+            missing.append(dep)
+    return missing
+
+
+def measure_startup(command: list[str], runs: int) -> dict:
+    """Times a command cold, with empty bytecode and cliffy caches, then warm as the best of `runs` runs.
+    The import time breakdown comes from a separate warm run, since profiling imports slows them down.
+    """
+    with TemporaryDirectory() as cache_dir:
+        env = {
+            **os.environ,
+            "CLIFFY_NO_DAEMON": "1",
+            "CLIFFY_CACHE_DIR": cache_dir,
+            "PYTHONPYCACHEPREFIX": os.path.join(cache_dir, "pycache"),
+        }
+        # warm runs reuse the bytecode written by the cold run
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            result = subprocess.run(command, env=env, capture_output=True, text=True)
+            timings.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                pytest.fail(f"{' '.join(command)} exited with {result.returncode}: {result.stderr or result.stdout}")
+
+        profiled = subprocess.run(command, env={**env, "PYTHONPROFILEIMPORTTIME": "1"}, capture_output=True, text=True)
+
+    return {
+        "cold_ms": round(timings[0] * 1000, 1),
+        "warm_ms": round(min(timings[1:]) * 1000, 1),
+        "imports": get_slowest_imports(profiled.stderr),
+    }
+
+
+@pytest.fixture(scope="module")
+def loaded_clis():
+    """Loads the example CLIs that aren't loaded yet and removes them afterwards. CLIs
+    the user already loaded are left alone and their cases skipped."""
+    env = {**os.environ, "CLIFFY_NO_DAEMON": "1"}
+    cli_names = []
+    for manifest, cli_name in LOADED_CLIS.values():
+        if not has_metadata(cli_name):
+            subprocess.run([CLI_PATH, "load", str(EXAMPLES_DIR / manifest)], env=env, check=True, capture_output=True)
+            cli_names.append(cli_name)
+    yield cli_names
+    if cli_names:
+        subprocess.run([CLI_PATH, "remove", *cli_names], env=env, capture_output=True)
+
+
+@pytest.mark.parametrize("args", [["--help"], ["ls"]], ids=["help", "ls"])
+def test_cli_startup(args, startup_baseline, startup_runs):
+    startup_baseline.check(f"cli {' '.join(args)}", measure_startup([CLI_PATH, *args], startup_runs))
+
+
+@pytest.mark.parametrize("manifest", sorted(path.name for path in EXAMPLES_DIR.glob("*.yaml")))
+def test_cli_run_startup(manifest, startup_baseline, startup_runs):
+    if missing_requires := get_missing_requires(EXAMPLES_DIR / manifest):
+        pytest.skip(f"{manifest} requires {', '.join(missing_requires)}")
+    command = [CLI_PATH, "run", str(EXAMPLES_DIR / manifest), "--", "--help"]
+    startup_baseline.check(f"cli run {manifest}", measure_startup(command, startup_runs))
+
+
+@pytest.mark.parametrize("backend", LOADED_CLIS)
+def test_loaded_cli_startup(backend, loaded_clis, startup_baseline, startup_runs):
+    _, cli_name = LOADED_CLIS[backend]
+    if cli_name not in loaded_clis:
+        pytest.skip(f"{cli_name} was already loaded, benchmarking it could time another version")
+    command = [Loader.get_cli_script_path(cli_name), "--help"]
+    startup_baseline.check(f"loaded {backend} {cli_name}", measure_startup(command, startup_runs))
@@ -1,48 +1,257 @@
+"""AI-powered commands, generating manifests and answering questions with pydantic_ai agents.
+
+Responses are cached on disk by model, system prompt, user prompt and token limit, so
+repeated requests don't cost tokens. Batches of generations run concurrently. The
+manifest schema embedded in system prompts is rendered at the requested detail, from
+the full JSON schema down to TypeScript-like interfaces, and cached per cliffy version.
+"""
+
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from importlib.metadata import PackageNotFoundError, version
+from io import TextIOWrapper
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, Union
+
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.models import KnownModelName, Model
 from pydantic_ai.settings import ModelSettings
 from pydantic_ai.usage import UsageLimits
-from pydantic_ai import Agent
-from pydantic_ai.models import KnownModelName
-from cliffy.rich import click
-from cliffy.helper import out, ManifestOrCLI
+
+from cliffy.helper import CLIFFY_CACHE_DIR, ManifestOrCLI, exit_err, out, out_err, write_to_file
+from cliffy.homer import get_metadata
 from cliffy.manifest import CLIManifest
+from cliffy.rich import click
 from cliffy.transformer import Transformer
-from cliffy.homer import get_metadata
-import json
-from io import TextIOWrapper
 
+AI_CACHE_DIR = os.path.join(CLIFFY_CACHE_DIR, "ai")
+AI_CACHE_TTL = 7 * 24 * 60 * 60
+AI_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_CONCURRENCY = 4
+SCHEMA_CACHE_DIR = os.path.join(CLIFFY_CACHE_DIR, "schemas")
+SCHEMA_DETAILS = ("full", "compact", "minimal")
+DEFAULT_SCHEMA_DETAIL = "compact"
+# rough average for English text and JSON with common tokenizers
+CHARS_PER_TOKEN = 4
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+TYPESCRIPT_TYPES = {"string": "string", "integer": "number", "number": "number", "boolean": "boolean", "null": "null"}
 
-@click.group(help="AI-powered commands")
-def ai() -> None:
-    pass
 
+class AIResponse(BaseModel):
+    data: str
+    request_tokens: int = 0
+    response_tokens: int = 0
+    # served from the response cache, no tokens were used
+    cached: bool = False
 
-@click.option("--preview", is_flag=True, help="Display the generated prompt before sending the request.", default=False)
-@click.option("--max-tokens", type=int, help="The maximum number of tokens to generate before stopping.", default=None)
-@click.option(
-    "--model",
-    "-m",
-    help="AI model to use. See https://ai.pydantic.dev/models/ for supported models.",
-    default="gemini-2.0-flash",
-    show_default=True,
-)
-@click.option(
-    "--output-dir",
-    "-o",
-    type=click.Path(exists=True, dir_okay=True, file_okay=False),
-    default=Path(),
-    show_default=True,
-    help="Output directory",
-)
-@click.argument("cli_name", required=True)
-@click.argument("description", required=True)
-def generate(
-    cli_name: str, description: str, model: KnownModelName, max_tokens: int, output_dir: Path, preview: bool
-) -> None:
-    SYSTEM_PROMPT = f"""You are a YAML manifest generator for CLIs. 
+
+class ResponseCache:
+    """On-disk cache of AI responses, a JSON file per request. Entries expire after `ttl`
+    seconds, and the least recently used ones are removed past `max_bytes`."""
+
+    __slots__ = ("cache_dir", "ttl", "max_bytes")
+
+    def __init__(self, cache_dir: str, ttl: float = AI_CACHE_TTL, max_bytes: int = AI_CACHE_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def get_key(model_name: str, system_prompt: str, prompt: str, max_tokens: Optional[int]) -> str:
+        system_prompt_hash = get_prompt_hash(system_prompt)
+        return hashlib.sha256(json.dumps([model_name, system_prompt_hash, prompt, max_tokens]).encode()).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[AIResponse]:
+        path = self.get_path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r") as entry:
+                response = AIResponse.model_validate_json(entry.read())
+            # keeps recently used entries when pruning
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return response.model_copy(update={"cached": True})
+
+    def put(self, key: str, response: AIResponse) -> None:
+        try:
+            write_to_file(self.get_path(key), response.model_dump_json(exclude={"cached"}))
+        except OSError:
+            pass
+
+    def prune(self) -> None:
+        """Removes expired entries, then the least recently used ones until the cache fits in `max_bytes`"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")]
+        except OSError:
+            return
+
+        now = time.time()
+        stats = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl:
+                    os.remove(entry.path)
+                else:
+                    stats.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+
+        total_size = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_first_sentence(text: str) -> str:
+    return SENTENCE_END_RE.split(text.strip(), maxsplit=1)[0].strip()
+
+
+def compact_schema_node(node: dict[str, Any]) -> dict[str, Any]:
+    """Trims a JSON schema node: drops titles and empty defaults, and keeps the first sentence of descriptions"""
+    compacted: dict[str, Any] = {}
+    for key, value in node.items():
+        if key in ("properties", "$defs"):
+            compacted[key] = {name: compact_schema_node(child) for name, child in value.items()}
+        elif key in ("anyOf", "allOf", "oneOf"):
+            compacted[key] = [compact_schema_node(child) for child in value]
+        elif key in ("items", "additionalProperties") and isinstance(value, dict):
+            compacted[key] = compact_schema_node(value)
+        elif key == "description":
+            compacted[key] = get_first_sentence(value)
+        elif key == "title" or (key == "default" and value in ("", [], {}, None)):
+            continue
+        else:
+            compacted[key] = value
+    # root models describe themselves in their title, after the name
+    if "description" not in node and "\n" in node.get("title", ""):
+        compacted["description"] = get_first_sentence(node["title"].split("\n", 1)[1])
+    return compacted
+
+
+def get_typescript_type(node: dict[str, Any], definitions: dict[str, Any]) -> str:
+    if "$ref" in node:
+        name = str(node["$ref"]).rsplit("/", 1)[-1]
+        # pydantic can reference definitions it left out, e.g. models used in several unions
+        return name if name in definitions else "any"
+    if "anyOf" in node:
+        return " | ".join(get_typescript_type(child, definitions) for child in node["anyOf"])
+    if node.get("type") == "array":
+        item_type = get_typescript_type(node.get("items", {}), definitions)
+        return f"({item_type})[]" if " | " in item_type else f"{item_type}[]"
+    if node.get("type") == "object":
+        value_schema = node.get("additionalProperties")
+        value_type = get_typescript_type(value_schema, definitions) if isinstance(value_schema, dict) else "any"
+        return f"Record<string, {value_type}>"
+    return TYPESCRIPT_TYPES.get(node.get("type", ""), "any")
+
+
+def render_typescript_schema(schema: dict[str, Any]) -> str:
+    """Renders a JSON schema's root and definitions as TypeScript-like interfaces and types"""
+    lines = []
+    definitions = {schema.get("title", "Root"): schema, **schema.get("$defs", {})}
+    for name, definition in definitions.items():
+        if definition.get("type") == "object" and "properties" in definition:
+            required = set(definition.get("required", []))
+            lines.append(f"interface {name} {{")
+            for field, field_schema in definition["properties"].items():
+                field_type = get_typescript_type(field_schema, definitions)
+                lines.append(f"  {field}{'' if field in required else '?'}: {field_type};")
+            lines.append("}")
+        else:
+            lines.append(f"type {name} = {get_typescript_type(definition, definitions)};")
+    return "\n".join(lines)
+
+
+def render_manifest_schema(schema: dict[str, Any], detail: str) -> str:
+    """Renders the manifest JSON schema for a prompt
+
+    Args:
+        schema (dict[str, Any]): Manifest JSON schema
+        detail (str): `full` for the JSON schema, `compact` for minified JSON with titles and empty
+            defaults dropped and descriptions trimmed to a sentence, `minimal` for TypeScript-like
+            interfaces without descriptions
+
+    Returns:
+        str: Rendered schema
+    """
+    if detail == "full":
+        return json.dumps(schema)
+    if detail == "compact":
+        return json.dumps(compact_schema_node(schema), separators=(",", ":"))
+    return render_typescript_schema(schema)
+
+
+def get_schema_cache_key() -> str:
+    from cliffy import manifest
+
+    try:
+        cliffy_version = version("cliffy")
+    except PackageNotFoundError:
+        cliffy_version = ""
+    # the schema changes with cliffy's version, or with its source in editable installs
+    source_mtime = os.stat(manifest.__file__).st_mtime_ns
+    return hashlib.sha256(f"{cliffy_version}:{source_mtime}".encode()).hexdigest()[:16]
+
+
+@functools.cache
+def get_manifest_schema(detail: str = DEFAULT_SCHEMA_DETAIL) -> str:
+    """Gets the manifest schema rendered at `detail`, cached on disk per cliffy version
+    since generating the JSON schema is slow"""
+    cache_key = get_schema_cache_key()
+    cache_path = os.path.join(SCHEMA_CACHE_DIR, f"{cache_key}-{detail}.txt")
+    with contextlib.suppress(OSError):
+        return Path(cache_path).read_text()
+
+    schema = render_manifest_schema(CLIManifest.model_json_schema(), detail)
+    with contextlib.suppress(OSError):
+        write_to_file(cache_path, schema)
+        for entry in os.scandir(SCHEMA_CACHE_DIR):
+            if not entry.name.startswith(cache_key):
+                os.remove(entry.path)
+    return schema
+
+
+def get_schema_block(detail: str) -> str:
+    if detail == "minimal":
+        return f"```typescript\n{get_manifest_schema(detail)}\n```"
+    return f"```json{get_manifest_schema(detail)}```"
+
+
+@functools.cache
+def get_prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+@functools.cache
+def get_generate_system_prompt(schema_detail: str = DEFAULT_SCHEMA_DETAIL) -> str:
+    return f"""You are a YAML manifest generator for CLIs. 
 Here is the json schema for the YAML to generate:
-```json{json.dumps(CLIManifest.model_json_schema())}```
+{get_schema_block(schema_detail)}
 Typer is the CLI framework used. 
 Nested commands are joined by a "."
 Due to a feature limitation, parent command cannot be triggered if they have subcommands. 
@@ -54,38 +263,10 @@ Use Python and Typer features and imports as needed to craft the best CLI for th
 
 """
 
-    if preview:
-        out(SYSTEM_PROMPT)
-        out(description)
-        exit()
-
-    model_settings = ModelSettings(max_tokens=max_tokens) if max_tokens else None
-    agent = Agent(model, system_prompt=SYSTEM_PROMPT, model_settings=model_settings)
-
-    usage_limits = UsageLimits(total_tokens_limit=max_tokens) if max_tokens else None
 
-    result = agent.run_sync(description, usage_limits=usage_limits)
-
-    manifest = result.data.strip().removeprefix("```yaml").removesuffix("```").strip()
-    (output_dir / Path(f"{cli_name}.yaml")).write_text(manifest)
-    out(f"✨ {cli_name}.yaml")
-    out("\ntoken usage:")
-    out("------------")
-    out(f"request: {result.usage().request_tokens}")
-    out(f"response: {result.usage().response_tokens}")
-
-
-@click.option("--preview", is_flag=True, help="Display the generated prompt before sending the request.", default=False)
-@click.option("--max-tokens", type=int, help="The maximum number of tokens to generate before stopping.", default=None)
-@click.option("--model", "-m", help="LLM model to use.", default="gemini-2.0-flash", show_default=True)
-@click.option(
-    "--cli", type=ManifestOrCLI(), help="Loaded CLI or manifest to include in prompt as reference.", default=None
-)
-@click.argument("prompt", required=True)
-def ask(
-    cli: Optional[ManifestOrCLI], prompt: str, model: KnownModelName, max_tokens: int, preview: bool = False
-) -> None:
-    SYSTEM_PROMPT = f"""You are an expert of `cliffy`- a YAML manifest to Typer CLI generator.
+@functools.cache
+def get_ask_system_prompt(schema_detail: str = DEFAULT_SCHEMA_DETAIL) -> str:
+    return f"""You are an expert of `cliffy`- a YAML manifest to Typer CLI generator.
 
 ## Cliffy Usage
 `cli <command>`
@@ -117,7 +298,7 @@ def ask(
 6. When ready to share, run `build` to generate portable zipapps built with [Shiv](https://github.com/linkedin/shiv)
 
 Here is the model json schema for CLI manifest:
-```json{json.dumps(CLIManifest.model_json_schema())}```
+{get_schema_block(schema_detail)}
 Typer is the CLI framework used. 
 Due to a feature limitation, parent command cannot be triggered if they have subcommands. 
 Do not write a group command definition for the parent if it has a subcommand.
@@ -127,6 +308,228 @@ Use Python and Typer features and imports as needed to craft the best CLI for th
 
 """
 
+
+def get_model_name(model: Union[KnownModelName, Model]) -> str:
+    return model if isinstance(model, str) else model.name()
+
+
+def complete_prompts(
+    model: Union[KnownModelName, Model],
+    system_prompt: str,
+    prompts: list[str],
+    max_tokens: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    concurrency: int = 1,
+) -> list[Union[AIResponse, Exception]]:
+    """Gets a response per prompt, from the cache or from `concurrency` concurrent agent runs.
+
+    Args:
+        model (Union[KnownModelName, Model]): Model name or pydantic_ai model
+        system_prompt (str): System prompt
+        prompts (list[str]): User prompts
+        max_tokens (Optional[int]): Token limit per request
+        cache (Optional[ResponseCache]): Response cache, or None to always send the requests
+        concurrency (int): Maximum requests in flight
+
+    Returns:
+        list[Union[AIResponse, Exception]]: Response, or the error the request failed with, per prompt
+    """
+    keys = [ResponseCache.get_key(get_model_name(model), system_prompt, prompt, max_tokens) for prompt in prompts]
+    responses: list[Union[AIResponse, Exception, None]] = [cache.get(key) if cache else None for key in keys]
+    pending = [i for i, response in enumerate(responses) if response is None]
+    if pending:
+        model_settings = ModelSettings(max_tokens=max_tokens) if max_tokens else None
+        agent = Agent(model, system_prompt=system_prompt, model_settings=model_settings)
+        usage_limits = UsageLimits(total_tokens_limit=max_tokens) if max_tokens else None
+        results = asyncio.run(run_prompts(agent, [prompts[i] for i in pending], usage_limits, concurrency))
+        for i, result in zip(pending, results):
+            responses[i] = result
+            if cache and isinstance(result, AIResponse):
+                cache.put(keys[i], result)
+        if cache:
+            cache.prune()
+    return [response for response in responses if response is not None]
+
+
+async def run_prompts(
+    agent: Agent, prompts: list[str], usage_limits: Optional[UsageLimits], concurrency: int
+) -> list[Union[AIResponse, Exception]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_prompt(prompt: str) -> Union[AIResponse, Exception]:
+        async with semaphore:
+            try:
+                result = await agent.run(prompt, usage_limits=usage_limits)
+            except Exception as e:
+                return e
+        usage = result.usage()
+        return AIResponse(
+            data=result.data, request_tokens=usage.request_tokens or 0, response_tokens=usage.response_tokens or 0
+        )
+
+    return await asyncio.gather(*(run_prompt(prompt) for prompt in prompts))
+
+
+def get_response_cache(cache_ttl: float) -> Optional[ResponseCache]:
+    return ResponseCache(AI_CACHE_DIR, ttl=cache_ttl) if cache_ttl else None
+
+
+def read_generate_requests(requests_file: TextIOWrapper) -> list[tuple[str, str]]:
+    """Reads `<cli name> <description>` lines, skipping blank lines and # comments"""
+    requests = []
+    for line_number, line in enumerate(requests_file, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        cli_name, _, description = line.partition(" ")
+        if not description.strip():
+            exit_err(f"~ line {line_number} needs a CLI name and a description")
+        requests.append((cli_name, description.strip()))
+    return requests
+
+
+def out_prompt_estimate(system_prompt: str, schema_detail: str) -> None:
+    schema_tokens = estimate_tokens(get_manifest_schema(schema_detail))
+    out(f"\n~{estimate_tokens(system_prompt)} system prompt tokens, ~{schema_tokens} for the {schema_detail} schema")
+
+
+def out_usage(responses: list[AIResponse]) -> None:
+    cached = sum(response.cached for response in responses)
+    out("\ntoken usage:" if not cached else f"\ntoken usage ({cached} cached, no tokens used):")
+    out("------------")
+    out(f"request: {sum(response.request_tokens for response in responses if not response.cached)}")
+    out(f"response: {sum(response.response_tokens for response in responses if not response.cached)}")
+
+
+@click.group(help="AI-powered commands")
+def ai() -> None:
+    pass
+
+
+schema_detail_option = click.option(
+    "--schema-detail",
+    type=click.Choice(SCHEMA_DETAILS),
+    default=DEFAULT_SCHEMA_DETAIL,
+    show_default=True,
+    help="How much of the manifest schema to send: the full JSON schema, compact JSON with short descriptions, "
+    "or minimal TypeScript-like types. Less detail uses fewer request tokens.",
+)
+cache_ttl_option = click.option(
+    "--cache-ttl",
+    type=click.FloatRange(min=0),
+    default=AI_CACHE_TTL,
+    show_default=True,
+    help="Seconds to reuse a cached response to the same request, 0 to skip the cache.",
+)
+
+
+@click.option("--preview", is_flag=True, help="Display the generated prompt before sending the request.", default=False)
+@click.option("--max-tokens", type=int, help="The maximum number of tokens to generate before stopping.", default=None)
+@click.option(
+    "--model",
+    "-m",
+    help="AI model to use. See https://ai.pydantic.dev/models/ for supported models.",
+    default=DEFAULT_MODEL,
+    show_default=True,
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    type=click.Path(exists=True, dir_okay=True, file_okay=False),
+    default=Path(),
+    show_default=True,
+    help="Output directory",
+)
+@click.option(
+    "--from",
+    "requests_file",
+    type=click.File("r"),
+    default=None,
+    help="Generate a manifest per `<cli name> <description>` line of this file, concurrently.",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help="With --from, maximum generations in flight.",
+)
+@schema_detail_option
+@cache_ttl_option
+@click.argument("cli_name", required=False)
+@click.argument("description", required=False)
+def generate(
+    cli_name: Optional[str],
+    description: Optional[str],
+    model: KnownModelName,
+    max_tokens: int,
+    output_dir: Path,
+    preview: bool,
+    requests_file: Optional[TextIOWrapper],
+    concurrency: int,
+    schema_detail: str,
+    cache_ttl: float,
+) -> None:
+    if requests_file:
+        if cli_name or description:
+            exit_err("~ --from reads the CLI names and descriptions from the file, drop the arguments")
+        requests = read_generate_requests(requests_file)
+    elif cli_name and description:
+        requests = [(cli_name, description)]
+    else:
+        exit_err("~ missing a CLI name and a description, or --from")
+
+    system_prompt = get_generate_system_prompt(schema_detail)
+    if preview:
+        out(system_prompt)
+        for _, request_description in requests:
+            out(request_description)
+        out_prompt_estimate(system_prompt, schema_detail)
+        exit()
+
+    responses = complete_prompts(
+        model,
+        system_prompt,
+        [request_description for _, request_description in requests],
+        max_tokens=max_tokens,
+        cache=get_response_cache(cache_ttl),
+        concurrency=concurrency,
+    )
+    succeeded = []
+    for (request_cli_name, _), response in zip(requests, responses):
+        if isinstance(response, Exception):
+            out_err(f"~ {request_cli_name}.yaml generation failed: {response}")
+            continue
+        manifest = response.data.strip().removeprefix("```yaml").removesuffix("```").strip()
+        (Path(output_dir) / Path(f"{request_cli_name}.yaml")).write_text(manifest)
+        out(f"✨ {request_cli_name}.yaml")
+        succeeded.append(response)
+
+    out_usage(succeeded)
+    if len(succeeded) < len(requests):
+        exit_err(f"~ {len(requests) - len(succeeded)} of {len(requests)} generations failed")
+
+
+@click.option("--preview", is_flag=True, help="Display the generated prompt before sending the request.", default=False)
+@click.option("--max-tokens", type=int, help="The maximum number of tokens to generate before stopping.", default=None)
+@click.option("--model", "-m", help="LLM model to use.", default=DEFAULT_MODEL, show_default=True)
+@click.option(
+    "--cli", type=ManifestOrCLI(), help="Loaded CLI or manifest to include in prompt as reference.", default=None
+)
+@schema_detail_option
+@cache_ttl_option
+@click.argument("prompt", required=True)
+def ask(
+    cli: Optional[ManifestOrCLI],
+    prompt: str,
+    model: KnownModelName,
+    max_tokens: int,
+    schema_detail: str,
+    cache_ttl: float,
+    preview: bool = False,
+) -> None:
+    system_prompt = get_ask_system_prompt(schema_detail)
+
     reference = ""
     if cli:
         reference += "Here is the CLI manifest to use as reference:"
@@ -134,25 +537,22 @@ Use Python and Typer features and imports as needed to craft the best CLI for th
         if isinstance(cli, TextIOWrapper):
             reference += str(Transformer(cli).manifest.model_dump(mode="json"))
         elif isinstance(cli, str):
-            metadata = get_metadata(cli)
+            metadata = get_metadata(cli, load_manifest=True)
             reference += metadata.manifest if metadata else ""
         reference += "```"
 
     if preview:
-        out(SYSTEM_PROMPT + reference + prompt)
+        out(system_prompt + reference + prompt)
+        out_prompt_estimate(system_prompt, schema_detail)
         exit()
 
-    model_settings = ModelSettings(max_tokens=max_tokens) if max_tokens else None
-    agent = Agent(model, system_prompt=SYSTEM_PROMPT, model_settings=model_settings)
-
-    usage_limits = UsageLimits(total_tokens_limit=max_tokens) if max_tokens else None
-
-    result = agent.run_sync(reference + prompt, usage_limits=usage_limits)
-    out(result.data)
-    out("\ntoken usage:")
-    out("------------")
-    out(f"request: {result.usage().request_tokens}")
-    out(f"response: {result.usage().response_tokens}")
+    [response] = complete_prompts(
+        model, system_prompt, [reference + prompt], max_tokens=max_tokens, cache=get_response_cache(cache_ttl)
+    )
+    if isinstance(response, Exception):
+        raise response
+    out(response.data)
+    out_usage([response])
 
 
 ai.command("generate", help="Generate a CLI manifest based on a description.")(generate)
@@ -0,0 +1,207 @@
+"""Benchmarks for the command lines in a manifest's `benchmarks` section.
+
+Each benchmark runs warm, in-process from the imported CLI module, and/or cold, in a
+new Python process per run. Latencies are reported as min/mean/p50/p95/p99 and
+compared against the benchmark's thresholds and a JSON baseline of earlier runs.
+"""
+
+import json
+import math
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import time
+from functools import cached_property
+from tempfile import TemporaryDirectory
+from types import ModuleType
+from typing import Any, Generator, Optional
+
+from pydantic import BaseModel
+from typer.testing import CliRunner
+
+from cliffy.helper import import_module_from_code, write_to_file
+from cliffy.manifest import Benchmark
+from cliffy.transformer import Transformer
+
+PERCENTILES = (50, 95, 99)
+DEFAULT_MAX_REGRESSION = 25.0
+
+
+def get_baseline_path(manifest_path: str) -> str:
+    """Gets the default baseline path, next to the manifest, i.e. `hello.bench.json` for `hello.yaml`"""
+    return os.path.splitext(manifest_path)[0] + ".bench.json"
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Gets the nearest-rank percentile of sorted values"""
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class BenchmarkResult(BaseModel):
+    command: str
+    mode: str
+    # latencies of the timed runs in ms
+    runs: list[float] = []
+    # set if a run failed, no latencies are reported then
+    error: str = ""
+    # broken thresholds and baseline regressions
+    failures: list[str] = []
+
+    @property
+    def name(self) -> str:
+        return f"{self.mode} {self.command}"
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Latency stats in ms: min, mean, p50, p95 and p99"""
+        if not self.runs:
+            return {}
+        runs = sorted(self.runs)
+        stats = {"min": runs[0], "mean": sum(runs) / len(runs)}
+        stats.update({f"p{percent}": percentile(runs, percent) for percent in PERCENTILES})
+        return stats
+
+
+class Baseline:
+    """Timings of earlier runs by name, stored as JSON under `entries_key`. Shared by
+    `cli bench` and the startup benchmarks in benchmarks/."""
+
+    __slots__ = ("path", "entries", "update", "max_regression", "results")
+    entries_key = "benchmarks"
+
+    def __init__(self, path: str, update: bool = False, max_regression: float = DEFAULT_MAX_REGRESSION) -> None:
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as baseline_file:
+                self.entries = json.load(baseline_file)[self.entries_key]
+        self.update = update
+        self.max_regression = max_regression
+        self.results: dict[str, dict[str, Any]] = {}
+
+    def compare(self, name: str, timings: dict[str, Any], stats: tuple[str, ...]) -> list[tuple[str, float, float]]:
+        """Records a run's timings and gets the stats that regressed past the baseline
+
+        Args:
+            name (str): Run name
+            timings (dict[str, Any]): Timings in ms by stat, saved with any other details of the run
+            stats (tuple[str, ...]): Keys of the timings to compare
+
+        Returns:
+            list[tuple[str, float, float]]: Stat, timing and baseline timing of each regression
+        """
+        self.results[name] = timings
+        if self.update or name not in self.entries:
+            return []
+
+        regressions = []
+        for stat in stats:
+            baseline_ms = self.entries[name].get(stat)
+            if baseline_ms is not None and timings[stat] > baseline_ms * (1 + self.max_regression / 100):
+                regressions.append((stat, timings[stat], baseline_ms))
+        return regressions
+
+    def needs_saving(self) -> bool:
+        return self.update or bool(set(self.results) - set(self.entries))
+
+    def save(self) -> None:
+        entries = self.results if self.update else {**self.results, **self.entries}
+        baseline = {
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            self.entries_key: dict(sorted(entries.items())),
+        }
+        write_to_file(self.path, json.dumps(baseline, indent=2) + "\n")
+
+
+class BenchmarkBaseline(Baseline):
+    """p50 and p95 latencies of earlier `cli bench` runs, by benchmark name"""
+
+    __slots__ = ()
+
+    def check(self, result: BenchmarkResult) -> None:
+        """Records a result's p50 and p95 and adds a failure for each that regressed past the baseline"""
+        if result.error:
+            return
+
+        stats = result.stats
+        timings = {f"{stat}_ms": round(stats[stat], 3) for stat in ("p50", "p95")}
+        for stat, _, baseline_ms in self.compare(result.name, timings, ("p50_ms", "p95_ms")):
+            stat = stat.removesuffix("_ms")
+            result.failures.append(
+                f"{stat} {stats[stat]:.1f}ms regressed more than {self.max_regression:g}% "
+                f"from the {baseline_ms:.1f}ms baseline"
+            )
+
+
+class Bencher:
+    def __init__(self, manifest_path: str) -> None:
+        self.manifest_path = manifest_path
+        with open(manifest_path, "r") as manifest_io:
+            self.T = Transformer(manifest_io)
+
+        self.benchmarks = [
+            Benchmark(command=benchmark) if isinstance(benchmark, str) else benchmark
+            for benchmark in self.T.manifest.benchmarks
+        ]
+        self.runner = CliRunner()
+
+    @cached_property
+    def module(self) -> ModuleType:
+        # only imported for warm benchmarks
+        return import_module_from_code(self.T.cli.name, self.T.cli.code)
+
+    def run_benchmarks(self) -> Generator[BenchmarkResult, None, None]:
+        """Runs each benchmark in each of its modes, checking its thresholds"""
+        with TemporaryDirectory() as script_dir:
+            script_path = os.path.join(script_dir, f"{self.T.cli.name}.py")
+            write_to_file(script_path, self.T.cli.code)
+            for benchmark in self.benchmarks:
+                for mode in benchmark.modes:
+                    yield self.run_benchmark(benchmark, mode, script_path)
+
+    def run_benchmark(self, benchmark: Benchmark, mode: str, script_path: str) -> BenchmarkResult:
+        result = BenchmarkResult(command=benchmark.command, mode=mode)
+        try:
+            for i in range(benchmark.warmup + benchmark.iterations):
+                if mode == "warm":
+                    seconds = self.time_warm(benchmark.command)
+                else:
+                    seconds = self.time_cold(script_path, benchmark.command)
+                if i >= benchmark.warmup:
+                    result.runs.append(seconds * 1000)
+        except Exception as e:
+            result.runs = []
+            result.error = str(e)
+            result.failures.append(result.error)
+            return result
+
+        stats = result.stats
+        for stat, threshold in (("p50", benchmark.p50), ("p95", benchmark.p95)):
+            if threshold is not None and stats[stat] > threshold:
+                result.failures.append(f"{stat} {stats[stat]:.1f}ms is over the {threshold:g}ms threshold")
+        return result
+
+    def time_warm(self, command: str) -> float:
+        start = time.perf_counter()
+        invoke_result = self.runner.invoke(self.module.cli, command)
+        elapsed = time.perf_counter() - start
+        if invoke_result.exit_code != 0:
+            raise RuntimeError(get_exit_error(invoke_result.exit_code, invoke_result.output))
+        return elapsed
+
+    def time_cold(self, script_path: str, command: str) -> float:
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, script_path, *shlex.split(command)], capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if process.returncode != 0:
+            raise RuntimeError(get_exit_error(process.returncode, process.stderr or process.stdout))
+        return elapsed
+
+
+def get_exit_error(exit_code: int, output: Optional[str]) -> str:
+    last_line = (output or "").strip().splitlines()[-1:] or [""]
+    return f"exited with {exit_code}" + (f": {last_line[0]}" if last_line[0] else "")
@@ -1,44 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from io import TextIOWrapper
+import ast
+import compileall
+import contextlib
+import csv
+import hashlib
+import io
+import json
 import os
+import posixpath
+import py_compile
+import shutil
+import subprocess
 import sys
+import sysconfig
+import time
+import zipapp
+import zipfile
+from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
 from shutil import copy
-from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import Optional
+from tempfile import NamedTemporaryFile, TemporaryDirectory, mkdtemp
+from typing import Iterator, Optional, Union
 
+import click
 from click.testing import CliRunner, Result
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+from pydantic import BaseModel
 from shiv import cli as shiv_cli
 from shiv import pip
 
-from cliffy.helper import TEMP_FILES, delete_temp_files, import_module_from_path
+from cliffy.helper import (
+    CLIFFY_CACHE_DIR,
+    GENERATED_HEADER_RE,
+    TEMP_FILES,
+    delete_temp_files,
+    import_module_from_code,
+    write_to_file,
+)
 
 from cliffy.transformer import Transformer
 
 from cliffy.commander import CLI
 
+# dropped from fast-start builds, these are never imported by a CLI at runtime
+STRIPPED_DIRS = {"tests", "docs", "__pycache__"}
+NATIVE_SUFFIXES = (".so", ".pyd", ".dylib", ".dll")
+# requirement installed for each framework module a generated CLI can import
+FRAMEWORK_REQUIREMENTS = {"typer": "typer", "rich_click": "rich-click"}
+DYNAMIC_IMPORT_FUNCTIONS = {"import_module", "__import__"}
+BUILD_RECORD_SUFFIX = ".build.json"
+
+FLEET_DISPATCHER_MODULE = "_cliffy_fleet"
+FLEET_DISPATCHER = """import importlib
+import os
+import sys
+
+CLIS = {clis}
+
+
+def main():
+    cli_name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    if cli_name not in CLIS:
+        if len(sys.argv) < 2 or sys.argv[1] not in CLIS:
+            print("Usage: {fleet_name} CLI [ARGS]...\\n\\nCLIs:\\n  " + "\\n  ".join(CLIS))
+            return 0 if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help") else 1
+        cli_name = sys.argv.pop(1)
+        sys.argv[0] = cli_name
+    return importlib.import_module(CLIS[cli_name]).cli()
+"""
+
 
 def build_cli_from_manifest(
-    manifestIO: TextIOWrapper, output_dir: Optional[str] = None, interpreter: str = "/usr/bin/env python3"
+    manifestIO: TextIOWrapper,
+    output_dir: Optional[str] = None,
+    interpreter: str = "/usr/bin/env python3",
+    wheelhouse: Optional[str] = None,
+    profile: str = "default",
+    prune: bool = False,
 ) -> tuple[CLI, Result]:
     T = Transformer(manifestIO, validate_requires=False)
-    with NamedTemporaryFile(mode="w", prefix=f"{T.cli.name}_", suffix=".py", delete=False) as script:
-        script.write(T.cli.code)
-        script.flush()
-        result = build_cli(
-            T.cli.name, script_path=script.name, deps=T.cli.requires, output_dir=output_dir, interpreter=interpreter
-        )
-        TEMP_FILES.append(script)
+    result = build_cli(
+        T.cli.name,
+        script_path=write_build_script(T.cli),
+        deps=T.cli.requires,
+        output_dir=output_dir,
+        interpreter=interpreter,
+        wheelhouse=wheelhouse,
+        profile=profile,
+        prune=prune,
+    )
 
     delete_temp_files()
     return T.cli, result
 
 
+def write_build_script(cli: CLI) -> str:
+    """Writes generated CLI code to a temp script to build from. Removed with `delete_temp_files`."""
+    with NamedTemporaryFile(mode="w", prefix=f"{cli.name}_", suffix=".py", delete=False) as script:
+        script.write(cli.code)
+        TEMP_FILES.append(script)
+    return script.name
+
+
 def build_cli(
     cli_name: str,
     script_path: str,
     deps: Optional[list[str]] = None,
     output_dir: Optional[str] = None,
     interpreter: str = "/usr/bin/env python3",
+    wheelhouse: Optional[str] = None,
+    profile: str = "default",
+    prune: bool = False,
+    refresh_layer: bool = False,
 ) -> Result:
     if deps is None:
         deps = []
@@ -47,27 +122,610 @@ def build_cli(
         os.mkdir(output_dir)
 
     with TemporaryDirectory() as tdist:
+        pip_deps = get_build_requirements(script_path, deps)
+        link_tree(get_site_packages_layer(pip_deps, wheelhouse=wheelhouse, refresh=refresh_layer), tdist)
         copy(script_path, os.path.join(tdist, f"{cli_name}.py"))
-        pip_deps = ["typer"] + deps
+        if prune:
+            prune_site_packages(tdist, [cli_name])
+
+        output_file = get_output_file(output_dir, cli_name)
+        return package_zipapp(tdist, f"{cli_name}.cli", output_file, interpreter, profile)
 
-        pip.install(["--target", tdist] + pip_deps)
 
-        runner = CliRunner()
-        output_file = os.path.join(output_dir, f"{cli_name}") if output_dir else cli_name
-        return runner.invoke(
-            shiv_cli.main,  # type: ignore
-            ["--site-packages", tdist, "--compressed", "-e", f"{cli_name}.cli", "-o", output_file, "-p", interpreter],
+def build_fleet(
+    fleet_name: str,
+    targets: list["BuildTarget"],
+    output_dir: Optional[str] = None,
+    interpreter: str = "/usr/bin/env python3",
+    wheelhouse: Optional[str] = None,
+    profile: str = "default",
+    prune: bool = False,
+    refresh_layer: bool = False,
+) -> Result:
+    """Builds many CLIs into one zipapp with a shared site-packages.
+
+    The zipapp dispatches busybox-style: by the name it's invoked as (see `link_fleet_clis`)
+    or by its first argument, i.e. `fleet hello -h`.
+
+    Args:
+        fleet_name (str): Zipapp name
+        targets (list[BuildTarget]): CLIs to include
+        output_dir (Optional[str]): Output directory
+        interpreter (str): Zipapp shebang interpreter
+        wheelhouse (Optional[str]): Directory of wheels to install from instead of the package index
+        profile (str): Build profile, one of `BUILD_PROFILES`
+        prune (bool): Remove installed distributions the CLIs never import
+        refresh_layer (bool): Reinstall the cached site-packages layer, e.g. to pick up new releases
+
+    Returns:
+        Result: Zipapp packaging result
+    """
+    if output_dir and not Path(output_dir).exists():
+        os.mkdir(output_dir)
+
+    fleet_modules = {target.cli_name: target.cli_name.replace("-", "_") for target in targets}
+    fleet_deps = [dep for target in targets for dep in get_build_requirements(target.script_path, target.deps)]
+
+    with TemporaryDirectory() as tdist:
+        link_tree(get_site_packages_layer(fleet_deps, wheelhouse=wheelhouse, refresh=refresh_layer), tdist)
+        for target in targets:
+            copy(target.script_path, os.path.join(tdist, f"{fleet_modules[target.cli_name]}.py"))
+        Path(tdist, f"{FLEET_DISPATCHER_MODULE}.py").write_text(
+            FLEET_DISPATCHER.format(fleet_name=fleet_name, clis=json.dumps(fleet_modules, sort_keys=True))
         )
+        if prune:
+            prune_site_packages(tdist, [FLEET_DISPATCHER_MODULE, *fleet_modules.values()])
 
+        output_file = get_output_file(output_dir, fleet_name)
+        return package_zipapp(tdist, f"{FLEET_DISPATCHER_MODULE}.main", output_file, interpreter, profile)
 
-def run_cli(cli_name: str, script_code: str, args: tuple) -> None:
-    with NamedTemporaryFile(mode="w", prefix=f"{cli_name}_", suffix=".py", delete=False) as runner_file:
-        runner_file.write(script_code)
-        runner_file.flush()
-        module = import_module_from_path(runner_file.name)
-        TEMP_FILES.append(runner_file)
 
-    delete_temp_files()
-    runner_argvs = [runner_file.name] + list(args)
-    sys.argv = runner_argvs
-    module.cli()
+def get_fleet_shim(fleet_file: str, cli_name: str) -> str:
+    if sys.platform == "win32":
+        return f'@python "%~dp0{fleet_file}" {cli_name} %*\r\n'
+    return f'#!/bin/sh\nexec "$(dirname "$0")/{fleet_file}" {cli_name} "$@"\n'
+
+
+def is_fleet_link(link_path: str, fleet_file: str, cli_name: str) -> bool:
+    """Checks if a path is a link or shim to the fleet zipapp, written by an earlier fleet build"""
+    if os.path.islink(link_path):
+        return os.readlink(link_path) == fleet_file
+    with contextlib.suppress(OSError, UnicodeDecodeError), open(link_path, newline="") as link_file:
+        return link_file.read() == get_fleet_shim(fleet_file, cli_name)
+    return False
+
+
+def link_fleet_clis(fleet_path: str, cli_names: list[str]) -> tuple[list[str], list[str]]:
+    """Creates a symlink per CLI name next to a fleet zipapp, writing a shim script
+    where symlinks aren't permitted (e.g. Windows without developer mode). Files with
+    a CLI name that aren't links from an earlier fleet build, like a standalone
+    zipapp, are left alone.
+
+    Returns:
+        tuple[list[str], list[str]]: Created link paths and skipped existing paths
+    """
+    fleet_dir, fleet_file = os.path.split(fleet_path)
+    links, skipped = [], []
+    for cli_name in cli_names:
+        link_path = os.path.join(fleet_dir, cli_name)
+        shim_path = link_path + ".cmd" if sys.platform == "win32" else link_path
+        existing_paths = [path for path in {link_path, shim_path} if os.path.lexists(path)]
+        if any(not is_fleet_link(path, fleet_file, cli_name) for path in existing_paths):
+            skipped.append(link_path)
+            continue
+        for path in existing_paths:
+            os.remove(path)
+
+        try:
+            os.symlink(fleet_file, link_path)
+        except OSError:
+            link_path = shim_path
+            write_to_file(link_path, get_fleet_shim(fleet_file, cli_name), sys.platform != "win32")
+        links.append(link_path)
+    return links, skipped
+
+
+def package_zipapp(site_packages: str, entry_point: str, output_file: str, interpreter: str, profile: str) -> Result:
+    """Packages a populated site-packages dir into a zipapp for a build profile.
+
+    The default profile is a compressed shiv zipapp, extracted to ~/.shiv on first run.
+    The fast-start profile strips files a CLI never imports and ships bytecode stored
+    uncompressed. Pure-Python trees are run straight from the zip by zipimport with no
+    extraction at all; trees with native extensions fall back to an uncompressed shiv.
+
+    Args:
+        site_packages (str): Staging dir, modified in place for fast-start
+        entry_point (str): `module.function` to run
+        output_file (str): Zipapp path
+        interpreter (str): Zipapp shebang interpreter
+        profile (str): Build profile, one of `BUILD_PROFILES`
+
+    Returns:
+        Result: Zipapp packaging result
+    """
+    if profile != "fast-start":
+        return run_shiv(site_packages, entry_point, output_file, interpreter)
+
+    strip_site_packages(site_packages)
+    if has_native_extensions(site_packages):
+        # shiv extracts into a regular dir, where bytecode is looked up in __pycache__
+        compile_site_packages(site_packages, legacy=False)
+        return run_shiv(site_packages, entry_point, output_file, interpreter, compressed=False)
+
+    # zipimport only looks for bytecode next to the source
+    compile_site_packages(site_packages, legacy=True)
+    module, function = entry_point.rsplit(".", 1)
+    return CliRunner().invoke(
+        create_zipapp,  # type: ignore
+        [site_packages, "-o", output_file, "-p", interpreter, "-m", f"{module}:{function}"],
+    )
+
+
+def run_shiv(
+    site_packages: str, entry_point: str, output_file: str, interpreter: str, compressed: bool = True
+) -> Result:
+    runner = CliRunner()
+    return runner.invoke(
+        shiv_cli.main,  # type: ignore
+        [
+            "--site-packages",
+            site_packages,
+            "--compressed" if compressed else "--uncompressed",
+            "-e",
+            entry_point,
+            "-o",
+            output_file,
+            "-p",
+            interpreter,
+        ],
+    )
+
+
+@click.command()
+@click.argument("source", type=click.Path(exists=True, file_okay=False))
+@click.option("--output-file", "-o", required=True)
+@click.option("--python", "-p", required=True)
+@click.option("--main", "-m", required=True)
+def create_zipapp(source: str, output_file: str, python: str, main: str) -> None:
+    """Creates an uncompressed zipapp that runs from the zip without extraction"""
+    zipapp.create_archive(source, output_file, interpreter=python, main=main, compressed=False)
+
+
+def strip_site_packages(site_packages: str) -> None:
+    """Removes tests, docs, console scripts and bytecode compiled for any interpreter.
+    Files are hardlinked from the layer cache, so removing them leaves the layer intact."""
+    for root, dirs, _ in os.walk(site_packages):
+        for name in [name for name in dirs if name in STRIPPED_DIRS]:
+            shutil.rmtree(os.path.join(root, name))
+            dirs.remove(name)
+    shutil.rmtree(os.path.join(site_packages, "bin"), ignore_errors=True)
+
+
+def has_native_extensions(site_packages: str) -> bool:
+    return any(name.endswith(NATIVE_SUFFIXES) for _, _, files in os.walk(site_packages) for name in files)
+
+
+def compile_site_packages(site_packages: str, legacy: bool) -> None:
+    """Precompiles bytecode for the running interpreter. Unchecked hash-based pycs
+    are never validated against their source, so startup skips the stat calls."""
+    compileall.compile_dir(
+        site_packages,
+        quiet=2,
+        legacy=legacy,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+
+
+def measure_startup(artifact: str, runs: int = 3) -> tuple[float, float]:
+    """Times `artifact --help` in a fresh subprocess.
+
+    Cold start is the first run with an empty shiv extraction root, warm start is
+    the best of `runs` repeated runs once extracted.
+
+    Returns:
+        tuple[float, float]: Cold and warm start times in seconds
+    """
+    with TemporaryDirectory() as shiv_root:
+        env = {**os.environ, "SHIV_ROOT": shiv_root}
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, artifact, "--help"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            timings.append(time.perf_counter() - start)
+    return timings[0], min(timings[1:])
+
+
+class BuildTarget(BaseModel):
+    cli_name: str
+    script_path: str
+    deps: list[str] = []
+    output_dir: Optional[str] = None
+    interpreter: str = "/usr/bin/env python3"
+    wheelhouse: Optional[str] = None
+    profile: str = "default"
+    prune: bool = False
+
+
+class BuildOutcome(BaseModel):
+    cli_name: str
+    exit_code: int
+    output: str = ""
+    skipped: bool = False
+
+
+def build_target(target: BuildTarget, capture_output: bool = True, refresh_layer: bool = False) -> BuildOutcome:
+    """Builds a target without raising, so it can run in a worker process.
+
+    Args:
+        target (BuildTarget): Build target
+        capture_output (bool): Capture pip output in the outcome instead of streaming it
+        refresh_layer (bool): Reinstall the target's cached site-packages layer
+
+    Returns:
+        BuildOutcome: Exit code and collected output of the build
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output) if capture_output else contextlib.nullcontext():
+        try:
+            fingerprint = get_build_fingerprint(target.cli_name, [target])
+            result = build_cli(**target.model_dump(), refresh_layer=refresh_layer)
+            exit_code = result.exit_code
+            if not exit_code:
+                record_build(get_output_file(target.output_dir, target.cli_name), fingerprint)
+            output.write(result.stdout)
+            if exit_code and result.exception:
+                output.write(f"{result.exception}\n")
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            exit_code = 1
+            output.write(f"{e}\n")
+
+    return BuildOutcome(cli_name=target.cli_name, exit_code=exit_code, output=output.getvalue())
+
+
+def prepare_layer(deps: list[str], wheelhouse: Optional[str] = None, refresh: bool = False) -> BuildOutcome:
+    """Installs a site-packages layer without raising, capturing pip output"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            get_site_packages_layer(deps, wheelhouse=wheelhouse, refresh=refresh)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            exit_code = 1
+            output.write(f"{e}\n")
+
+    return BuildOutcome(cli_name="", exit_code=exit_code, output=output.getvalue())
+
+
+def build_targets(targets: list[BuildTarget], jobs: int = 1, force: bool = False) -> Iterator[BuildOutcome]:
+    """Builds targets, in a pool of `jobs` worker processes when jobs > 1.
+
+    Targets whose inputs are unchanged since their last build in the same output dir
+    are skipped unless `force` is set, which also reinstalls each cached layer once so
+    unpinned requirements pick up new releases. With a pool, each distinct requirement
+    set is installed once up front so targets sharing requirements reuse one cached
+    layer instead of racing to install it.
+
+    Yields:
+        Iterator[BuildOutcome]: Build outcomes, in completion order when parallel
+    """
+    stale_targets = []
+    for target in targets:
+        output_file = get_output_file(target.output_dir, target.cli_name)
+        if not force and is_build_current(output_file, get_build_fingerprint(target.cli_name, [target])):
+            yield BuildOutcome(cli_name=target.cli_name, exit_code=0, skipped=True)
+        else:
+            stale_targets.append(target)
+
+    targets_by_layer: dict[tuple[str, ...], list[BuildTarget]] = {}
+    for target in stale_targets:
+        layer_key = tuple(normalize_requirements(get_build_requirements(target.script_path, target.deps)))
+        targets_by_layer.setdefault(layer_key, []).append(target)
+
+    if jobs <= 1:
+        # with force, only the first target of each layer reinstalls it
+        refreshing_targets = {id(layer_targets[0]) for layer_targets in targets_by_layer.values()} if force else set()
+        for target in stale_targets:
+            yield build_target(target, capture_output=False, refresh_layer=id(target) in refreshing_targets)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        layer_futures = {
+            executor.submit(prepare_layer, list(layer_key), layer_targets[0].wheelhouse, force): layer_targets
+            for layer_key, layer_targets in targets_by_layer.items()
+        }
+        build_futures = []
+        for layer_future in as_completed(layer_futures):
+            layer_outcome = layer_future.result()
+            for target in layer_futures[layer_future]:
+                if layer_outcome.exit_code:
+                    yield layer_outcome.model_copy(update={"cli_name": target.cli_name})
+                else:
+                    build_futures.append(executor.submit(build_target, target))
+
+        for build_future in as_completed(build_futures):
+            yield build_future.result()
+
+
+def get_output_file(output_dir: Optional[str], name: str) -> str:
+    return os.path.join(output_dir, name) if output_dir else name
+
+
+def get_build_fingerprint(name: str, targets: list[BuildTarget]) -> str:
+    """Fingerprints every input that affects a zipapp: the generated code, requirements,
+    build options, interpreter, platform and cliffy version.
+
+    Args:
+        name (str): Zipapp name
+        targets (list[BuildTarget]): CLIs built into the zipapp, one unless it's a fleet
+
+    Returns:
+        str: sha256 hex digest of the build inputs
+    """
+    fingerprint = {
+        "name": name,
+        "clis": [
+            {
+                "cli_name": target.cli_name,
+                "code": hashlib.sha256(
+                    GENERATED_HEADER_RE.sub("", Path(target.script_path).read_text()).encode()
+                ).hexdigest(),
+                "requirements": normalize_requirements(get_build_requirements(target.script_path, target.deps)),
+                **target.model_dump(include={"interpreter", "wheelhouse", "profile", "prune"}),
+            }
+            for target in targets
+        ],
+        "cliffy": get_cliffy_version(),
+        "python": sys.implementation.cache_tag,
+        "platform": sysconfig.get_platform(),
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def get_cliffy_version() -> str:
+    try:
+        return version("cliffy")
+    except PackageNotFoundError:
+        return ""
+
+
+def get_build_record_path(output_file: str) -> Path:
+    """Gets the build record path, a hidden file next to the zipapp"""
+    output_path = Path(output_file)
+    return output_path.with_name(f".{output_path.name}{BUILD_RECORD_SUFFIX}")
+
+
+def record_build(output_file: str, fingerprint: str) -> None:
+    """Records the inputs fingerprint of a built zipapp along with its size and mtime"""
+    output_stat = os.stat(output_file)
+    record = {"fingerprint": fingerprint, "size": output_stat.st_size, "mtime_ns": output_stat.st_mtime_ns}
+    write_to_file(str(get_build_record_path(output_file)), json.dumps(record))
+
+
+def is_build_current(output_file: str, fingerprint: str) -> bool:
+    """Checks whether a zipapp was built from the same inputs and is untouched since"""
+    try:
+        record = json.loads(get_build_record_path(output_file).read_text())
+        output_stat = os.stat(output_file)
+    except (OSError, ValueError):
+        return False
+    return record == {"fingerprint": fingerprint, "size": output_stat.st_size, "mtime_ns": output_stat.st_mtime_ns}
+
+
+def get_imported_modules(source: Union[str, bytes]) -> set[str]:
+    """Statically collects the top-level modules a module imports, including imports
+    nested in functions or try blocks and `import_module` calls with a literal name.
+    Relative imports are skipped and unparsable sources import nothing."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+
+    modules: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split(".")[0])
+        elif (
+            isinstance(node, ast.Call)
+            and getattr(node.func, "id", getattr(node.func, "attr", None)) in DYNAMIC_IMPORT_FUNCTIONS
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            modules.add(node.args[0].value.split(".")[0])
+    return modules
+
+
+def get_build_requirements(script_path: str, deps: list[str]) -> list[str]:
+    """Gets the requirements to install for a generated CLI: the manifest requires plus
+    only the CLI framework its commander generated code for, e.g. rich-click for `use_click`."""
+    imports = get_imported_modules(Path(script_path).read_bytes()) if os.path.exists(script_path) else set()
+    frameworks = [requirement for module, requirement in FRAMEWORK_REQUIREMENTS.items() if module in imports]
+    return (frameworks or ["typer"]) + deps
+
+
+def prune_site_packages(site_packages: str, entry_modules: list[str]) -> list[str]:
+    """Removes installed distributions that are never imported, following imports
+    statically from the entry modules through site-packages.
+
+    Modules imported only dynamically, or only by native extensions, can't be seen
+    and are pruned too, so this is opt-in.
+
+    Args:
+        site_packages (str): Staging dir with distributions installed by pip
+        entry_modules (list[str]): Top-level modules the zipapp runs
+
+    Returns:
+        list[str]: Names of the pruned distributions
+    """
+    site = Path(site_packages)
+    reachable = get_reachable_modules(site, entry_modules)
+    pruned = []
+    for record_path in sorted(site.glob("*.dist-info/RECORD")):
+        files = [row[0] for row in csv.reader(record_path.read_text().splitlines()) if row and "../" not in row[0]]
+        top_levels = {get_top_level_module(site, file) for file in files} - {None}
+        if not top_levels or top_levels & reachable:
+            continue
+
+        for file in files:
+            with contextlib.suppress(OSError):
+                (site / file).unlink()
+        shutil.rmtree(record_path.parent, ignore_errors=True)
+        pruned.append(record_path.parent.name.split("-")[0])
+
+    for root, _, _ in os.walk(site_packages, topdown=False):
+        if root != site_packages and not os.listdir(root):
+            os.rmdir(root)
+    return pruned
+
+
+def get_top_level_module(site: Path, file: str) -> Optional[str]:
+    """Gets the importable top-level module a RECORD entry belongs to, if any"""
+    top_level = file.split("/")[0]
+    if top_level.endswith(".dist-info") or top_level == "__pycache__":
+        return None
+    if "/" in file and (site / top_level).is_dir():
+        return top_level
+    if top_level.endswith((".py", *NATIVE_SUFFIXES)):
+        return top_level.split(".")[0]
+    return None
+
+
+def get_reachable_modules(site: Path, entry_modules: list[str]) -> set[str]:
+    """Gets the top-level modules transitively imported from entry modules. Packages are
+    scanned as a whole, so any import anywhere in a package keeps its target."""
+    reachable: set[str] = set()
+    pending = list(entry_modules)
+    while pending:
+        module = pending.pop()
+        if module in reachable:
+            continue
+        reachable.add(module)
+
+        if (site / module).is_dir():
+            module_files = list((site / module).rglob("*.py"))
+        else:
+            module_files = [path for path in [site / f"{module}.py"] if path.exists()]
+        for module_file in module_files:
+            pending.extend(get_imported_modules(module_file.read_bytes()) - reachable)
+    return reachable
+
+
+def get_size_report(zipapp_path: str) -> list[tuple[str, int]]:
+    """Sums the compressed size of a zipapp's entries per distribution, largest first.
+    Files not installed by a distribution are reported by their top-level name."""
+    sizes: dict[str, int] = {}
+    with zipfile.ZipFile(zipapp_path) as archive:
+        owners: dict[str, str] = {}
+        for record_name in [name for name in archive.namelist() if name.endswith(".dist-info/RECORD")]:
+            dist_info = posixpath.dirname(record_name)
+            root, dist_name = posixpath.dirname(dist_info), posixpath.basename(dist_info).split("-")[0]
+            owners[dist_info] = dist_name
+            for row in csv.reader(archive.read(record_name).decode("utf-8").splitlines()):
+                if row and "../" not in row[0]:
+                    owners.setdefault(posixpath.join(root, row[0].split("/")[0]), dist_name)
+
+        for info in archive.infolist():
+            # shiv zipapps keep dependencies under site-packages/, zipapps built by fast-start at the root
+            prefix = "site-packages/" if info.filename.startswith("site-packages/") else ""
+            top_level = prefix + info.filename[len(prefix) :].split("/")[0]
+            owner = owners.get(top_level, posixpath.basename(top_level).split(".")[0])
+            sizes[owner] = sizes.get(owner, 0) + info.compress_size
+
+    return sorted(sizes.items(), key=lambda size: size[1], reverse=True)
+
+
+def normalize_requirements(deps: list[str]) -> list[str]:
+    """Normalizes requirement specifiers so equivalent requirement sets share a cache key"""
+    requirements = set()
+    for dep in deps:
+        try:
+            requirement = Requirement(dep)
+            requirement.name = canonicalize_name(requirement.name)
+            requirements.add(str(requirement))
+        except InvalidRequirement:
+            requirements.add(dep.strip())
+    return sorted(requirements)
+
+
+def get_layer_key(requirements: list[str], wheelhouse: Optional[str] = None) -> str:
+    """Fingerprints a normalized requirement set for the running interpreter and platform,
+    and the wheelhouse it's installed from, if any, by its path and wheel files"""
+    fingerprint = {
+        "requirements": requirements,
+        "interpreter": sys.implementation.cache_tag,
+        "platform": sysconfig.get_platform(),
+        "wheelhouse": [os.path.abspath(wheelhouse), sorted(os.listdir(wheelhouse))] if wheelhouse else None,
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def get_site_packages_layer(deps: list[str], wheelhouse: Optional[str] = None, refresh: bool = False) -> Path:
+    """Gets the cached site-packages layer for a requirement set, installing it on a cache miss.
+
+    Layers are installed into a staging dir and renamed into place, so a layer is
+    either complete or absent, and concurrent builds of the same layer are safe.
+
+    Args:
+        deps (list[str]): Requirement specifiers
+        wheelhouse (Optional[str]): Directory of wheels to install from instead of the package index
+        refresh (bool): Reinstall the layer even if it's cached, replacing the cached one
+
+    Returns:
+        Path: Layer directory
+    """
+    requirements = normalize_requirements(deps)
+    layers_dir = Path(CLIFFY_CACHE_DIR) / "layers"
+    layer_dir = layers_dir / get_layer_key(requirements, wheelhouse)
+    if layer_dir.exists() and not refresh:
+        return layer_dir
+
+    layers_dir.mkdir(parents=True, exist_ok=True)
+    staging_dir = mkdtemp(prefix=".staging-", dir=layers_dir)
+    stale_dir = mkdtemp(prefix=".stale-", dir=layers_dir)
+    try:
+        pip_args = ["--target", staging_dir]
+        if wheelhouse:
+            pip_args += ["--no-index", "--find-links", wheelhouse]
+        pip.install(pip_args + requirements)
+        if refresh and layer_dir.exists():
+            # move the cached layer aside so the fresh one can take its name
+            with contextlib.suppress(OSError):
+                os.rename(layer_dir, os.path.join(stale_dir, "layer"))
+        # another build may have published the same layer first
+        with contextlib.suppress(OSError):
+            os.rename(staging_dir, layer_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+    return layer_dir
+
+
+def link_tree(src: Path, dst: str) -> None:
+    """Populates dst with src's files, hardlinking where possible and copying otherwise"""
+    shutil.copytree(src, dst, symlinks=True, copy_function=link_or_copy, dirs_exist_ok=True)
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Hardlinks src to dst, falling back to a copy across filesystems or on unsupported platforms"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def run_cli(cli_name: str, script_code: str, args: tuple) -> None:
+    module = import_module_from_code(cli_name, script_code)
+    sys.argv = [cli_name] + list(args)
+    try:
+        module.cli()
+    finally:
+        sys.modules.pop(module.__name__, None)
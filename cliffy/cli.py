@@ -1,16 +1,19 @@
+import contextlib
+import glob
+import os
+from importlib import import_module
 from io import TextIOWrapper
-from typing import Any, TextIO, Union
-import traceback
-import sys
+from typing import TYPE_CHECKING, Any, Optional, TextIO, Union
+import subprocess
+import time
 
-from cliffy.tester import ShellScript, Tester
+from cliffy.rich import click, ClickGroup, Console, print_rich_table  # type: ignore
 
-from cliffy.rich import click, Console, print_rich_table  # type: ignore
-
-from cliffy.builder import build_cli, build_cli_from_manifest, run_cli
 from cliffy.helper import (
-    CLIFFY_CLI_DIR,
+    BUILD_PROFILES,
+    RELOAD_DELAY,
     age_datetime,
+    delete_temp_files,
     exit_err,
     indent_block,
     out,
@@ -18,12 +21,16 @@ from cliffy.helper import (
     write_to_file,
     ManifestOrCLI,
 )
-from cliffy.homer import get_clis, get_metadata, get_metadata_path, remove_metadata, save_metadata
+from cliffy.homer import get_clis, get_metadata, has_metadata, remove_metadata, save_metadata
 from cliffy.loader import Loader
 from cliffy.manifest import CLIManifest
-from cliffy.transformer import Transformer
-from cliffy.reloader import Reloader
-from cliffy.doc import DocGenerator
+from cliffy import daemon as cliffy_daemon
+
+# modules pulling in heavy dependencies (yaml/jinja2, shiv, watchdog, typer.testing) are
+# imported inside the commands using them, so commands like `cli ls` start fast
+if TYPE_CHECKING:
+    from cliffy.builder import BuildTarget
+    from cliffy.tester import ManifestReport
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 ALIASES = {
@@ -34,6 +41,29 @@ ALIASES = {
     "rm-all": "remove-all",
     "rmall": "remove-all",
 }
+# commands in modules with optional dependencies, imported when dispatched or listed in help
+LAZY_COMMANDS = {"ai": "cliffy.ai:ai"}
+
+
+class LazyGroup(ClickGroup):  # type: ignore
+    """Group that imports `lazy_commands` ({name: "module:attribute"}) only when they're needed.
+    Commands whose module fails to import are left out."""
+
+    def __init__(self, *args: Any, lazy_commands: Optional[dict[str, str]] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: Any) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: Any, cmd_name: str) -> Any:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(":")
+            try:
+                self.add_command(getattr(import_module(module_name), attribute), cmd_name)
+            except Exception:
+                return None
+        return super().get_command(ctx, cmd_name)
 
 
 def show_aliases_callback(ctx: Any, param: Any, val: bool) -> None:
@@ -44,7 +74,7 @@ def show_aliases_callback(ctx: Any, param: Any, val: bool) -> None:
         ctx.exit()
 
 
-@click.group(context_settings=CONTEXT_SETTINGS)
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS, context_settings=CONTEXT_SETTINGS)
 @click.version_option()
 @click.option("--aliases", type=bool, is_flag=True, is_eager=True, callback=show_aliases_callback)
 def cli(aliases: bool) -> None:
@@ -54,10 +84,13 @@ def cli(aliases: bool) -> None:
 @click.argument("manifests", type=click.File("rb"), nargs=-1)
 def load(manifests: list[TextIO]) -> None:
     """Load CLI for given manifest(s)"""
+    from cliffy.transformer import Transformer
+
     for manifest in manifests:
         T = Transformer(manifest)
-        Loader.load_from_cli(T.cli)
-        save_metadata(manifest.name, T.cli)
+        with Loader.lock(T.cli.name):
+            Loader.load_from_cli(T.cli)
+            save_metadata(manifest.name, T.cli, resolved_manifest=T.manifest.model_dump_json())
         out(f"✨ Generated {T.cli.name} CLI v{T.cli.version} ✨", fg="green")
         out("$", fg="magenta", nl=False)
         out(f" {T.cli.name} -h")
@@ -66,11 +99,14 @@ def load(manifests: list[TextIO]) -> None:
 @click.argument("cli_names", type=str, nargs=-1)
 def update(cli_names: list[str]) -> None:
     """Reloads CLI by name"""
+    from cliffy.transformer import Transformer
+
     for cli_name in cli_names:
         if cli_metadata := get_metadata(cli_name):
             T = Transformer(open(cli_metadata.runner_path, "r"))
-            Loader.load_from_cli(T.cli)
-            save_metadata(cli_metadata.runner_path, T.cli)
+            with Loader.lock(T.cli.name):
+                Loader.load_from_cli(T.cli)
+                save_metadata(cli_metadata.runner_path, T.cli, resolved_manifest=T.manifest.model_dump_json())
             out(f"✨ Reloaded {T.cli.name} CLI v{T.cli.version} ✨", fg="green")
             out("$", fg="magenta", nl=False)
             out(f" {T.cli.name} -h")
@@ -81,6 +117,8 @@ def update(cli_names: list[str]) -> None:
 @click.argument("manifest", type=click.File("rb"))
 def render(manifest: TextIO) -> None:
     """Render the CLI manifest generation as code"""
+    from cliffy.transformer import Transformer
+
     T = Transformer(manifest)
     console = Console()
     console.print(T.cli.code, overflow="fold", emoji=False, markup=False)
@@ -91,6 +129,9 @@ def render(manifest: TextIO) -> None:
 @click.argument("cli_args", type=str, nargs=-1)
 def cliffy_run(manifest: TextIO, cli_args: tuple[str]) -> None:
     """Run CLI for a manifest"""
+    from cliffy.builder import run_cli
+    from cliffy.transformer import Transformer
+
     T = Transformer(manifest)
     run_cli(T.cli.name, T.cli.code, cli_args)
 
@@ -150,9 +191,10 @@ def cliffy_list() -> None:
 def remove(cli_names: list[str]) -> None:
     """Remove a loaded CLI by name"""
     for cli_name in cli_names:
-        if get_metadata_path(cli_name):
-            remove_metadata(cli_name)
-            Loader.unload_cli(cli_name)
+        if has_metadata(cli_name):
+            with Loader.lock(cli_name):
+                remove_metadata(cli_name)
+                Loader.unload_cli(cli_name)
             out(f"~ {cli_name} removed 💥", fg="green")
         else:
             out_err(f"~ {cli_name} not loaded")
@@ -161,8 +203,9 @@ def remove(cli_names: list[str]) -> None:
 def remove_all() -> None:
     """Remove all loaded CLIs"""
     for metadata in get_clis():
-        remove_metadata(metadata.cli_name)
-        Loader.unload_cli(metadata.cli_name)
+        with Loader.lock(metadata.cli_name):
+            remove_metadata(metadata.cli_name)
+            Loader.unload_cli(metadata.cli_name)
         out(f"~ {metadata.cli_name} removed 💥", fg="green")
 
 
@@ -176,40 +219,211 @@ def remove_all() -> None:
     default="/usr/bin/env python3",
     show_default=True,
 )
-def build(cli_or_manifests: list[Union[TextIOWrapper, str]], output_dir: str, python: str) -> None:
-    """Build a CLI manifest or a loaded CLI into a zipapp"""
+@click.option(
+    "--wheelhouse",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    help="Install requirements only from wheels in this directory. Allows building without network access.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of targets to build in parallel.",
+)
+@click.option(
+    "--fleet",
+    type=str,
+    default=None,
+    help="Build all targets into one zipapp with this name, sharing dependencies. "
+    "A link per CLI name is created next to it, or run it as `<fleet> <cli name> ...`.",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(BUILD_PROFILES),
+    default="default",
+    show_default=True,
+    help="fast-start ships precompiled, uncompressed bytecode without tests and docs, "
+    "and runs pure-Python zipapps without extracting them. Reports cold and warm start times.",
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Remove installed requirements the CLI never imports. "
+    "Imports are found statically, so requirements only imported dynamically are removed too.",
+)
+@click.option("--size-report", is_flag=True, help="Print the size of each package in the built zipapps.")
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Rebuild targets even if their inputs are unchanged since the last build, reinstalling their dependencies.",
+)
+def build(
+    cli_or_manifests: list[Union[TextIOWrapper, str]],
+    output_dir: str,
+    python: str,
+    wheelhouse: Optional[str],
+    jobs: int,
+    fleet: Optional[str],
+    profile: str,
+    prune: bool,
+    size_report: bool,
+    force: bool,
+) -> None:
+    """Build CLI manifests or loaded CLIs into zipapps"""
+    from cliffy.builder import BuildTarget, build_targets, get_output_file, write_build_script
+    from cliffy.transformer import Transformer
+
+    targets = []
     for cli_or_manifest in cli_or_manifests:
         if isinstance(cli_or_manifest, TextIOWrapper):
-            cli, result = build_cli_from_manifest(cli_or_manifest, output_dir=output_dir, interpreter=python)
-            cli_name = cli.name
+            T = Transformer(cli_or_manifest, validate_requires=False)
+            cli_name, script_path, deps = T.cli.name, write_build_script(T.cli), T.cli.requires
         else:
             cli_name = cli_or_manifest
             if not (metadata := get_metadata(cli_name)):
                 out_err(f"~ {cli_name} not loaded")
                 continue
+            script_path, deps = Loader.get_cli_path(cli_name), metadata.requires
 
-            result = build_cli(
-                cli_name,
-                script_path=f"{CLIFFY_CLI_DIR}/{cli_name}.py",
-                deps=metadata.requires,
+        targets.append(
+            BuildTarget(
+                cli_name=cli_name,
+                script_path=script_path,
+                deps=deps,
                 output_dir=output_dir,
                 interpreter=python,
+                wheelhouse=wheelhouse,
+                profile=profile,
+                prune=prune,
             )
+        )
+
+    if fleet:
+        fleet_path = build_fleet_zipapp(
+            fleet,
+            targets,
+            output_dir=output_dir,
+            interpreter=python,
+            wheelhouse=wheelhouse,
+            profile=profile,
+            prune=prune,
+            force=force,
+        )
+        if size_report:
+            report_size(fleet_path)
+        return
+
+    failed = []
+    try:
+        for outcome in build_targets(targets, jobs=jobs, force=force):
+            if outcome.skipped:
+                out(f"= {outcome.cli_name} unchanged, skipped build")
+                continue
+            if outcome.exit_code != 0:
+                out(outcome.output)
+                out_err(f"~ {outcome.cli_name} build failed")
+                failed.append(outcome.cli_name)
+                continue
 
-        if result.exit_code != 0:
-            out(result.stdout)
-            if result.exception:
-                out(str(result.exception))
-            out_err(f"~ {cli_name} build failed")
-            continue
+            out(f"+ {outcome.cli_name} built 📦", fg="green")
+            artifact = get_output_file(output_dir, outcome.cli_name)
+            if profile == "fast-start":
+                report_startup(artifact)
+            if size_report:
+                report_size(artifact)
+    finally:
+        delete_temp_files()
+
+    if failed:
+        exit_err(f"~ {len(failed)} of {len(targets)} builds failed: {', '.join(failed)}")
+
+
+def build_fleet_zipapp(
+    fleet_name: str,
+    targets: list["BuildTarget"],
+    output_dir: str,
+    interpreter: str,
+    wheelhouse: Optional[str],
+    profile: str = "default",
+    prune: bool = False,
+    force: bool = False,
+) -> str:
+    from cliffy.builder import (
+        build_fleet,
+        get_build_fingerprint,
+        get_output_file,
+        is_build_current,
+        link_fleet_clis,
+        record_build,
+    )
+
+    cli_names = [target.cli_name for target in targets]
+    if duplicates := sorted({name for name in cli_names if cli_names.count(name) > 1}):
+        exit_err(f"~ duplicate CLI names in fleet: {', '.join(duplicates)}")
+    if fleet_name in cli_names:
+        exit_err(f"~ fleet name {fleet_name} is also a CLI name in the fleet, pick another --fleet name")
 
-        out(f"+ {cli_name} built 📦", fg="green")
+    fleet_path = get_output_file(output_dir, fleet_name)
+    fingerprint = get_build_fingerprint(fleet_name, targets)
+    if not force and is_build_current(fleet_path, fingerprint):
+        delete_temp_files()
+        out(f"= {fleet_name} unchanged, skipped build")
+        return fleet_path
+
+    try:
+        result = build_fleet(
+            fleet_name,
+            targets,
+            output_dir=output_dir,
+            interpreter=interpreter,
+            wheelhouse=wheelhouse,
+            profile=profile,
+            prune=prune,
+            refresh_layer=force,
+        )
+    finally:
+        delete_temp_files()
+
+    if result.exit_code != 0:
+        out(result.stdout)
+        if result.exception:
+            out(str(result.exception))
+        exit_err(f"~ {fleet_name} fleet build failed")
+
+    record_build(fleet_path, fingerprint)
+    _, skipped_links = link_fleet_clis(fleet_path, cli_names)
+    for skipped_link in skipped_links:
+        out_err(f"~ {skipped_link} exists and isn't a link to {fleet_name}, left it in place")
+    out(f"+ {fleet_name} built with {', '.join(cli_names)} 📦", fg="green")
+    if profile == "fast-start":
+        report_startup(fleet_path)
+    return fleet_path
+
+
+def report_startup(artifact: str) -> None:
+    from cliffy.builder import measure_startup
+
+    cold_start, warm_start = measure_startup(artifact)
+    out(f"⏱ cold start {cold_start * 1000:.0f}ms, warm start {warm_start * 1000:.0f}ms")
+
+
+def report_size(artifact: str) -> None:
+    from cliffy.builder import get_size_report
+
+    sizes = get_size_report(artifact)
+    total = sum(size for _, size in sizes)
+    out(f"{artifact}: {total / 1024:.0f} KiB")
+    for package, size in sizes:
+        out(f"  {package.ljust(24)} {size / 1024:>8.0f} KiB {size / total:>6.1%}")
 
 
 @click.argument("cli_name", type=str)
 def info(cli_name: str) -> None:
     """Display CLI info"""
-    metadata = get_metadata(cli_name) or exit_err(f"~ {cli_name} not loaded")
+    metadata = get_metadata(cli_name, load_manifest=True) or exit_err(f"~ {cli_name} not loaded")
     out(f"{click.style('name:', fg='blue')} {metadata.cli_name}")
     out(f"{click.style('version:', fg='blue')} {metadata.version}")
     out(f"{click.style('requires:', fg='blue')} {metadata.requires}")
@@ -217,7 +431,14 @@ def info(cli_name: str) -> None:
     out(f"{click.style('manifest:', fg='blue')}\n{indent_block(metadata.manifest, spaces=2)}")
 
 
-@click.argument("manifest", type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True))
+def validate_dev_target(ctx: Any, param: Any, target: str) -> str:
+    # globs are matched when watching, anything else must be an existing manifest or directory
+    if glob.has_magic(target):
+        return target
+    return str(click.Path(exists=True, readable=True).convert(target, param, ctx))
+
+
+@click.argument("manifest", type=str, callback=validate_dev_target)
 @click.option(
     "--run-cli",
     type=str,
@@ -225,23 +446,48 @@ def info(cli_name: str) -> None:
     help="If passed, runs CLI on each reload. Useful for syntax checks or testing command execution on each reload",
     is_flag=True,
 )
+@click.option(
+    "--delay",
+    type=click.FloatRange(min=0),
+    default=RELOAD_DELAY,
+    show_default=True,
+    help="Seconds to wait after the last change before reloading. Changes within the delay are applied together.",
+)
 @click.argument("run-cli-args", type=str, nargs=-1)
-def dev(manifest: str, run_cli: bool, run_cli_args: tuple[str]) -> None:
-    """Start hot-reloader for a manifest for active development.
+def dev(manifest: str, run_cli: bool, delay: float, run_cli_args: tuple[str]) -> None:
+    """Start hot-reloader for a manifest, or for all manifests in a directory or matching a glob,
+    for active development.
 
     Examples:
 
     - cli dev examples/hello.yaml
 
+    - cli dev examples/
+
+    - cli dev "clis/**/*.yaml"
+
     - cli dev examples/hello.yaml --run-cli  -- -h
 
     - cli dev examples/hello.yaml --run-cli hello
     """
+    from cliffy.reloader import MultiReloader, Reloader, find_manifests
+
+    if os.path.isfile(manifest):
+        out(f"🔄 Watching {manifest} for changes...\n", fg="magenta")
+        Reloader.watch(manifest, run_cli, run_cli_args, delay=delay)
+        return
+
+    if run_cli:
+        exit_err("~ --run-cli needs a single manifest")
+    if not find_manifests(manifest):
+        exit_err(f"~ no manifests found in {manifest}")
     out(f"🔄 Watching {manifest} for changes...\n", fg="magenta")
-    Reloader.watch(manifest, run_cli, run_cli_args)
+    MultiReloader.watch(manifest, delay=delay)
 
 
-@click.argument("manifest", type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True))
+@click.argument(
+    "manifests", type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True), nargs=-1, required=True
+)
 @click.option(
     "--exitfirst",
     "-x",
@@ -250,47 +496,157 @@ def dev(manifest: str, run_cli: bool, run_cli_args: tuple[str]) -> None:
     default=False,
     help="exit instantly on first error or failed test.",
 )
-def test(manifest: str, exitfirst: bool) -> None:
-    """Run tests defined in a manifest"""
-    tester = Tester(manifest)
-    if not tester.test_pipeline:
-        exit_err("Missing tests section in manifest")
-    out("✨ Invoking tests ✨", nl=False)
-    total = tester.total_cases
-    passed = 0
-    for i, case in enumerate(tester.test_pipeline):
-        if isinstance(case, ShellScript):
-            tester.invoke_shell(case)
-            continue
-
-        out(f"\n\n🪄 > {tester.T.cli.name} {case.command}\n")
-        try:
-            test = tester.invoke_test(case.command, case.assert_script)
-            result = next(test)
-            out("⚗️ > \n" + result.output)
-            if result.exception:
-                out(str(result))
-            next(test, "")
-            out(f"\n✅ {i + 1} of {total}")
-            passed += 1
-        except AssertionError:
-            _, _, tb = sys.exc_info()
-            tb_info = traceback.extract_tb(tb)
-            _, line_no, _, _ = tb_info[-1]
-            expr = case.assert_script.split("\n")[line_no - 1]
-            out(f"💔 AssertionError: (line {line_no}) > {expr}")
-            if exitfirst:
-                exit()
-        except SyntaxError:
-            out("💔 Syntax error")
-            traceback.print_exc()
-            if exitfirst:
-                exit()
-        except Exception:
-            out("💔 Exception")
-            traceback.print_exc()
-            if exitfirst:
-                exit()
+@click.option(
+    "--jobs",
+    "-n",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Run test cases in this many parallel processes forked from the loaded CLI. "
+    "Cases defined in one mapping run in order, and shell scripts run once all cases before them finished.",
+)
+@click.option(
+    "--changed",
+    is_flag=True,
+    default=False,
+    help="Only run cases whose command's code changed since they last passed, and cases that failed.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep watching the manifests and re-run the affected cases on each change.",
+)
+@click.option(
+    "--delay",
+    type=click.FloatRange(min=0),
+    default=RELOAD_DELAY,
+    show_default=True,
+    help="With --watch, seconds to wait after the last change before re-running tests.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Fail cases still running after this many seconds.",
+)
+@click.option(
+    "--durations",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Report the N slowest test cases and shell scripts, 0 for all.",
+)
+@click.option(
+    "--junit-xml", type=click.Path(dir_okay=False), default=None, help="Write results with timings as JUnit XML."
+)
+@click.option(
+    "--json-report", type=click.Path(dir_okay=False), default=None, help="Write results with timings as JSON."
+)
+def test(
+    manifests: tuple[str, ...],
+    exitfirst: bool,
+    jobs: int,
+    changed: bool,
+    watch: bool,
+    delay: float,
+    timeout: Optional[float],
+    durations: Optional[int],
+    junit_xml: Optional[str],
+    json_report: Optional[str],
+) -> None:
+    """Run tests defined in manifests"""
+
+    def run(changed: bool) -> None:
+        run_manifest_tests(
+            manifests,
+            exitfirst=exitfirst,
+            jobs=jobs,
+            changed=changed,
+            timeout=timeout,
+            durations=durations,
+            junit_xml=junit_xml,
+            json_report=json_report,
+        )
+
+    if not watch:
+        run(changed)
+        return
+
+    from cliffy.reloader import TestWatcher
+
+    with contextlib.suppress(SystemExit):
+        run(changed)
+    out(f"\n🔄 Watching {', '.join(manifests)} for changes...\n", fg="magenta")
+    TestWatcher.watch_tests(list(manifests), lambda: run(True), delay=delay)
+
+
+def run_manifest_tests(
+    manifests: tuple[str, ...],
+    exitfirst: bool = False,
+    jobs: int = 1,
+    changed: bool = False,
+    timeout: Optional[float] = None,
+    durations: Optional[int] = None,
+    junit_xml: Optional[str] = None,
+    json_report: Optional[str] = None,
+) -> None:
+    from cliffy.tester import ManifestReport, Tester, write_json_report, write_junit_xml
+
+    reports: list[ManifestReport] = []
+    untested = []
+    try:
+        for manifest in manifests:
+            tester = Tester(manifest)
+            if not tester.test_pipeline:
+                if len(manifests) == 1:
+                    exit_err(f"Missing tests section in {manifest}")
+                out_err(f"~ Missing tests section in {manifest}, skipped")
+                untested.append(manifest)
+                continue
+            if changed and not tester.select_changed_cases():
+                out(f"✨ No changed tests in {manifest} ✨")
+                continue
+
+            out(f"✨ Invoking {manifest} tests ✨" if len(manifests) > 1 else "✨ Invoking tests ✨", nl=False)
+            report = ManifestReport(manifest=manifest, cli_name=tester.T.cli.name)
+            reports.append(report)
+            # closing stops the test processes still running when exiting on the first failure
+            with contextlib.closing(tester.run_tests(jobs=jobs, timeout=timeout)) as results:
+                try:
+                    for result in results:
+                        report.results.append(result)
+                        out(f"\n\n🪄 > {tester.T.cli.name} {result.command}\n")
+                        if result.output is not None:
+                            out("⚗️ > \n" + result.output)
+                            if result.exception:
+                                out(result.exception)
+                        if result.passed:
+                            out(f"\n✅ {result.number} of {tester.total_cases} in {result.timing.wall:.2f}s")
+                            continue
+
+                        out(f"💔 {result.failure} ({result.timing.wall:.2f}s)")
+                        if result.traceback:
+                            click.echo(result.traceback, err=True, nl=False)
+                        if exitfirst:
+                            exit()
+                finally:
+                    report.shell_results = tester.shell_results
+                    tester.record_results(report.results)
+    finally:
+        if durations is not None:
+            report_durations(reports, durations)
+        if junit_xml:
+            write_junit_xml(junit_xml, reports)
+        if json_report:
+            write_json_report(json_report, reports)
+
+    if len(untested) == len(manifests):
+        exit_err("Missing tests section in every manifest")
+
+    total = sum(len(report.results) for report in reports)
+    passed = sum(result.passed for report in reports for result in report.results)
+    if not total:
+        return
 
     if not passed:
         exit_err("All tests failed")
@@ -301,9 +657,79 @@ def test(manifest: str, exitfirst: bool) -> None:
         out("\n\n💛 Some tests failed :(")
 
 
+def report_durations(reports: list["ManifestReport"], count: int) -> None:
+    steps = [(result.timing, f"{report.cli_name} {result.command}") for report in reports for result in report.results]
+    steps += [(shell.timing, f"$ {shell.command}") for report in reports for shell in report.shell_results]
+    slowest = sorted(steps, key=lambda step: step[0].wall, reverse=True)[: count or None]
+    out(f"\n\n⏱ {len(slowest)} slowest test steps")
+    out(f"  {'wall':>8} {'cpu':>8} {'children':>9}")
+    for timing, name in slowest:
+        out(f"  {timing.wall:>7.2f}s {timing.cpu:>7.2f}s {timing.children:>8.2f}s  {name}")
+
+
+@click.argument("manifest", type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True), required=True)
+@click.option(
+    "--baseline",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="JSON file with the baseline latencies to compare against, created if missing. "
+    "Defaults to <manifest>.bench.json next to the manifest.",
+)
+@click.option("--update-baseline", is_flag=True, default=False, help="Record this run's latencies as the new baseline.")
+@click.option(
+    "--max-regression",
+    type=click.FloatRange(min=0),
+    default=25.0,
+    show_default=True,
+    help="Fail when a p50 or p95 latency exceeds its baseline by more than this percentage.",
+)
+def bench(manifest: str, baseline: Optional[str], update_baseline: bool, max_regression: float) -> None:
+    """Run benchmarks defined in a manifest"""
+    from cliffy.bencher import Bencher, BenchmarkBaseline, get_baseline_path
+
+    bencher = Bencher(manifest)
+    if not bencher.benchmarks:
+        exit_err(f"Missing benchmarks section in {manifest}")
+
+    benchmark_baseline = BenchmarkBaseline(
+        baseline or get_baseline_path(manifest), update=update_baseline, max_regression=max_regression
+    )
+    out("⏱ Running benchmarks ⏱")
+    results = []
+    for result in bencher.run_benchmarks():
+        benchmark_baseline.check(result)
+        results.append(result)
+        out(f"{'💔' if result.failures else '✅'} {result.name}")
+
+    rows = [
+        [result.command, result.mode, *(f"{value:.1f}ms" for value in result.stats.values())]
+        if result.runs
+        else [result.command, result.mode, *["-"] * 5]
+        for result in results
+    ]
+    print_rich_table(
+        ["Command", "Mode", "Min", "Mean", "P50", "P95", "P99"],
+        rows,
+        styles=["cyan", "magenta", "green", "green", "green", "yellow", "red"],
+    )
+    if benchmark_baseline.needs_saving():
+        benchmark_baseline.save()
+        out(f"📝 Saved baseline to {benchmark_baseline.path}")
+
+    failed = [result for result in results if result.failures]
+    for result in failed:
+        for failure in result.failures:
+            out_err(f"{result.name}: {failure}")
+    if failed:
+        exit_err(f"{len(failed)} of {len(results)} benchmarks failed")
+    out("💚 All benchmarks passed!")
+
+
 @click.argument("manifest", type=click.File("rb"), required=True)
 def validate(manifest: TextIO) -> None:
     """Validate the syntax and structure of a CLI manifest"""
+    from cliffy.transformer import Transformer
+
     try:
         Transformer(manifest)
         out(f"Manifest {manifest.name} is valid", fg="green")
@@ -311,13 +737,55 @@ def validate(manifest: TextIO) -> None:
         out_err(f"Manifest {manifest.name} is invalid: {e}")
 
 
-@click.argument("cli_or_manifest", type=ManifestOrCLI())
-@click.option("--format", "-f", type=click.Choice(["md", "rst", "html"]), default="md")
+@click.argument("cli_or_manifest", type=ManifestOrCLI(), required=False)
+@click.option(
+    "--format",
+    "-f",
+    type=click.Choice(["md", "rst", "html"]),
+    default=None,
+    help="Output format. Defaults to md, or to every format with --all.",
+)
 @click.option(
     "--output-dir", "-o", type=click.Path(exists=True, dir_okay=True, file_okay=False), help="Output directory"
 )
-def docs(cli_or_manifest: str, format: str, output_dir: str) -> None:
+@click.option(
+    "--all",
+    "all_clis",
+    is_flag=True,
+    default=False,
+    help="Generate a documentation site for every loaded CLI, with index pages and a search index. "
+    "Pages of CLIs whose manifest is unchanged since the last run are skipped.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="With --all, number of CLIs to document in parallel.",
+)
+@click.option("--force", is_flag=True, default=False, help="With --all, regenerate pages of unchanged CLIs too.")
+def docs(
+    cli_or_manifest: Optional[Union[TextIOWrapper, str]],
+    format: Optional[str],
+    output_dir: str,
+    all_clis: bool,
+    jobs: int,
+    force: bool,
+) -> None:
     """Generate documentation for a CLI"""
+    from cliffy.doc import DocGenerator, load_cli_manifest
+    from cliffy.transformer import Transformer
+
+    if all_clis:
+        if cli_or_manifest:
+            exit_err("~ --all documents every loaded CLI, drop the CLI or manifest argument")
+        generate_docs_site([format] if format else None, output_dir, jobs=jobs, force=force)
+        return
+
+    if not cli_or_manifest:
+        exit_err("~ missing a CLI name or manifest, or --all")
+    format = format or "md"
     if isinstance(cli_or_manifest, TextIOWrapper):
         T = Transformer(cli_or_manifest)
         doc_generator = DocGenerator(T.manifest)  # type: ignore
@@ -326,11 +794,147 @@ def docs(cli_or_manifest: str, format: str, output_dir: str) -> None:
     else:
         metadata = get_metadata(cli_or_manifest)
         if metadata:
-            doc_generator = DocGenerator(CLIManifest.model_validate(metadata.manifest))
+            doc_generator = DocGenerator(load_cli_manifest(metadata))
             doc_generator.generate(format, output_dir)
             out(f"+ {metadata.cli_name}.{format}")
 
 
+def generate_docs_site(formats: Optional[list[str]], output_dir: Optional[str], jobs: int, force: bool) -> None:
+    from cliffy.doc import DOC_FORMATS, SEARCH_INDEX_FILE, generate_site
+
+    start = time.perf_counter()
+    generated = skipped = 0
+    failed = []
+    for outcome in generate_site(list(get_clis()), formats or list(DOC_FORMATS), output_dir, jobs=jobs, force=force):
+        if outcome.error:
+            out_err(f"~ {outcome.cli_name} docs failed: {outcome.error}")
+            failed.append(outcome.cli_name)
+        elif outcome.skipped:
+            skipped += 1
+        else:
+            generated += 1
+            out(f"+ {outcome.cli_name} documented 📚", fg="green")
+
+    search_index = os.path.join(output_dir or "", SEARCH_INDEX_FILE)
+    out(
+        f"~ {generated} documented, {skipped} unchanged in {time.perf_counter() - start:.2f}s, "
+        f"search index in {search_index}"
+    )
+    if failed:
+        exit_err(f"~ {len(failed)} of {generated + skipped + len(failed)} CLIs failed: {', '.join(failed)}")
+
+
+def start_server(label: str, idle_timeout: float, foreground: bool, cli_name: Optional[str] = None) -> None:
+    if not cliffy_daemon.is_supported():
+        exit_err(f"~ the {label} needs Unix sockets and fork, which this platform doesn't support")
+    try:
+        cliffy_daemon.make_socket_dir()
+    except PermissionError as e:
+        exit_err(f"~ {e}")
+
+    if pid := cliffy_daemon.request_control("ping", cli_name):
+        out(f"~ {label} already running (pid {pid})")
+        return
+
+    if foreground:
+        out(f"~ {label} listening on {cliffy_daemon.get_socket_path(cli_name)}")
+        cliffy_daemon.serve(idle_timeout, cli_name)
+        return
+
+    subprocess.Popen(
+        cliffy_daemon.get_daemon_command(idle_timeout, cli_name),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    for _ in range(100):
+        if pid := cliffy_daemon.request_control("ping", cli_name):
+            out(f"+ {label} started (pid {pid}) 🚀", fg="green")
+            return
+        time.sleep(0.1)
+    exit_err(f"~ {label} failed to start")
+
+
+def stop_server(label: str, cli_name: Optional[str] = None) -> None:
+    if pid := cliffy_daemon.request_control("stop", cli_name):
+        out(f"~ {label} stopped (pid {pid})", fg="green")
+    else:
+        out_err(f"~ {label} not running")
+
+
+def show_server_status(label: str, cli_name: Optional[str] = None) -> None:
+    if pid := cliffy_daemon.request_control("ping", cli_name):
+        out(f"~ {label} running (pid {pid}) on {cliffy_daemon.get_socket_path(cli_name)}")
+    else:
+        exit_err(f"~ {label} not running")
+
+
+idle_timeout_option = click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0),
+    default=cliffy_daemon.DAEMON_IDLE_TIMEOUT,
+    show_default=True,
+    help="Stop after this many seconds without requests. 0 to never stop.",
+)
+foreground_option = click.option(
+    "--foreground", is_flag=True, help="Serve in this process instead of in the background."
+)
+
+
+def daemon() -> None:
+    """Resident daemon that serves cli commands without re-importing cliffy each time"""
+
+
+@idle_timeout_option
+@foreground_option
+def daemon_start(idle_timeout: float, foreground: bool) -> None:
+    """Start the daemon. While it's running, cli commands are served by it.
+
+    Set CLIFFY_NO_DAEMON=1 to bypass it for a command.
+    """
+    start_server("daemon", idle_timeout, foreground)
+
+
+def daemon_stop() -> None:
+    """Stop the daemon"""
+    stop_server("daemon")
+
+
+def daemon_status() -> None:
+    """Show whether the daemon is running"""
+    show_server_status("daemon")
+
+
+def zygote() -> None:
+    """Per-CLI servers that run loaded CLIs from a pre-imported process"""
+
+
+@click.argument("cli_name", type=str)
+@idle_timeout_option
+@foreground_option
+def zygote_start(cli_name: str, idle_timeout: float, foreground: bool) -> None:
+    """Start a zygote for a loaded CLI. While it's running, the CLI's invocations are served by it.
+
+    Set CLIFFY_NO_DAEMON=1 to bypass it for a command.
+    """
+    if not get_metadata(cli_name):
+        exit_err(f"~ {cli_name} not loaded")
+    start_server(f"{cli_name} zygote", idle_timeout, foreground, cli_name)
+
+
+@click.argument("cli_name", type=str)
+def zygote_stop(cli_name: str) -> None:
+    """Stop a CLI's zygote"""
+    stop_server(f"{cli_name} zygote", cli_name)
+
+
+@click.argument("cli_name", type=str)
+def zygote_status(cli_name: str) -> None:
+    """Show whether a CLI's zygote is running"""
+    show_server_status(f"{cli_name} zygote", cli_name)
+
+
 # register commands
 load_command = cli.command("load")(load)
 build_command = cli.command("build")(build)
@@ -344,8 +948,17 @@ remove_all_command = cli.command("remove-all")(remove_all)
 run_command = cli.command("run")(cliffy_run)
 update_command = cli.command("update")(update)
 test_command = cli.command("test")(test)
+bench_command = cli.command("bench")(bench)
 validate_command = cli.command("validate")(validate)
 docs_command = cli.command("docs")(docs)
+daemon_group = cli.group("daemon")(daemon)
+daemon_start_command = daemon_group.command("start")(daemon_start)
+daemon_stop_command = daemon_group.command("stop")(daemon_stop)
+daemon_status_command = daemon_group.command("status")(daemon_status)
+zygote_group = cli.group("zygote")(zygote)
+zygote_start_command = zygote_group.command("start")(zygote_start)
+zygote_stop_command = zygote_group.command("stop")(zygote_stop)
+zygote_status_command = zygote_group.command("status")(zygote_status)
 
 # register aliases
 cli.command("add", hidden=True, epilog="Alias for load")(
@@ -15,7 +15,7 @@ class TyperCommander(Commander):
 
     def add_base_imports(self) -> None:
         self.cli = f"""## Generated {self.manifest.name} on {datetime.datetime.now()}\n"""
-        for imp in self.base_imports:
+        for imp in sorted(self.base_imports):
             self.cli += imp + "\n"
 
     def add_base_cli(self) -> None:
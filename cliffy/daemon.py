@@ -0,0 +1,407 @@
+"""Resident servers that run commands from a thin client in pre-imported processes.
+
+The cliffy daemon keeps cliffy and its dependencies imported to serve `cli`
+invocations. A zygote does the same for one loaded CLI, keeping its generated
+module and manifest imports loaded to serve the CLI's script. Both fork a child
+per request, which takes over the client's cwd, env, argv and stdio file
+descriptors. The `cli` entry point and loaded CLI scripts import this module
+before anything else when a server socket exists, so it only imports the
+standard library at module level.
+"""
+
+import contextlib
+import importlib
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# socket paths are resolved in the `cli` entry point module, which skips importing this one
+# when no server is listening
+from cliffy.run import get_socket_dir as get_socket_dir, get_socket_path as get_socket_path
+
+DAEMON_IDLE_TIMEOUT = 30 * 60
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT")
+# env vars cliffy's module-level paths are resolved from when the server starts
+SERVER_ENV_VARS = ("CLIFFY_CACHE_DIR", "XDG_CACHE_HOME", "HOME")
+INT_FORMAT = "!i"
+INT_SIZE = struct.calcsize(INT_FORMAT)
+PEERCRED_FORMAT = "3i"
+XUCRED_FORMAT = "2Ih"
+SOL_LOCAL = 0
+
+
+def is_private_dir(path: str) -> bool:
+    """Checks that a directory is owned by the current user and only accessible to them"""
+    try:
+        dir_stat = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(dir_stat.st_mode) and dir_stat.st_uid == os.getuid() and not dir_stat.st_mode & 0o077
+
+
+def make_socket_dir() -> str:
+    """Creates the socket directory with 0700 permissions, refusing one another user could write to"""
+    socket_dir = get_socket_dir()
+    with contextlib.suppress(FileExistsError):
+        os.makedirs(socket_dir, mode=0o700)
+    if not is_private_dir(socket_dir):
+        raise PermissionError(f"{socket_dir} must be a directory owned by the current user with 0700 permissions")
+    return socket_dir
+
+
+def get_peer_uid(conn: socket.socket) -> int:
+    """Gets the uid of the process on the other end of a Unix socket"""
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize(PEERCRED_FORMAT))
+        uid: int = struct.unpack(PEERCRED_FORMAT, creds)[1]
+    else:
+        # BSD and macOS struct xucred: version, uid, groups count
+        creds = conn.getsockopt(SOL_LOCAL, getattr(socket, "LOCAL_PEERCRED"), struct.calcsize(XUCRED_FORMAT))
+        uid = struct.unpack(XUCRED_FORMAT, creds)[1]
+    return uid
+
+
+def is_same_user(conn: socket.socket) -> bool:
+    try:
+        return get_peer_uid(conn) == os.getuid()
+    except OSError:
+        return False
+
+
+def get_cli_module(cli_name: str) -> str:
+    return f"cliffy.clis.{cli_name.replace('-', '_')}"
+
+
+def is_supported() -> bool:
+    return (
+        hasattr(socket, "AF_UNIX")
+        and hasattr(socket, "send_fds")
+        and hasattr(os, "fork")
+        and (hasattr(socket, "SO_PEERCRED") or hasattr(socket, "LOCAL_PEERCRED"))
+    )
+
+
+def send_int(conn: socket.socket, value: int) -> None:
+    conn.sendall(struct.pack(INT_FORMAT, value))
+
+
+def recv_exact(conn: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise EOFError("daemon connection closed")
+        data += chunk
+    return data
+
+
+def recv_int(conn: socket.socket) -> int:
+    value: int = struct.unpack(INT_FORMAT, recv_exact(conn, INT_SIZE))[0]
+    return value
+
+
+def connect(cli_name: Optional[str] = None) -> Optional[socket.socket]:
+    """Connects to the running cliffy daemon or CLI zygote. Only sockets in a private
+    directory served by the current user are trusted, since requests carry the
+    client's env and stdio.
+
+    Returns:
+        Optional[socket.socket]: Connection, or None if nothing trusted is listening
+    """
+    if not is_supported() or not is_private_dir(get_socket_dir()):
+        return None
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(get_socket_path(cli_name))
+    except OSError:
+        conn.close()
+        return None
+    if not is_same_user(conn):
+        conn.close()
+        return None
+    return conn
+
+
+def send_request(conn: socket.socket, request: dict[str, Any], fds: list[int]) -> None:
+    """Sends a request: its length and the stdio fds in one message, then the JSON payload"""
+    payload = json.dumps(request).encode()
+    socket.send_fds(conn, [struct.pack(INT_FORMAT, len(payload))], fds)
+    conn.sendall(payload)
+
+
+def forward(prog_name: str, argv: list[str], cli_name: Optional[str] = None) -> Optional[int]:
+    """Runs a `cli` invocation in the cliffy daemon, or a loaded CLI invocation in its
+    zygote, if one is running.
+
+    Signals received while the command runs are forwarded to the serving process.
+    Set `CLIFFY_NO_DAEMON` to always run locally.
+
+    Args:
+        prog_name (str): Program name the client was invoked as
+        argv (list[str]): Command line arguments
+        cli_name (Optional[str]): Loaded CLI name to forward to its zygote
+
+    Returns:
+        Optional[int]: Exit code, or None if the command should run locally
+    """
+    if os.environ.get("CLIFFY_NO_DAEMON"):
+        return None
+
+    conn = connect(cli_name)
+    if not conn:
+        return None
+
+    with conn:
+        request = {
+            "command": "run",
+            "prog_name": prog_name,
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "env": dict(os.environ),
+            "executable": sys.executable,
+        }
+        try:
+            send_request(conn, request, [0, 1, 2])
+            pid = recv_int(conn)
+        except (OSError, EOFError):
+            # the daemon declined the request, e.g. it's restarting after an upgrade
+            return None
+
+        previous_handlers = {}
+        for signal_name in FORWARDED_SIGNALS:
+            with contextlib.suppress(AttributeError, ValueError):
+                signum = getattr(signal, signal_name)
+                previous_handlers[signum] = signal.signal(signum, lambda signum, _: os.kill(pid, signum))
+        try:
+            return recv_int(conn)
+        except (OSError, EOFError):
+            return 1
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+
+def request_control(command: str, cli_name: Optional[str] = None) -> Optional[int]:
+    """Sends a control command (`ping` or `stop`) to the running cliffy daemon or CLI zygote
+
+    Returns:
+        Optional[int]: Server pid, or None if nothing is running
+    """
+    conn = connect(cli_name)
+    if not conn:
+        return None
+
+    with conn:
+        try:
+            send_request(conn, {"command": command, "executable": sys.executable}, [])
+            return recv_int(conn)
+        except (OSError, EOFError):
+            return None
+
+
+def get_source_mtime(cli_name: Optional[str] = None) -> int:
+    """Gets the latest modification time of the code a server has loaded: cliffy's own
+    modules for the daemon, the generated module for a zygote. 0 if it's missing."""
+    cliffy_dir = Path(__file__).parent
+    if cli_name:
+        source_paths = [cliffy_dir / "clis" / f"{cli_name.replace('-', '_')}.py"]
+    else:
+        source_paths = [path for path in cliffy_dir.glob("**/*.py") if "clis" not in path.relative_to(cliffy_dir).parts]
+    return max((path.stat().st_mtime_ns for path in source_paths if path.exists()), default=0)
+
+
+def preload(cli_name: Optional[str] = None) -> None:
+    """Imports everything the served commands use and warms caches the forked children inherit"""
+    if cli_name:
+        importlib.import_module(get_cli_module(cli_name))
+        return
+
+    import cliffy.run  # noqa: F401
+    import cliffy.cli  # noqa: F401
+    from cliffy.helper import get_installed_package_versions
+
+    # commands import these lazily, preloading them keeps forked commands fast
+    for module in (
+        "cliffy.transformer",
+        "cliffy.builder",
+        "cliffy.tester",
+        "cliffy.bencher",
+        "cliffy.reloader",
+        "cliffy.doc",
+        "cliffy.ai",
+    ):
+        with contextlib.suppress(Exception):
+            importlib.import_module(module)
+    with contextlib.suppress(Exception):
+        get_installed_package_versions()
+
+
+def serve(idle_timeout: float = DAEMON_IDLE_TIMEOUT, cli_name: Optional[str] = None) -> None:
+    """Serves requests until stopped or idle for `idle_timeout` seconds. The server
+    restarts in place when the code it loaded changes; a zygote stops when its CLI
+    is removed.
+
+    Args:
+        idle_timeout (float): Seconds without requests before exiting, 0 to never exit
+        cli_name (Optional[str]): Loaded CLI to serve as a zygote instead of the cliffy daemon
+    """
+    make_socket_dir()
+    socket_path = get_socket_path(cli_name)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    previous_umask = os.umask(0o077)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(previous_umask)
+    listener.listen(64)
+    try:
+        # clients connecting while this runs wait in the listen backlog
+        preload(cli_name)
+        # wake up regularly to reap children, check for idleness and source changes
+        listener.settimeout(1)
+
+        source_mtime = get_source_mtime(cli_name)
+        last_request = time.monotonic()
+        while True:
+            reap_children()
+            if (current_mtime := get_source_mtime(cli_name)) != source_mtime:
+                if not current_mtime:
+                    return
+                restart(listener, socket_path, idle_timeout, cli_name)
+
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                if idle_timeout and time.monotonic() - last_request > idle_timeout:
+                    return
+                continue
+
+            last_request = time.monotonic()
+            with conn:
+                if handle_connection(conn, listener, cli_name) == "stop":
+                    return
+    finally:
+        listener.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+
+
+def restart(listener: socket.socket, socket_path: str, idle_timeout: float, cli_name: Optional[str]) -> None:
+    """Replaces the server process with a fresh one running the updated code"""
+    listener.close()
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+    os.execv(sys.executable, get_daemon_command(idle_timeout, cli_name))
+
+
+def get_daemon_command(idle_timeout: float, cli_name: Optional[str] = None) -> list[str]:
+    server_args = ["zygote", "start", cli_name] if cli_name else ["daemon", "start"]
+    return [sys.executable, "-m", "cliffy", *server_args, "--foreground", "--idle-timeout", str(idle_timeout)]
+
+
+def reap_children() -> None:
+    with contextlib.suppress(ChildProcessError):
+        while os.waitpid(-1, os.WNOHANG)[0]:
+            pass
+
+
+def handle_connection(conn: socket.socket, listener: socket.socket, cli_name: Optional[str] = None) -> str:
+    """Reads a request and serves it, forking a child for `run` requests
+
+    Returns:
+        str: Served command
+    """
+    if not is_same_user(conn):
+        return ""
+
+    conn.settimeout(5)
+    try:
+        header, fds, _, _ = socket.recv_fds(conn, INT_SIZE, 3)
+        request = json.loads(recv_exact(conn, struct.unpack(INT_FORMAT, header)[0]))
+    except (OSError, EOFError, ValueError, struct.error):
+        return ""
+
+    command = request.get("command", "")
+    try:
+        # a client from another environment must not run with this daemon's packages
+        if request.get("executable") != sys.executable:
+            return ""
+        # paths like the cache dir were resolved from the server's env, let the client run
+        # commands locally if they'd resolve differently
+        if command == "run" and any(request["env"].get(var) != os.environ.get(var) for var in SERVER_ENV_VARS):
+            return ""
+
+        if command in ("ping", "stop"):
+            send_int(conn, os.getpid())
+        elif command == "run" and len(fds) == 3:
+            conn.settimeout(None)
+            if os.fork() == 0:
+                listener.close()
+                run_child(conn, request, fds, cli_name)
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return command
+
+
+def call_cli(cli: Callable[[], Any]) -> int:
+    """Calls a CLI entry point and gets the exit code the interpreter would exit with if it ran as a script"""
+    try:
+        return cli() or 0
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+def run_child(conn: socket.socket, request: dict[str, Any], fds: list[int], cli_name: Optional[str] = None) -> None:
+    """Runs an invocation in a forked child as the client process would. Never returns."""
+    exit_code = 1
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for signal_name in ("SIGTERM", "SIGHUP", "SIGQUIT"):
+            signal.signal(getattr(signal, signal_name), signal.SIG_DFL)
+        send_int(conn, os.getpid())
+
+        for target_fd, fd in enumerate(fds):
+            os.dup2(fd, target_fd)
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+        sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        sys.argv = [request["prog_name"], *request["argv"]]
+
+        if cli_name:
+            exit_code = call_cli(importlib.import_module(get_cli_module(cli_name)).cli)
+        else:
+            from cliffy.run import run_local
+
+            exit_code = call_cli(lambda: run_local(prog_name=request["prog_name"]))
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    finally:
+        with contextlib.suppress(Exception):
+            sys.stdout.flush()
+            sys.stderr.flush()
+        with contextlib.suppress(OSError):
+            send_int(conn, exit_code)
+        os._exit(exit_code)
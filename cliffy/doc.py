@@ -1,7 +1,30 @@
-from cliffy.manifest import CLIManifest, Example, RunBlock, RunBlockList, SimpleCommandParam, CommandParam
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, Optional
+import contextlib
+import io
+import json
+import os
+
+from cliffy.manifest import (
+    CLIManifest,
+    CLIMetadata,
+    Example,
+    RunBlock,
+    RunBlockList,
+    SimpleCommandParam,
+    CommandParam,
+)
 from cliffy.helper import write_to_file
 from pydantic import BaseModel
 
+DOC_FORMATS = ("md", "rst", "html")
+# pages' source manifest hashes and doc models, to skip unchanged CLIs on the next `cli docs --all`
+SITE_STATE_FILE = ".cliffy-docs.json"
+SEARCH_INDEX_FILE = "search-index.json"
+SITE_INDEX_NAME = "index"
+# bumped when rendering changes, to regenerate every page
+SITE_STATE_VERSION = 1
+
 
 class CommandDoc(BaseModel):
     help: str
@@ -22,13 +45,7 @@ class DocGenerator:
         self.manifest = manifest
 
     def generate(self, format: str, output_dir: str) -> None:
-        docs = self._build_docs()
-        if format == "md":
-            self._write_markdown(docs, output_dir)
-        elif format == "rst":
-            self._write_rst(docs, output_dir)
-        elif format == "html":
-            self._write_html(docs, output_dir)
+        write_pages(self._build_docs(), [format], output_dir)
 
     def _build_docs(self) -> CLIDoc:
         manifest_examples: list[Example] = []
@@ -68,60 +85,52 @@ class DocGenerator:
             )
         return documented_commands
 
-    def _write_markdown(self, docs: CLIDoc, output_dir: str) -> None:
-        md = f"# {docs.name} v{docs.version}\n\n"
-        md += f"{docs.help}\n\n"
-        md += "## Commands\n\n"
-        for cmd_name, cmd in docs.commands.items():
-            md += f"### {cmd_name}\n{cmd.help}\n\n"
-            if cmd.params:
-                md += "Parameters:\n"
-                for param in cmd.params:
-                    md += f"- {param}\n"
-            if cmd.aliases:
-                md += f"\nAliases: {', '.join(cmd.aliases)}\n"
-            md += "\n"
-
-        md += "## Examples\n\n"
-        for example in docs.examples:
-            md += f"```bash\n{example.command}\n```\n"
-            md += f"{example.description}\n\n"
-
-        path = f"{output_dir}/{docs.name}.md" if output_dir else f"{docs.name}.md"
-        write_to_file(path, md)
-
-    def _write_rst(self, docs: CLIDoc, output_dir: str) -> None:
-        rst = f"{docs.name} v{docs.version}\n"
-        rst += "=" * len(f"{docs.name} v{docs.version}") + "\n\n"
-        rst += f"{docs.help}\n\n"
-
-        rst += "Commands\n"
-        rst += "--------\n\n"
-        for cmd_name, cmd in docs.commands.items():
-            rst += f"{cmd_name}\n"
-            rst += "~" * len(cmd_name) + "\n\n"
-            rst += f"{cmd.help}\n\n"
-
-            if cmd.params:
-                rst += "Parameters:\n\n"
-                for param in cmd.params:
-                    rst += f"* {param}\n"
-                rst += "\n"
-
-            if cmd.aliases:
-                rst += "Aliases: " + ", ".join(cmd.aliases) + "\n\n"
-
-        rst += "Examples\n"
-        rst += "--------\n\n"
-        for example in docs.examples:
-            rst += f".. code-block:: bash\n\n    {example.command}\n\n"
-            rst += f"{example.description}\n\n"
-
-        path = f"{output_dir}/{docs.name}.rst" if output_dir else f"{docs.name}.rst"
-        write_to_file(path, rst)
-
-    def _write_html(self, docs: CLIDoc, output_dir: str) -> None:
-        html = f"""<!DOCTYPE html>
+
+def render_markdown(docs: CLIDoc) -> str:
+    md = [f"# {docs.name} v{docs.version}\n\n", f"{docs.help}\n\n", "## Commands\n\n"]
+    for cmd_name, cmd in docs.commands.items():
+        md.append(f"### {cmd_name}\n{cmd.help}\n\n")
+        if cmd.params:
+            md.append("Parameters:\n")
+            md.extend(f"- {param}\n" for param in cmd.params)
+        if cmd.aliases:
+            md.append(f"\nAliases: {', '.join(cmd.aliases)}\n")
+        md.append("\n")
+
+    md.append("## Examples\n\n")
+    for example in docs.examples:
+        md.append(f"```bash\n{example.command}\n```\n")
+        md.append(f"{example.description}\n\n")
+    return "".join(md)
+
+
+def render_rst(docs: CLIDoc) -> str:
+    title = f"{docs.name} v{docs.version}"
+    rst = [f"{title}\n", "=" * len(title) + "\n\n", f"{docs.help}\n\n", "Commands\n", "--------\n\n"]
+    for cmd_name, cmd in docs.commands.items():
+        rst.append(f"{cmd_name}\n")
+        rst.append("~" * len(cmd_name) + "\n\n")
+        rst.append(f"{cmd.help}\n\n")
+
+        if cmd.params:
+            rst.append("Parameters:\n\n")
+            rst.extend(f"* {param}\n" for param in cmd.params)
+            rst.append("\n")
+
+        if cmd.aliases:
+            rst.append("Aliases: " + ", ".join(cmd.aliases) + "\n\n")
+
+    rst.append("Examples\n")
+    rst.append("--------\n\n")
+    for example in docs.examples:
+        rst.append(f".. code-block:: bash\n\n    {example.command}\n\n")
+        rst.append(f"{example.description}\n\n")
+    return "".join(rst)
+
+
+def render_html(docs: CLIDoc) -> str:
+    html = [
+        f"""<!DOCTYPE html>
 <html>
 <head>
     <title>{docs.name} v{docs.version}</title>
@@ -138,33 +147,261 @@ class DocGenerator:
     
     <h2>Commands</h2>
 """
-        for cmd_name, cmd in docs.commands.items():
-            html += f"""
+    ]
+    for cmd_name, cmd in docs.commands.items():
+        html.append(f"""
     <div class="command">
         <h3>{cmd_name}</h3>
         <p>{cmd.help}</p>
-"""
-            if cmd.params:
-                html += "        <h4>Parameters:</h4>\n        <div class='params'>\n"
-                for param in cmd.params:
-                    html += f"            <p>{param}</p>\n"
-                html += "        </div>\n"
+""")
+        if cmd.params:
+            html.append("        <h4>Parameters:</h4>\n        <div class='params'>\n")
+            html.extend(f"            <p>{param}</p>\n" for param in cmd.params)
+            html.append("        </div>\n")
 
-            if cmd.aliases:
-                html += f"        <p><em>Aliases: {', '.join(cmd.aliases)}</em></p>\n"
-            html += "    </div>\n"
+        if cmd.aliases:
+            html.append(f"        <p><em>Aliases: {', '.join(cmd.aliases)}</em></p>\n")
+        html.append("    </div>\n")
 
-        html += """
+    html.append("""
     <h2>Examples</h2>
-"""
-        for example in docs.examples:
-            html += f"""
+""")
+    for example in docs.examples:
+        html.append(f"""
     <pre><code>{example.command}</code></pre>
     <p>{example.description}</p>
-"""
-        html += """
+""")
+    html.append("""
 </body>
-</html>"""
+</html>""")
+    return "".join(html)
+
+
+RENDERERS: dict[str, Callable[[CLIDoc], str]] = {"md": render_markdown, "rst": render_rst, "html": render_html}
+
+
+def get_site_path(output_dir: Optional[str], file_name: str) -> str:
+    return os.path.join(output_dir or "", file_name)
+
+
+def get_page_path(output_dir: Optional[str], name: str, format: str) -> str:
+    return get_site_path(output_dir, f"{name}.{format}")
+
+
+def write_pages(docs: CLIDoc, formats: list[str], output_dir: Optional[str]) -> None:
+    for format in formats:
+        write_to_file(get_page_path(output_dir, docs.name, format), RENDERERS[format](docs))
+
+
+def load_cli_manifest(metadata: CLIMetadata) -> CLIManifest:
+    """Loads a loaded CLI's manifest, from its resolved manifest blob when it has one"""
+    from cliffy.homer import read_blob
+    from cliffy.transformer import Transformer
+
+    if metadata.resolved_hash:
+        return CLIManifest.model_validate_json(read_blob(metadata.resolved_hash))
+    with open(metadata.runner_path, "r") as manifest_io:
+        return Transformer(manifest_io).manifest  # type: ignore
+
+
+class SitePage(BaseModel):
+    # resolved manifest hash the pages were generated from
+    source_hash: str
+    docs: CLIDoc
+
+
+class SiteState(BaseModel):
+    version: int = SITE_STATE_VERSION
+    formats: list[str] = []
+    pages: dict[str, SitePage] = {}
+
+
+class SiteOutcome(BaseModel):
+    cli_name: str
+    docs: Optional[CLIDoc] = None
+    skipped: bool = False
+    error: str = ""
+
+
+def get_source_hash(metadata: CLIMetadata) -> str:
+    return metadata.resolved_hash or metadata.manifest_hash
 
-        path = f"{output_dir}/{docs.name}.html" if output_dir else f"{docs.name}.html"
-        write_to_file(path, html)
+
+def generate_cli_pages(metadata: CLIMetadata, formats: list[str], output_dir: Optional[str]) -> SiteOutcome:
+    """Parses a CLI's manifest once into its doc model and writes a page per format.
+    Doesn't raise, so it can run in a worker process."""
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            docs = DocGenerator(load_cli_manifest(metadata))._build_docs()
+            write_pages(docs, formats, output_dir)
+    except SystemExit:
+        return SiteOutcome(cli_name=metadata.cli_name, error=" ".join(output.getvalue().split()))
+    except Exception as e:
+        return SiteOutcome(cli_name=metadata.cli_name, error=str(e))
+    return SiteOutcome(cli_name=metadata.cli_name, docs=docs)
+
+
+def load_site_state(output_dir: Optional[str]) -> SiteState:
+    with contextlib.suppress(OSError, ValueError):
+        with open(get_site_path(output_dir, SITE_STATE_FILE), "r") as state_file:
+            state = SiteState.model_validate_json(state_file.read())
+            if state.version == SITE_STATE_VERSION:
+                return state
+    return SiteState()
+
+
+def get_current_page(
+    state: SiteState, metadata: CLIMetadata, formats: list[str], output_dir: Optional[str]
+) -> Optional[SitePage]:
+    page = state.pages.get(metadata.cli_name)
+    if not page or page.source_hash != get_source_hash(metadata) or not set(formats) <= set(state.formats):
+        return None
+    if not all(os.path.exists(get_page_path(output_dir, metadata.cli_name, format)) for format in formats):
+        return None
+    return page
+
+
+def generate_site(
+    clis: list[CLIMetadata],
+    formats: list[str],
+    output_dir: Optional[str] = None,
+    jobs: int = 1,
+    force: bool = False,
+) -> Iterator[SiteOutcome]:
+    """Generates a documentation site for CLIs: a page per CLI and format, index pages
+    linking them and a search index of every command across CLIs.
+
+    Pages of CLIs whose resolved manifest is unchanged since the last run in the same
+    output dir are skipped unless `force` is set, and their doc models are reused for
+    the indexes. The other CLIs are rendered in a pool of `jobs` worker processes when
+    jobs > 1, and pages of CLIs no longer given are removed. CLIs that fail keep their
+    pages from the last run. A CLI named like the index pages is reported as failed.
+
+    Yields:
+        Iterator[SiteOutcome]: Outcome per CLI, in completion order when parallel
+    """
+    previous_state = load_site_state(output_dir)
+    state = SiteState(formats=formats)
+    stale_clis = []
+    for metadata in clis:
+        if metadata.cli_name == SITE_INDEX_NAME:
+            error = f"{SITE_INDEX_NAME} is reserved for the site index pages, use `cli docs {SITE_INDEX_NAME}` instead"
+            yield SiteOutcome(cli_name=metadata.cli_name, error=error)
+            continue
+        page = None if force else get_current_page(previous_state, metadata, formats, output_dir)
+        if page:
+            state.pages[metadata.cli_name] = page
+            yield SiteOutcome(cli_name=metadata.cli_name, docs=page.docs, skipped=True)
+        else:
+            stale_clis.append(metadata)
+
+    source_hashes = {metadata.cli_name: get_source_hash(metadata) for metadata in stale_clis}
+
+    def record(outcome: SiteOutcome) -> SiteOutcome:
+        if outcome.docs:
+            state.pages[outcome.cli_name] = SitePage(source_hash=source_hashes[outcome.cli_name], docs=outcome.docs)
+        elif previous_page := previous_state.pages.get(outcome.cli_name):
+            # keep publishing the last good pages, their stale source hash retries them next run
+            state.pages[outcome.cli_name] = previous_page
+        return outcome
+
+    try:
+        if jobs <= 1:
+            for metadata in stale_clis:
+                yield record(generate_cli_pages(metadata, formats, output_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [
+                    executor.submit(generate_cli_pages, metadata, formats, output_dir) for metadata in stale_clis
+                ]
+                for future in as_completed(futures):
+                    yield record(future.result())
+    finally:
+        remove_stale_pages(previous_state, state, output_dir)
+        write_site_indexes(state, output_dir)
+
+
+def remove_stale_pages(previous_state: SiteState, state: SiteState, output_dir: Optional[str]) -> None:
+    """Removes the pages of CLIs no longer documented, and of formats no longer generated"""
+    dropped_formats = set(previous_state.formats) - set(state.formats)
+    for name in [*previous_state.pages, SITE_INDEX_NAME]:
+        removed = name != SITE_INDEX_NAME and name not in state.pages
+        for format in previous_state.formats if removed else dropped_formats:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(get_page_path(output_dir, name, format))
+
+
+def write_site_indexes(state: SiteState, output_dir: Optional[str]) -> None:
+    """Writes the index pages, the search index and the site state"""
+    pages = dict(sorted(state.pages.items()))
+    for format in state.formats:
+        write_to_file(get_page_path(output_dir, SITE_INDEX_NAME, format), render_site_index(pages, format))
+    write_to_file(
+        get_site_path(output_dir, SEARCH_INDEX_FILE),
+        json.dumps({"entries": get_search_entries(pages, state.formats)}, indent=2) + "\n",
+    )
+    write_to_file(get_site_path(output_dir, SITE_STATE_FILE), state.model_dump_json())
+
+
+def get_search_entries(pages: dict[str, SitePage], formats: list[str]) -> list[dict]:
+    """Gets a search index entry per CLI and per command, with the pages documenting them"""
+    entries = []
+    for cli_name, page in pages.items():
+        urls = {format: f"{cli_name}.{format}" for format in formats}
+        entries.append(
+            {
+                "cli": cli_name,
+                "version": page.docs.version,
+                "command": "",
+                "help": page.docs.help,
+                "aliases": [],
+                "params": [],
+                "pages": urls,
+            }
+        )
+        for cmd_name, cmd in page.docs.commands.items():
+            entries.append(
+                {
+                    "cli": cli_name,
+                    "version": page.docs.version,
+                    "command": cmd_name,
+                    "help": cmd.help,
+                    "aliases": cmd.aliases,
+                    "params": cmd.params,
+                    "pages": urls,
+                }
+            )
+    return entries
+
+
+def render_site_index(pages: dict[str, SitePage], format: str) -> str:
+    def describe(page: SitePage) -> str:
+        return f"v{page.docs.version}: {page.docs.help}" if page.docs.help else f"v{page.docs.version}"
+
+    if format == "md":
+        return "# CLIs\n\n" + "".join(
+            f"- [{cli_name}]({cli_name}.md) {describe(page)}\n" for cli_name, page in pages.items()
+        )
+    if format == "rst":
+        return "CLIs\n====\n\n" + "".join(
+            f"* `{cli_name} <{cli_name}.rst>`_ {describe(page)}\n" for cli_name, page in pages.items()
+        )
+    items = "".join(
+        f'        <li><a href="{cli_name}.html">{cli_name}</a> {describe(page)}</li>\n'
+        for cli_name, page in pages.items()
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <title>CLIs</title>
+    <style>
+        body {{ font-family: system-ui; max-width: 800px; margin: 0 auto; padding: 20px; }}
+    </style>
+</head>
+<body>
+    <h1>CLIs</h1>
+    <ul>
+{items}    </ul>
+</body>
+</html>"""
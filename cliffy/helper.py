@@ -1,21 +1,27 @@
 import contextlib
+import hashlib
+import linecache
+import marshal
 import operator
 import os
 import platform
+import re
 import subprocess
 import sys
+import threading
+import uuid
 from datetime import datetime
 from importlib.resources import files
 from pathlib import Path
 from tempfile import _TemporaryFileWrapper
-from typing import Any, NoReturn, Optional, Union, cast, IO
+from typing import Any, Iterator, NoReturn, Optional, Union, cast, IO
 
 from click import secho, File
 from click.core import Context, Parameter
 from click.types import _is_file_like
 from packaging import version
 from pydantic import BaseModel
-from types import ModuleType
+from types import CodeType, ModuleType
 from importlib.util import spec_from_file_location, module_from_spec
 
 CLIFFY_CLI_DIR = files("cliffy").joinpath("clis")
@@ -26,6 +32,12 @@ PYTHON_BIN = (
     else f"{os.path.join(sys.exec_prefix, 'bin')}"
 )
 PYTHON_EXECUTABLE = sys.executable
+CLIFFY_CACHE_DIR = os.environ.get("CLIFFY_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "cliffy"
+)
+BUILD_PROFILES = ["default", "fast-start"]
+# seconds `cli dev` waits after the last change before reloading
+RELOAD_DELAY = 0.25
 OPERATOR_MAP = {
     "==": operator.eq,
     "!=": operator.ne,
@@ -35,6 +47,11 @@ OPERATOR_MAP = {
     ">": operator.gt,
 }
 TEMP_FILES: list[_TemporaryFileWrapper] = []
+# latest compiled code per filename, with its source digest
+CODE_CACHE: dict[str, tuple[str, CodeType]] = {}
+INSTALLED_PACKAGES_CACHE: dict[tuple[tuple[str, int], ...], dict[str, str]] = {}
+# commanders stamp generated code with the time it was generated
+GENERATED_HEADER_RE = re.compile(r"\A## Generated .*\n")
 
 
 class RequirementSpec(BaseModel):
@@ -58,13 +75,58 @@ class ManifestOrCLI(File):
         return value
 
 
-def write_to_file(path: str, text: str, executable: bool = False) -> None:
+def write_to_file(path: str, text: str, executable: bool = False) -> bool:
+    """Atomically writes text to a file, skipping the write when the content is unchanged.
+
+    The text is written to a temp file in the same directory and renamed over the
+    target, so readers (e.g. a CLI being invoked mid-load) never see a partial file.
+
+    Returns:
+        bool: True if the file was written
+    """
     output_file = Path(path)
-    output_file.parent.mkdir(exist_ok=True, parents=True)
-    output_file.write_text(text)
+    with contextlib.suppress(OSError):
+        if output_file.read_text() == text:
+            if executable:
+                make_executable(path)
+            return False
 
-    if executable:
-        make_executable(path)
+    output_file.parent.mkdir(exist_ok=True, parents=True)
+    temp_file = output_file.with_name(f".{output_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        temp_file.write_text(text)
+        if executable:
+            make_executable(str(temp_file))
+        os.replace(temp_file, output_file)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            temp_file.unlink()
+    return True
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Holds an exclusive, inter-process lock on a lock file for the duration of the context."""
+    lock_path = Path(path)
+    lock_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(lock_path, "a+") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt
+
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 def import_module_from_path(filepath: str) -> ModuleType:
@@ -82,6 +144,79 @@ def import_module_from_path(filepath: str) -> ModuleType:
         raise ImportError(f"Failed to import module from {filepath}: {e}")
 
 
+def compile_code(code: str, filename: str) -> CodeType:
+    """Compiles source to a code object, cached per source hash in memory and across
+    processes as marshal files under `CLIFFY_CACHE_DIR`. Only the latest source of
+    each filename is kept, so reloading a CLI replaces its cache entries.
+
+    Args:
+        code (str): Python source
+        filename (str): Filename shown in tracebacks
+
+    Returns:
+        CodeType: Compiled code object
+    """
+    # the generated header is a single comment line, so code differing only in it compiles the same
+    digest = hashlib.sha256(f"{filename}\0{GENERATED_HEADER_RE.sub('', code)}".encode()).hexdigest()
+    cached_digest, code_object = CODE_CACHE.get(filename, ("", None))
+    if code_object and cached_digest == digest:
+        return code_object
+
+    # marshal data is only readable by the interpreter version that wrote it
+    filename_digest = hashlib.sha256(filename.encode()).hexdigest()[:16]
+    cache_suffix = f".{sys.implementation.cache_tag}.marshal"
+    cache_path = Path(CLIFFY_CACHE_DIR, "code", f"{filename_digest}-{digest}{cache_suffix}")
+    try:
+        code_object = marshal.loads(cache_path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        code_object = compile(code, filename, "exec")
+        with contextlib.suppress(OSError):
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            temp_path.write_bytes(marshal.dumps(code_object))
+            os.replace(temp_path, cache_path)
+            # drop the entries of the filename's earlier sources
+            for stale_path in cache_path.parent.glob(f"{filename_digest}-*{cache_suffix}"):
+                if stale_path != cache_path:
+                    stale_path.unlink(missing_ok=True)
+
+    CODE_CACHE[filename] = (digest, code_object)
+    return code_object
+
+
+def get_code_filename(name: str) -> str:
+    return f"<cliffy:{name}>"
+
+
+def import_module_from_code(name: str, code: str, code_object: Optional[CodeType] = None) -> ModuleType:
+    """Executes source in a fresh module without writing it to disk.
+
+    The module is registered in `sys.modules` under a unique name, so concurrent
+    imports of the same CLI (e.g. from reloader threads) don't share state.
+
+    Args:
+        name (str): Module name prefix, e.g. the CLI name
+        code (str): Python source
+        code_object (Optional[CodeType]): Source already compiled with `compile_code`
+
+    Returns:
+        ModuleType: Executed module
+    """
+    filename = get_code_filename(name)
+    # lets tracebacks show the generated source lines
+    linecache.cache[filename] = (len(code), None, code.splitlines(keepends=True), filename)
+    code_object = code_object or compile_code(code, filename)
+
+    module = ModuleType(f"{name.replace('-', '_')}_{uuid.uuid4().hex}")
+    sys.modules[module.__name__] = module
+    try:
+        exec(code_object, module.__dict__)
+    except BaseException:
+        sys.modules.pop(module.__name__, None)
+        raise
+    return module
+
+
 def make_executable(path: str) -> None:
     mode = os.stat(path).st_mode
     mode |= (mode & 0o444) >> 2
@@ -113,13 +248,22 @@ def wrap_as_var(text: str) -> str:
 
 
 def get_installed_package_versions() -> dict[str, str]:
+    """Gets installed package versions from pip freeze. The result is cached until a
+    directory on sys.path changes, e.g. when a package is installed or removed."""
+    paths_fingerprint = tuple((path, os.stat(path).st_mtime_ns) for path in sys.path if path and os.path.isdir(path))
+    if cached := INSTALLED_PACKAGES_CACHE.get(paths_fingerprint):
+        return dict(cached)
+
     reqs = subprocess.check_output([sys.executable, "-m", "pip", "freeze"])
     installed_packages = {}
     for r in reqs.split():
         r_spec = r.decode().lower().split("==")
         if len(r_spec) > 1:
             installed_packages[r_spec[0]] = r_spec[1]
-    return installed_packages
+
+    INSTALLED_PACKAGES_CACHE.clear()
+    INSTALLED_PACKAGES_CACHE[paths_fingerprint] = installed_packages
+    return dict(installed_packages)
 
 
 def parse_requirement(requirement: str) -> RequirementSpec:
@@ -1,41 +1,264 @@
-import glob
+import contextlib
+import hashlib
 import json
 import os
-from base64 import b32encode
+import sqlite3
+import threading
+import zlib
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, Optional
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
-from cliffy.commander import CLI
-from cliffy.helper import CLIFFY_METADATA_DIR, write_to_file
+from cliffy.helper import CLIFFY_METADATA_DIR, out_err
 from cliffy.manifest import CLIMetadata
 
+if TYPE_CHECKING:
+    from cliffy.commander import CLI
 
-def save_metadata(manifest_path: str, cli: CLI) -> None:
+METADATA_DB_NAME = "homer.db"
+METADATA_BLOBS_DIR = "blobs"
+SUMMARY_COLUMNS = "cli_name, runner_path, version, loaded, requires, manifest_hash, resolved_hash"
+
+
+@contextlib.contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """Opens the metadata store, creating and migrating it on first use
+
+    The store is a single SQLite database in WAL mode so that readers never block
+    a concurrent `cli load` and lookups by name hit the primary key index. WAL mode
+    is persistent, so it's only set when the store is initialized.
+
+    Yields:
+        Iterator[sqlite3.Connection]: Connection committed on exit
+    """
+    metadata_dir = Path(str(CLIFFY_METADATA_DIR))
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(metadata_dir / METADATA_DB_NAME, timeout=30)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < len(STORE_MIGRATIONS):
+            init_store(conn, metadata_dir)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init_store(conn: sqlite3.Connection, metadata_dir: Path) -> None:
+    """Applies pending store migrations. The store version is tracked in `PRAGMA user_version`.
+
+    Args:
+        conn (sqlite3.Connection): Metadata store connection
+        metadata_dir (Path): Metadata directory
+    """
+    # persists in the database file, and can't be changed inside a transaction
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    # another process may have migrated the store while we waited on the lock
+    store_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for migration in STORE_MIGRATIONS[store_version:]:
+        migration(conn, metadata_dir)
+
+    conn.execute(f"PRAGMA user_version = {len(STORE_MIGRATIONS)}")
+    conn.commit()
+
+    if store_version == 0:
+        remove_legacy_metadata(metadata_dir)
+
+
+def create_store(conn: sqlite3.Connection, metadata_dir: Path) -> None:
+    """Creates the metadata table and imports any metadata left in the legacy b32 directory layout
+
+    Args:
+        conn (sqlite3.Connection): Metadata store connection
+        metadata_dir (Path): Metadata directory
+    """
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS clis (
+            cli_name TEXT PRIMARY KEY,
+            runner_path TEXT NOT NULL,
+            version TEXT NOT NULL,
+            loaded TEXT NOT NULL,
+            requires TEXT NOT NULL,
+            manifest TEXT NOT NULL
+        )"""
+    )
+
+    for legacy_path in metadata_dir.glob("*/*.json"):
+        metadata = get_metadata_bypath(legacy_path)
+        if metadata.version == "error":
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO clis VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                metadata.cli_name,
+                metadata.runner_path,
+                metadata.version,
+                metadata.loaded.isoformat(),
+                json.dumps(metadata.requires),
+                metadata.manifest,
+            ),
+        )
+
+
+def store_manifest_blobs(conn: sqlite3.Connection, metadata_dir: Path) -> None:
+    """Moves manifest text out of the metadata table into content-addressed blobs
+
+    Args:
+        conn (sqlite3.Connection): Metadata store connection
+        metadata_dir (Path): Metadata directory
+    """
+    conn.execute("ALTER TABLE clis RENAME TO clis_v1")
+    conn.execute(
+        """CREATE TABLE clis (
+            cli_name TEXT PRIMARY KEY,
+            runner_path TEXT NOT NULL,
+            version TEXT NOT NULL,
+            loaded TEXT NOT NULL,
+            requires TEXT NOT NULL,
+            manifest_hash TEXT NOT NULL,
+            resolved_hash TEXT NOT NULL
+        )"""
+    )
+    for *summary, manifest in conn.execute("SELECT * FROM clis_v1").fetchall():
+        conn.execute("INSERT INTO clis VALUES (?, ?, ?, ?, ?, ?, '')", (*summary, write_blob(manifest)))
+    conn.execute("DROP TABLE clis_v1")
+
+
+STORE_MIGRATIONS: list[Callable[[sqlite3.Connection, Path], None]] = [create_store, store_manifest_blobs]
+
+
+def remove_legacy_metadata(metadata_dir: Path) -> None:
+    """Removes legacy JSON metadata files once they are imported into the store
+
+    Args:
+        metadata_dir (Path): Metadata directory
+    """
+    for legacy_path in metadata_dir.glob("*/*.json"):
+        if get_metadata_bypath(legacy_path).version == "error":
+            continue
+        with contextlib.suppress(OSError):
+            legacy_path.unlink()
+            legacy_path.parent.rmdir()
+
+
+def get_blob_path(digest: str) -> Path:
+    """Gets the path of a manifest blob
+
+    Args:
+        digest (str): sha256 hex digest of the blob text
+
+    Returns:
+        Path: Blob path, sharded by the first two digest characters
+    """
+    return Path(str(CLIFFY_METADATA_DIR)) / METADATA_BLOBS_DIR / digest[:2] / digest
+
+
+def write_blob(text: str) -> str:
+    """Stores text as a zlib-compressed, content-addressed blob. Identical text is only stored once.
+
+    Args:
+        text (str): Blob text
+
+    Returns:
+        str: sha256 hex digest referencing the blob
+    """
+    data = text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    blob_path = get_blob_path(digest)
+    if not blob_path.exists():
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        # an existing blob is reused as is, so it's renamed into place only once fully written
+        temp_path = blob_path.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temp_path.write_bytes(zlib.compress(data))
+            os.replace(temp_path, blob_path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                temp_path.unlink()
+    return digest
+
+
+def read_blob(digest: str) -> str:
+    """Reads a manifest blob
+
+    Args:
+        digest (str): sha256 hex digest of the blob text
+
+    Returns:
+        str: Blob text
+    """
+    return zlib.decompress(get_blob_path(digest).read_bytes()).decode("utf-8")
+
+
+def remove_unreferenced_blobs(conn: sqlite3.Connection, *digests: str) -> None:
+    """Removes blobs that are no longer referenced by any metadata record
+
+    Args:
+        conn (sqlite3.Connection): Metadata store connection
+        *digests (str): Candidate blob digests
+    """
+    for digest in filter(None, set(digests)):
+        if conn.execute("SELECT 1 FROM clis WHERE manifest_hash = ? OR resolved_hash = ?", (digest, digest)).fetchone():
+            continue
+        blob_path = get_blob_path(digest)
+        with contextlib.suppress(OSError):
+            blob_path.unlink()
+            blob_path.parent.rmdir()
+
+
+def row_to_metadata(row: tuple) -> CLIMetadata:
+    """Builds CLI metadata from a store row selected with `SUMMARY_COLUMNS`
+
+    Args:
+        row (tuple): Metadata row
+
+    Returns:
+        CLIMetadata: CLI metadata without the manifest text
+    """
+    cli_name, runner_path, version, loaded, requires, manifest_hash, resolved_hash = row
+    return CLIMetadata(
+        cli_name=cli_name,
+        runner_path=runner_path,
+        version=version,
+        loaded=datetime.fromisoformat(loaded),
+        requires=json.loads(requires),
+        manifest_hash=manifest_hash,
+        resolved_hash=resolved_hash,
+    )
+
+
+def save_metadata(manifest_path: str, cli: "CLI", resolved_manifest: Optional[str] = None) -> None:
     """Stores CLI metadata
 
     Args:
         manifest_path (str): CLI manifest path
         cli (CLI): CLI
+        resolved_manifest (Optional[str]): JSON snapshot of the manifest with includes merged
     """
     abs_manifest_path = os.path.realpath(manifest_path)
-    encoded_runnerpath = b32encode(cli.name.encode("ascii")).decode("utf-8")
-    save_metadata_path = f"{CLIFFY_METADATA_DIR}/{encoded_runnerpath}/{cli.name}.json"
     with open(manifest_path, "r") as manifest:
-        write_to_file(
-            save_metadata_path,
-            json.dumps(
-                CLIMetadata(
-                    cli_name=cli.name,
-                    runner_path=abs_manifest_path,
-                    version=cli.version,
-                    loaded=datetime.now(),
-                    manifest=manifest.read(),
-                    requires=cli.requires,
-                ).model_dump(),
-                default=str,
+        manifest_text = manifest.read()
+
+    with connect() as conn:
+        # hold the write lock while blobs are written so a concurrent remove can't collect them
+        conn.execute("BEGIN IMMEDIATE")
+        previous_hashes = conn.execute(
+            "SELECT manifest_hash, resolved_hash FROM clis WHERE cli_name = ?", (cli.name,)
+        ).fetchone()
+        conn.execute(
+            f"INSERT OR REPLACE INTO clis ({SUMMARY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                cli.name,
+                abs_manifest_path,
+                cli.version,
+                datetime.now().isoformat(),
+                json.dumps(cli.requires),
+                write_blob(manifest_text),
+                write_blob(resolved_manifest) if resolved_manifest else "",
             ),
         )
+        if previous_hashes:
+            remove_unreferenced_blobs(conn, *previous_hashes)
 
 
 def remove_metadata(cli_name: str) -> None:
@@ -44,15 +267,18 @@ def remove_metadata(cli_name: str) -> None:
     Args:
         cli_name (str): CLI name
     """
-    metadata_paths = glob.glob(f"{CLIFFY_METADATA_DIR}/*/{cli_name}.*")
-    for path in metadata_paths:
-        parent_path = Path(path).parent.resolve()
-        os.remove(path)
-        os.rmdir(parent_path)
+    with connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        hashes = conn.execute(
+            "SELECT manifest_hash, resolved_hash FROM clis WHERE cli_name = ?", (cli_name,)
+        ).fetchone()
+        conn.execute("DELETE FROM clis WHERE cli_name = ?", (cli_name,))
+        if hashes:
+            remove_unreferenced_blobs(conn, *hashes)
 
 
 def get_metadata_bypath(path: Path) -> CLIMetadata:
-    """Fetches CLI metadata by metadata path
+    """Fetches CLI metadata from a legacy JSON metadata file
 
     Args:
         path (Path): Metadata path
@@ -73,39 +299,54 @@ def get_metadata_bypath(path: Path) -> CLIMetadata:
         )
 
 
-def get_metadata(cli_name: str) -> Optional[CLIMetadata]:
+def get_metadata(cli_name: str, load_manifest: bool = False) -> Optional[CLIMetadata]:
     """Fetches CLI metadata by name
 
     Args:
         cli_name (str): CLI name
+        load_manifest (bool): Read the manifest blob into `manifest`. Left empty, with an
+            error reported, if the blob is missing or corrupted.
 
     Returns:
         Optional[CLIMetadata]: CLI metadata
     """
-    cli_path = get_metadata_path(cli_name)
-    return get_metadata_bypath(Path(cli_path)) if cli_path else None
+    with connect() as conn:
+        row = conn.execute(f"SELECT {SUMMARY_COLUMNS} FROM clis WHERE cli_name = ?", (cli_name,)).fetchone()
+
+    if not row:
+        return None
 
+    metadata = row_to_metadata(row)
+    if load_manifest:
+        try:
+            metadata.manifest = read_blob(metadata.manifest_hash)
+        except (OSError, zlib.error, UnicodeDecodeError):
+            out_err(f"~ {cli_name} metadata is corrupted, its manifest is missing. Reload the CLI with `cli load`")
+    return metadata
 
-def get_metadata_path(cli_name: str) -> Optional[str]:
-    """Fetches CLI metadata path
+
+def has_metadata(cli_name: str) -> bool:
+    """Checks whether a CLI is loaded
 
     Args:
         cli_name (str): CLI name
 
     Returns:
-        Optional[str]: CLI metadata path
+        bool: True if metadata exists for the CLI
     """
-    if cli_metadata_path := glob.glob(f"{CLIFFY_METADATA_DIR}/*/{cli_name}.json"):
-        return cli_metadata_path[0]
-    return None
+    with connect() as conn:
+        return conn.execute("SELECT 1 FROM clis WHERE cli_name = ?", (cli_name,)).fetchone() is not None
 
 
 def get_clis() -> Iterator[CLIMetadata]:
-    """Fetches loaded CLIs metadata iteratively
+    """Fetches loaded CLIs metadata iteratively. Manifest blobs are not read,
+    use `get_metadata(cli_name, load_manifest=True)` for the manifest text.
 
     Yields:
         Iterator[CLIMetadata]: CLI metadata
     """
-    metadata_paths = Path(str(CLIFFY_METADATA_DIR)).glob("*/*.json")
-    for metadata_path in metadata_paths:
-        yield get_metadata_bypath(metadata_path)
+    with connect() as conn:
+        rows = conn.execute(f"SELECT {SUMMARY_COLUMNS} FROM clis ORDER BY cli_name").fetchall()
+
+    for row in rows:
+        yield row_to_metadata(row)
@@ -1,14 +1,24 @@
 import contextlib
 import os
+from typing import TYPE_CHECKING, ContextManager
 
-from cliffy.commander import CLI
-from cliffy.helper import CLIFFY_CLI_DIR, PYTHON_BIN, PYTHON_EXECUTABLE, write_to_file
+from cliffy.helper import (
+    CLIFFY_CLI_DIR,
+    CLIFFY_METADATA_DIR,
+    PYTHON_BIN,
+    PYTHON_EXECUTABLE,
+    file_lock,
+    write_to_file,
+)
+
+if TYPE_CHECKING:
+    from cliffy.commander import CLI
 
 
 class Loader:
     __slots__ = ("cli",)
 
-    def __init__(self, cli: CLI) -> None:
+    def __init__(self, cli: "CLI") -> None:
         self.cli = cli
 
     def deploy_cli(self) -> str:
@@ -22,17 +32,25 @@ class Loader:
         return script_path
 
     @classmethod
-    def load_from_cli(cls, cli: CLI) -> None:
+    def load_from_cli(cls, cli: "CLI") -> None:
         L = cls(cli)
-        L.deploy_script()
+        # deploy the module first so the script never points at a missing import
         L.deploy_cli()
+        L.deploy_script()
 
     @classmethod
     def unload_cli(cls, cli_name: str) -> None:
         with contextlib.suppress(FileNotFoundError):
             os.remove(cls.get_cli_script_path(cli_name))
+        with contextlib.suppress(FileNotFoundError):
             os.remove(cls.get_cli_path(cli_name))
 
+    @classmethod
+    def lock(cls, cli_name: str) -> ContextManager[None]:
+        """Per-CLI lock held while a CLI is deployed or removed together with its metadata.
+        Loads of different CLIs don't contend with each other."""
+        return file_lock(cls.get_cli_lock_path(cli_name))
+
     @staticmethod
     def get_cli_path(cli_name: str) -> str:
         return f"{CLIFFY_CLI_DIR}/{cli_name.replace('-', '_')}.py"
@@ -41,11 +59,19 @@ class Loader:
     def get_cli_script_path(cli_name: str) -> str:
         return f"{PYTHON_BIN}/{cli_name}"
 
+    @staticmethod
+    def get_cli_lock_path(cli_name: str) -> str:
+        return f"{CLIFFY_METADATA_DIR}/locks/{cli_name}.lock"
+
     @staticmethod
     def get_cli_script(cli_name: str) -> str:
         return f"""#!{PYTHON_EXECUTABLE}
 import sys
-from cliffy.clis.{cli_name.replace("-", "_")} import cli
+from cliffy.run import forward_if_served
 
 if __name__ == '__main__':
+    # served by the CLI's zygote when one is running
+    forward_if_served(sys.argv, cli_name="{cli_name}")
+
+    from cliffy.clis.{cli_name.replace("-", "_")} import cli
     sys.exit(cli())"""
@@ -13,6 +13,36 @@ class Example(BaseModel):
     description: Optional[str] = None
 
 
+BENCHMARK_MODES = ("warm", "cold", "both")
+
+
+class Benchmark(BaseModel):
+    """Performance expectations for a command line, measured by `cli bench`."""
+
+    command: str = Field(..., description="Command line to run, without the CLI name. i.e. `hello --name Alice`.")
+    warmup: int = Field(default=3, ge=0, description="Untimed runs before measuring.")
+    iterations: int = Field(default=20, ge=1, description="Timed runs.")
+    mode: str = Field(
+        default="warm",
+        description="`warm` to run in-process from the imported CLI module, `cold` to start a new Python process per run, or `both`.",
+    )
+    p50: Optional[float] = Field(default=None, gt=0, description="Fail if the median latency exceeds this many ms.")
+    p95: Optional[float] = Field(
+        default=None, gt=0, description="Fail if the 95th percentile latency exceeds this many ms."
+    )
+
+    @field_validator("mode", mode="after")
+    @classmethod
+    def is_known_mode(cls, value: str) -> str:
+        if value not in BENCHMARK_MODES:
+            raise ValueError(f"Unrecognized benchmark mode {value}. Use one of {', '.join(BENCHMARK_MODES)}.")
+        return value
+
+    @property
+    def modes(self) -> list[str]:
+        return ["warm", "cold"] if self.mode == "both" else [self.mode]
+
+
 class GenericCommandParam(RootModel):
     root: str = Field(
         json_schema_extra={"title": "Generic Command Param\nGets appended to the command params signature."}
@@ -311,6 +341,12 @@ class CLIManifest(BaseModel):
 
     tests: list[Union[str, dict[str, str]]] = Field(default=[], description="Test cases for commands")
 
+    benchmarks: list[Union[str, Benchmark]] = Field(
+        default=[],
+        description="Command lines to benchmark with `cli bench`. "
+        "A string runs the command line with the default warmup and iterations.",
+    )
+
     examples: list[Union[str, Example]] = Field(
         default=[], description="Example command usages to display in generated CLI docs."
     )
@@ -471,6 +507,13 @@ cli_options:
 tests:
   - hello --name Alice: assert 'Hello, Alice!' in result.output
   - file process test.txt: assert 'Processing test.txt' in result.output
+
+{"" if json_schema else cls.get_field_description("benchmarks")}
+benchmarks:
+  - hello --name Alice
+  # - command: file process test.txt
+  #   mode: both
+  #   p95: 50
 """
         return manifest
 
@@ -516,6 +559,8 @@ commands: {{}}
 cli_options: {{}}
 
 tests: []
+
+benchmarks: []
 """
         return manifest
 
@@ -533,6 +578,7 @@ class IncludeManifest(BaseModel):
     types: dict[str, str] = {}
     cli_options: dict[str, str] = {}
     tests: list[Union[str, dict[str, str]]] = []
+    benchmarks: list[Union[str, Benchmark]] = []
 
 
 class CLIMetadata(BaseModel):
@@ -542,8 +588,10 @@ class CLIMetadata(BaseModel):
     runner_path: str
     version: str
     loaded: datetime
-    manifest: str
+    manifest: str = ""
     requires: list[str]
+    manifest_hash: str = ""
+    resolved_hash: str = ""
 
 
 if __name__ == "__main__":
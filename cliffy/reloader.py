@@ -1,68 +1,456 @@
-from cliffy.transformer import Transformer
+from cliffy.transformer import CachedInclude, Transformer
 from cliffy.loader import Loader
 from cliffy.homer import save_metadata
-from cliffy.helper import out, out_err
+from cliffy.helper import RELOAD_DELAY, out, out_err
 from cliffy.builder import run_cli as cli_runner
+from cliffy.worker import CLIWorker
 
+import contextlib
+import fnmatch
+from abc import ABC, abstractmethod
+import glob
+import os
 import time
-from datetime import datetime, timedelta
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileModifiedEvent, FileSystemEvent
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
+from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver, ObservedWatch
+from watchdog.events import (
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileSystemEvent,
+    FileSystemEventHandler,
+)
 import threading
 
+# files picked up as manifests when `cli dev` watches a directory
+MANIFEST_PATTERNS = ("*.yaml", "*.yml")
+
+
+def find_manifests(target: str) -> list[str]:
+    """Finds the manifests in a directory, recursively, or matching a glob
+
+    Args:
+        target (str): Directory or glob, `**` matching any number of directories
+
+    Returns:
+        list[str]: Sorted manifest paths
+    """
+    if os.path.isdir(target):
+        patterns = [os.path.join(target, "**", pattern) for pattern in MANIFEST_PATTERNS]
+    else:
+        patterns = [target]
+    paths = {path for pattern in patterns for path in glob.glob(pattern, recursive=True)}
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def get_watch_root(target: str) -> str:
+    """Gets the directory containing everything a directory or glob can match"""
+    if os.path.isdir(target):
+        return target
+
+    root_parts = []
+    for part in Path(target).parts[:-1]:
+        if glob.has_magic(part):
+            break
+        root_parts.append(part)
+    return os.path.join(*root_parts) if root_parts else "."
+
+
+def load_cli(
+    manifest_path: str,
+    is_superseded: Callable[[], bool] = lambda: False,
+    include_cache: Optional[dict[str, CachedInclude]] = None,
+) -> Optional[Transformer]:
+    """Transforms a manifest and loads its CLI
+
+    Returns:
+        Optional[Transformer]: Transformed manifest, or None if superseded before loading
+    """
+    with open(manifest_path, "r") as manifest_io:
+        T = Transformer(manifest_io, include_cache=include_cache)
+    if is_superseded():
+        return None
+
+    with Loader.lock(T.cli.name):
+        Loader.load_from_cli(T.cli)
+        save_metadata(manifest_path, T.cli, resolved_manifest=T.manifest.model_dump_json())
+    return T
+
+
+def observe(observer: BaseObserver, scheduler: "ReloadScheduler") -> None:
+    """Runs an observer and its reload scheduler until interrupted"""
+    observer.start()
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        observer.stop()
+        scheduler.stop()
+    observer.join()
+
+
+class ReloadScheduler:
+    """Runs reloads on a single worker thread, `delay` seconds after the last request.
+
+    Requests arriving while waiting restart the delay, and requests arriving while a
+    reload runs mark it superseded and coalesce into one follow-up reload, so the
+    latest change is always applied and reloads never overlap.
+    """
 
-class Reloader(FileSystemEventHandler):
-    def __init__(self, manifest_path: str, run_cli: bool, run_cli_args: tuple) -> None:
+    __slots__ = ("reload", "delay", "condition", "requested_at", "generation", "stopped", "worker")
+
+    def __init__(self, reload: Callable[[float, Callable[[], bool]], None], delay: float = RELOAD_DELAY) -> None:
+        """
+        Args:
+            reload (Callable[[float, Callable[[], bool]], None]): Called with the monotonic time of the latest
+                request and a callable telling whether a newer request has arrived since the reload started
+            delay (float): Seconds without requests to wait before reloading
+        """
+        self.reload = reload
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.requested_at: Optional[float] = None
+        self.generation = 0
+        self.stopped = False
+        self.worker = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        self.worker.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.worker.is_alive():
+            self.worker.join()
+
+    def request(self) -> None:
+        with self.condition:
+            self.requested_at = time.monotonic()
+            self.generation += 1
+            self.condition.notify()
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while self.requested_at is None and not self.stopped:
+                    self.condition.wait()
+                # trailing-edge debounce: wait until requests stop arriving for `delay` seconds
+                while (
+                    not self.stopped
+                    and self.requested_at is not None
+                    and (remaining := self.requested_at + self.delay - time.monotonic()) > 0
+                ):
+                    self.condition.wait(remaining)
+                if self.stopped or self.requested_at is None:
+                    return
+                requested_at, self.requested_at = self.requested_at, None
+                generation = self.generation
+
+            try:
+                self.reload(requested_at, lambda: self.generation != generation)
+            except SystemExit:
+                # already reported by exit_err
+                pass
+            except Exception as e:
+                out_err(f"~ reload failed: {e}")
+
+
+class ChangeHandler(FileSystemEventHandler, ABC):
+    """Passes the paths of created, modified and moved files to `on_change`"""
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        if isinstance(event, FileModifiedEvent):
+            self.on_change(str(event.src_path))
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        if isinstance(event, FileCreatedEvent):
+            self.on_change(str(event.src_path))
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        # editors saving through a temporary file replace the manifest with a move
+        if isinstance(event, FileMovedEvent):
+            self.on_change(str(event.dest_path))
+
+    @abstractmethod
+    def on_change(self, path: str) -> None:
+        pass
+
+
+class Reloader(ChangeHandler):
+    """Reloads a manifest's CLI when the manifest or any manifest it includes changes"""
+
+    def __init__(self, manifest_path: str, run_cli: bool, run_cli_args: tuple, delay: float = RELOAD_DELAY) -> None:
         self.manifest_path = manifest_path
         self.run_cli = run_cli
         self.run_cli_args = run_cli_args
-        self.last_modified = datetime.now()
+        self.scheduler = ReloadScheduler(self.run_reload, delay=delay)
+        # unchanged includes are reused across reloads
+        self.include_cache: dict[str, CachedInclude] = {}
+        self.watched_paths = {os.path.realpath(manifest_path)}
+        self.observer: Optional[BaseObserver] = None
+        self.watches: dict[str, ObservedWatch] = {}
+        # runs the CLI after each reload in a warm process, if the platform can fork
+        self.worker: Optional[CLIWorker] = None
 
         super().__init__()
 
-    def on_modified(self, event: FileSystemEvent) -> None:
-        if event.is_directory or not str(event.src_path).endswith(self.manifest_path):
-            return
-
-        if not isinstance(event, FileModifiedEvent):
-            return
+    def on_change(self, path: str) -> None:
+        if os.path.realpath(path) in self.watched_paths:
+            self.scheduler.request()
 
-        if datetime.now() - self.last_modified < timedelta(seconds=1):
+    def update_watches(self, include_paths: list[str]) -> None:
+        """Watches the manifest and the given includes, watching each directory containing one of them"""
+        self.watched_paths = {os.path.realpath(self.manifest_path), *include_paths}
+        if not self.observer:
             return
 
-        self.last_modified = datetime.now()
+        directories = {os.path.dirname(path) for path in self.watched_paths}
+        directories = {directory for directory in directories if os.path.isdir(directory)}
+        for directory in directories - self.watches.keys():
+            self.watches[directory] = self.observer.schedule(self, path=directory, recursive=False)
+        for directory in self.watches.keys() - directories:
+            self.observer.unschedule(self.watches.pop(directory))
 
-        t = threading.Thread(target=self.reload, args=(self.manifest_path, self.run_cli, self.run_cli_args))
-        t.setDaemon(True)
+    def run_reload(self, requested_at: float, is_superseded: Callable[[], bool]) -> None:
+        started_at = time.monotonic()
         try:
-            t.start()
-        except RuntimeError as e:
-            # Log the error or handle it as needed
-            out_err(f"Failed to start thread: {e}")
+            T = self.reload(
+                self.manifest_path,
+                self.run_cli,
+                self.run_cli_args,
+                is_superseded=is_superseded,
+                include_cache=self.include_cache,
+                worker=self.worker,
+            )
+        except (Exception, SystemExit):
+            # the includes may have changed too, keep watching whatever the manifest includes now
+            self.update_watches(Transformer.get_include_paths(self.manifest_path))
+            raise
+
+        if T:
+            self.update_watches(T.include_paths)
+            finished_at = time.monotonic()
+            out(
+                f"⏱ reloaded in {(finished_at - started_at) * 1000:.0f}ms, "
+                f"{(finished_at - requested_at) * 1000:.0f}ms after the last change",
+                fg="magenta",
+            )
 
     @classmethod
-    def watch(cls, manifest_path: str, run_cli: bool, run_cli_args: tuple) -> None:
-        event_handler = cls(manifest_path, run_cli, run_cli_args)
+    def watch(cls, manifest_path: str, run_cli: bool, run_cli_args: tuple, delay: float = RELOAD_DELAY) -> None:
+        event_handler = cls(manifest_path, run_cli, run_cli_args, delay=delay)
         observer = Observer()
-        observer.schedule(event_handler, path=str(Path(manifest_path).parent), recursive=False)
-        observer.start()
+        event_handler.observer = observer
+        event_handler.update_watches(Transformer.get_include_paths(manifest_path))
+        if run_cli and CLIWorker.is_supported():
+            event_handler.worker = CLIWorker()
+            event_handler.worker.start()
 
         try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            observer.stop()
-        observer.join()
+            observe(observer, event_handler.scheduler)
+        finally:
+            if event_handler.worker:
+                event_handler.worker.stop()
 
     @staticmethod
-    def reload(manifest_path: str, run_cli: bool, run_cli_args: tuple) -> None:
-        manifest_io = open(manifest_path, "r")
+    def reload(
+        manifest_path: str,
+        run_cli: bool,
+        run_cli_args: tuple,
+        is_superseded: Callable[[], bool] = lambda: False,
+        include_cache: Optional[dict[str, CachedInclude]] = None,
+        worker: Optional[CLIWorker] = None,
+    ) -> Optional[Transformer]:
+        """Reloads the CLI for a manifest
+
+        Args:
+            manifest_path (str): Manifest path
+            run_cli (bool): Run the CLI after reloading
+            run_cli_args (tuple): Arguments to run the CLI with
+            is_superseded (Callable[[], bool]): Tells whether a newer change arrived, in which case the
+                reload stops before loading the now outdated CLI
+            include_cache (Optional[dict[str, CachedInclude]]): Resolved includes to reuse, see `Transformer`
+            worker (Optional[CLIWorker]): Warm worker to run the CLI in without waiting for it to finish,
+                instead of running it in this process
+
+        Returns:
+            Optional[Transformer]: Transformed manifest, or None if the reload was superseded
+        """
+        T = load_cli(manifest_path, is_superseded=is_superseded, include_cache=include_cache)
+        if not T:
+            return None
 
-        T = Transformer(manifest_io)
-        Loader.load_from_cli(T.cli)
-        save_metadata(manifest_path, T.cli)
         out(f"✨ Reloaded {T.cli.name} CLI v{T.cli.version} ✨", fg="green")
 
-        if run_cli:
-            cli_runner(T.cli.name, T.cli.code, run_cli_args)
+        if run_cli and worker:
+            worker.run(T.cli.name, T.cli.code, run_cli_args)
+        elif run_cli:
+            # the CLI exits once it's done, which must not end the reload
+            with contextlib.suppress(SystemExit):
+                cli_runner(T.cli.name, T.cli.code, run_cli_args)
+        return T
+
+
+class MultiReloader(ChangeHandler):
+    """Reloads the CLIs of all manifests in a directory or matching a glob.
+
+    One recursive watch covers the directory, and includes outside it are watched by
+    directory. Changes are batched like a single manifest's, and each batch reloads
+    only the CLIs whose manifest or includes changed, in parallel.
+    """
+
+    def __init__(self, target: str, delay: float = RELOAD_DELAY) -> None:
+        self.target = target
+        self.root = os.path.realpath(get_watch_root(target))
+        self.scheduler = ReloadScheduler(self.run_reload, delay=delay)
+        # shared by the parallel reloads, which at worst resolve an include twice
+        self.include_cache: dict[str, CachedInclude] = {}
+        # include real paths by manifest path
+        self.manifests: dict[str, list[str]] = {}
+        self.changed_paths: set[str] = set()
+        self.lock = threading.Lock()
+        self.observer: Optional[BaseObserver] = None
+        self.watches: dict[str, ObservedWatch] = {}
+        self.update_manifests()
+
+        super().__init__()
+
+    def is_under_root(self, path: str) -> bool:
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def on_change(self, path: str) -> None:
+        real_path = os.path.realpath(path)
+        is_manifest = self.is_under_root(real_path) and any(
+            fnmatch.fnmatch(os.path.basename(real_path), pattern) for pattern in MANIFEST_PATTERNS
+        )
+        if is_manifest or any(real_path in include_paths for include_paths in self.manifests.values()):
+            with self.lock:
+                self.changed_paths.add(real_path)
+            self.scheduler.request()
+
+    def update_manifests(self) -> None:
+        """Picks up added and removed manifests. Manifests included by others are includes, not CLIs."""
+        manifests = {
+            path: self.manifests.get(path) or Transformer.get_include_paths(path)
+            for path in find_manifests(self.target)
+        }
+        include_paths = {path for paths in manifests.values() for path in paths}
+        self.manifests = {
+            path: paths for path, paths in manifests.items() if os.path.realpath(path) not in include_paths
+        }
+
+    def update_watches(self) -> None:
+        """Watches the directories of includes outside the recursively watched root"""
+        if not self.observer:
+            return
+
+        directories = {
+            os.path.dirname(path)
+            for include_paths in self.manifests.values()
+            for path in include_paths
+            if not self.is_under_root(path)
+        }
+        directories = {directory for directory in directories if os.path.isdir(directory)}
+        for directory in directories - self.watches.keys():
+            self.watches[directory] = self.observer.schedule(self, path=directory, recursive=False)
+        for directory in self.watches.keys() - directories:
+            self.observer.unschedule(self.watches.pop(directory))
+
+    def run_reload(self, requested_at: float, is_superseded: Callable[[], bool]) -> None:
+        started_at = time.monotonic()
+        with self.lock:
+            changed_paths, self.changed_paths = self.changed_paths, set()
+        known_manifests = set(self.manifests)
+        self.update_manifests()
+        affected_manifests = [
+            path
+            for path, include_paths in self.manifests.items()
+            if path not in known_manifests
+            or os.path.realpath(path) in changed_paths
+            or not changed_paths.isdisjoint(include_paths)
+        ]
+        if not affected_manifests:
+            self.update_watches()
+            return
+
+        reloaded, failed = [], []
+        with ThreadPoolExecutor(max_workers=min(len(affected_manifests), os.cpu_count() or 1)) as executor:
+            futures = {
+                path: executor.submit(load_cli, path, is_superseded=is_superseded, include_cache=self.include_cache)
+                for path in affected_manifests
+            }
+            for path, future in futures.items():
+                try:
+                    T = future.result()
+                except (Exception, SystemExit) as e:
+                    # exit_err has already reported why
+                    if not isinstance(e, SystemExit):
+                        out_err(f"~ {path}: {e}")
+                    failed.append(path)
+                    self.manifests[path] = Transformer.get_include_paths(path)
+                    continue
+
+                if not T:
+                    # reload it with the batch that superseded this one
+                    with self.lock:
+                        self.changed_paths.add(os.path.realpath(path))
+                    continue
+                reloaded.append(T.cli.name)
+                self.manifests[path] = T.include_paths
+
+        self.update_watches()
+        if not reloaded and not failed:
+            return
+
+        finished_at = time.monotonic()
+        status = f"⏱ reloaded {', '.join(reloaded) or 'nothing'} in {(finished_at - started_at) * 1000:.0f}ms"
+        status += f", {(finished_at - requested_at) * 1000:.0f}ms after the last change"
+        if failed:
+            status += f"; {len(failed)} failed: {', '.join(failed)}"
+        out(status, fg="red" if failed else "magenta")
+
+    @classmethod
+    def watch(cls, target: str, delay: float = RELOAD_DELAY) -> None:
+        event_handler = cls(target, delay=delay)
+        observer = Observer()
+        event_handler.observer = observer
+        observer.schedule(event_handler, path=event_handler.root, recursive=True)
+        event_handler.update_watches()
+        observe(observer, event_handler.scheduler)
+
+
+class TestWatcher(Reloader):
+    """Re-runs tests when their manifests or any manifest they include change"""
+
+    def __init__(self, manifest_paths: list[str], run_tests: Callable[[], None], delay: float = RELOAD_DELAY) -> None:
+        super().__init__(manifest_paths[0], False, (), delay=delay)
+        self.manifest_paths = manifest_paths
+        self.run_tests = run_tests
+
+    def update_all_watches(self) -> None:
+        # the first manifest is always watched, pass the others as includes
+        self.update_watches(
+            [
+                *(os.path.realpath(path) for path in self.manifest_paths[1:]),
+                *(include for path in self.manifest_paths for include in Transformer.get_include_paths(path)),
+            ]
+        )
+
+    def run_reload(self, requested_at: float, is_superseded: Callable[[], bool]) -> None:
+        try:
+            self.run_tests()
+        finally:
+            self.update_all_watches()
+
+    @classmethod
+    def watch_tests(cls, manifest_paths: list[str], run_tests: Callable[[], None], delay: float = RELOAD_DELAY) -> None:
+        event_handler = cls(manifest_paths, run_tests, delay=delay)
+        observer = Observer()
+        event_handler.observer = observer
+        event_handler.update_all_watches()
+        observe(observer, event_handler.scheduler)
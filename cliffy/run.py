@@ -1,12 +1,45 @@
+import os
+import sys
+from typing import Optional
+
+DAEMON_SOCKET_DIR_NAME = f"cliffy-{os.getuid()}" if hasattr(os, "getuid") else "cliffy"
+
+
+def get_socket_dir() -> str:
+    """Gets the private directory holding the daemon and zygote sockets"""
+    if daemon_dir := os.environ.get("CLIFFY_DAEMON_DIR"):
+        return daemon_dir
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(runtime_dir, DAEMON_SOCKET_DIR_NAME)
+
+
+def get_socket_path(cli_name: Optional[str] = None) -> str:
+    """Gets the socket path of the cliffy daemon, or of a CLI's zygote if `cli_name` is given"""
+    return os.path.join(get_socket_dir(), f"{cli_name}.sock" if cli_name else "daemon.sock")
+
+
+def forward_if_served(argv: list[str], cli_name: Optional[str] = None) -> None:
+    """Hands an invocation to the cliffy daemon or the CLI's zygote and exits with its exit code.
+    Returns to run locally when no server socket exists, without importing the daemon client."""
+    if os.environ.get("CLIFFY_NO_DAEMON") or not os.path.exists(get_socket_path(cli_name)):
+        return
+
+    from cliffy import daemon
+
+    exit_code = daemon.forward(os.path.basename(argv[0]), argv[1:], cli_name=cli_name)
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
 def run() -> None:
-    from cliffy.cli import cli
+    # daemon commands manage the daemon itself, so they always run locally
+    if sys.argv[1:2] != ["daemon"]:
+        forward_if_served(sys.argv)
+
+    run_local()
 
-    try:
-        from cliffy.ai import ai
 
-        cli.add_command(ai)
-    except Exception:
-        # print(e)
-        ...
+def run_local(prog_name: Optional[str] = None) -> None:
+    from cliffy.cli import cli
 
-    cli()  # type: ignore
+    cli(prog_name=prog_name)  # type: ignore
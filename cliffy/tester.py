@@ -1,19 +1,239 @@
-from typing import Generator, Union, cast
+from typing import Any, Generator, NoReturn, Optional, Union, cast
 from click.testing import Result
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from typer.testing import CliRunner
 from cliffy.manifest import CLIManifest, Command, RunBlock
 from cliffy.parser import Parser
 from cliffy.transformer import Transformer
-from cliffy.helper import import_module_from_path, delete_temp_files, TEMP_FILES
-from tempfile import NamedTemporaryFile
+from cliffy.helper import CLIFFY_CACHE_DIR, import_module_from_code, write_to_file
+from collections import defaultdict
+import ast
+import contextlib
+import hashlib
 import inspect
+import json
+import os
+import re
+import selectors
+import shlex
+import signal
+import sys
+import threading
+import time
+import traceback
 from pybash import transformer
 
+XML_INVALID_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# fingerprints of the passing test cases of each manifest, for `cli test --changed`
+TEST_FINGERPRINTS_DIR = os.path.join(CLIFFY_CACHE_DIR, "tests")
+
 
 class TestCase(BaseModel):
     command: str
     assert_script: str
+    # position among the manifest's test cases, from 1
+    number: int = 0
+
+
+class Timing(BaseModel):
+    """Seconds a test step took"""
+
+    wall: float = 0
+    # user and system time of the process running the step
+    cpu: float = 0
+    # user and system time of the child processes the step waited for, e.g. shelled out commands
+    children: float = 0
+
+
+class TestResult(BaseModel):
+    command: str
+    number: int
+    # None if the command couldn't be invoked
+    output: Optional[str] = None
+    exception: str = ""
+    # empty if the case passed
+    failure: str = ""
+    traceback: str = ""
+    timing: Timing = Field(default_factory=Timing)
+
+    @property
+    def passed(self) -> bool:
+        return not self.failure
+
+
+class ShellResult(BaseModel):
+    command: str
+    timing: Timing
+
+
+class ManifestReport(BaseModel):
+    """Results of running a manifest's tests"""
+
+    manifest: str
+    cli_name: str
+    results: list[TestResult] = []
+    shell_results: list[ShellResult] = []
+
+
+def write_json_report(path: str, reports: list[ManifestReport]) -> None:
+    manifests = [
+        {
+            **report.model_dump(exclude={"results"}),
+            "results": [{**result.model_dump(), "passed": result.passed} for result in report.results],
+        }
+        for report in reports
+    ]
+    write_to_file(path, json.dumps({"manifests": manifests}, indent=2) + "\n")
+
+
+def write_junit_xml(path: str, reports: list[ManifestReport]) -> None:
+    """Writes results as JUnit XML, a test suite per manifest with its shell scripts as test cases too"""
+    from xml.etree import ElementTree
+
+    testsuites = ElementTree.Element("testsuites")
+    for report in reports:
+        failures = sum(not result.passed for result in report.results)
+        steps = len(report.results) + len(report.shell_results)
+        wall = sum(result.timing.wall for result in report.results) + sum(
+            shell_result.timing.wall for shell_result in report.shell_results
+        )
+        testsuite = ElementTree.SubElement(
+            testsuites,
+            "testsuite",
+            name=report.cli_name,
+            file=report.manifest,
+            tests=str(steps),
+            failures=str(failures),
+            errors="0",
+            time=f"{wall:.3f}",
+        )
+        for shell_result in report.shell_results:
+            ElementTree.SubElement(
+                testsuite,
+                "testcase",
+                classname=f"{report.cli_name}.shell",
+                name=shell_result.command,
+                time=f"{shell_result.timing.wall:.3f}",
+            )
+        for result in report.results:
+            testcase = ElementTree.SubElement(
+                testsuite, "testcase", classname=report.cli_name, name=result.command, time=f"{result.timing.wall:.3f}"
+            )
+            if not result.passed:
+                failure = ElementTree.SubElement(testcase, "failure", message=result.failure)
+                failure.text = to_xml_text(result.traceback or result.failure)
+            if result.output:
+                ElementTree.SubElement(testcase, "system-out").text = to_xml_text(result.output)
+
+    ElementTree.indent(testsuites)
+    write_to_file(path, ElementTree.tostring(testsuites, encoding="unicode", xml_declaration=True) + "\n")
+
+
+def to_xml_text(text: str) -> str:
+    # XML 1.0 can't contain most control characters, e.g. from ANSI colored output
+    return XML_INVALID_CHARS_RE.sub("", text)
+
+
+def get_defined_names(statement: ast.stmt) -> set[str]:
+    if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {statement.name}
+    if isinstance(statement, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in statement.names}
+    return {node.id for node in ast.walk(statement) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+
+
+def get_used_names(statement: ast.stmt) -> set[str]:
+    return {node.id for node in ast.walk(statement) if isinstance(node, ast.Name)}
+
+
+def get_function_fingerprints(code: str) -> dict[str, str]:
+    """Fingerprints each top-level function of generated code with everything it depends on:
+    the statements registering it and the module-level definitions it uses, transitively,
+    e.g. manifest functions, imports, vars and types. Formatting and positions are ignored.
+
+    Args:
+        code (str): Generated CLI code
+
+    Returns:
+        dict[str, str]: Fingerprint by function name
+    """
+    statements = ast.parse(code).body
+    definitions: dict[str, list[int]] = defaultdict(list)
+    registrations: dict[str, list[int]] = defaultdict(list)
+    for i, statement in enumerate(statements):
+        for name in get_defined_names(statement):
+            definitions[name].append(i)
+
+    functions = [
+        statement.name for statement in statements if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    for i, statement in enumerate(statements):
+        # e.g. `app.command("name")(function)`
+        if not get_defined_names(statement):
+            for name in get_used_names(statement) & set(functions):
+                registrations[name].append(i)
+
+    fingerprints = {}
+    for function in functions:
+        dependencies = {*definitions[function], *registrations[function]}
+        pending = list(dependencies)
+        while pending:
+            for name in get_used_names(statements[pending.pop()]):
+                for i in definitions.get(name, []):
+                    if i not in dependencies:
+                        dependencies.add(i)
+                        pending.append(i)
+        dump = "\n".join(ast.dump(statements[i]) for i in sorted(dependencies))
+        fingerprints[function] = hashlib.sha256(dump.encode()).hexdigest()
+    return fingerprints
+
+
+class CaseTimeout(BaseException):
+    """Raised in a test case running past its timeout. Not an Exception, so the CLI runner doesn't catch it."""
+
+
+@contextlib.contextmanager
+def measure(timing: Timing) -> Generator[None, None, None]:
+    start_times = os.times()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end_times = os.times()
+        timing.wall = time.perf_counter() - start
+        # clamped, the differences of rounded clock ticks can come out a hair below 0
+        timing.cpu = max(0, end_times.user + end_times.system - start_times.user - start_times.system)
+        timing.children = max(
+            0,
+            end_times.children_user
+            + end_times.children_system
+            - start_times.children_user
+            - start_times.children_system,
+        )
+
+
+def can_time_out() -> bool:
+    """Tells whether a timeout can interrupt a case here: needs interval timers, which signal the main thread"""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextlib.contextmanager
+def time_limit(seconds: Optional[float]) -> Generator[None, None, None]:
+    """Raises CaseTimeout in the block once it runs for `seconds`, if it can time out at all"""
+    if not seconds or not can_time_out():
+        yield
+        return
+
+    def on_timeout(signum: int, frame: Any) -> None:
+        raise CaseTimeout()
+
+    previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
 
 
 class ShellScript(BaseModel):
@@ -34,32 +254,120 @@ class ShellScript(BaseModel):
 
 class Tester:
     def __init__(self, manifest_path: str) -> None:
+        self.manifest_path = manifest_path
         with open(manifest_path, "r") as manifest_io:
             self.T = Transformer(manifest_io)
 
-        with NamedTemporaryFile(mode="w", prefix=f"{self.T.cli.name}_test_", suffix=".py", delete=False) as runner_file:
-            runner_file.write(self.T.cli.code)
-            runner_file.flush()
-            self.module = import_module_from_path(runner_file.name)
-            TEMP_FILES.append(runner_file)
-
+        self.module = import_module_from_code(self.T.cli.name, self.T.cli.code)
         self.module_funcs = inspect.getmembers(self.module, inspect.isfunction)
-        delete_temp_files()
+        self.function_fingerprints = get_function_fingerprints(self.T.cli.code)
 
         self.runner = CliRunner()
         self.parser = Parser(cast(CLIManifest, self.T.manifest))
 
         self.test_pipeline: list[Union[ShellScript, TestCase]] = []
+        # shell scripts and groups of cases defined in one mapping, which run in order
+        self.test_steps: list[Union[ShellScript, list[TestCase]]] = []
+        self.shell_results: list[ShellResult] = []
         self.total_cases = 0
 
         for t in self.T.manifest.tests:
             if isinstance(t, str):
                 # assume it's a shell command
-                self.test_pipeline.append(ShellScript(command=t))
+                shell_script = ShellScript(command=t)
+                self.test_pipeline.append(shell_script)
+                self.test_steps.append(shell_script)
             elif isinstance(t, dict):
-                test_cases = [TestCase(command=command, assert_script=script) for command, script in t.items()]
+                test_cases = [
+                    TestCase(command=command, assert_script=script, number=self.total_cases + i + 1)
+                    for i, (command, script) in enumerate(t.items())
+                ]
                 self.total_cases += len(test_cases)
                 self.test_pipeline.extend(test_cases)
+                self.test_steps.append(test_cases)
+
+    @property
+    def fingerprints_path(self) -> str:
+        manifest_path = os.path.realpath(self.manifest_path)
+        return os.path.join(TEST_FINGERPRINTS_DIR, f"{hashlib.sha256(manifest_path.encode()).hexdigest()[:16]}.json")
+
+    def get_command_func_names(self) -> dict[str, str]:
+        """Maps the dotted names of commands and their aliases, e.g. `home.bu`, to their generated functions"""
+        func_names = {name for name, _ in self.module_funcs}
+        command_func_names = {}
+        commands = cast(CLIManifest, self.T.manifest).commands
+        for key in commands if isinstance(commands, dict) else [command.name for command in commands]:
+            name, *aliases = [part.strip() for part in key.split("|")]
+            with contextlib.suppress(ValueError):
+                func_name = self.parser.get_command_func_name(Command(name=name, run=RunBlock("")))
+                if func_name not in func_names:
+                    continue
+                group = name.rsplit(".", 1)[0] + "." if "." in name else ""
+                for command_name in (name, *(group + alias for alias in aliases)):
+                    command_func_names[command_name] = func_name
+        return command_func_names
+
+    def resolve_command_func(self, command: str) -> Optional[str]:
+        """Finds the generated function a test case command invokes, following groups and aliases.
+        None if it can't be resolved, e.g. for `--help` or greedy commands."""
+        try:
+            words = shlex.split(command)
+        except ValueError:
+            return None
+
+        command_func_names = self.get_command_func_names()
+        for end in range(len(words), 0, -1):
+            if func_name := command_func_names.get(".".join(words[:end])):
+                return func_name
+        return None
+
+    def get_case_fingerprint(self, case: TestCase) -> Optional[str]:
+        """Fingerprints a case with the code of the command it invokes. None if it can't be resolved."""
+        func_name = self.resolve_command_func(case.command)
+        if not func_name:
+            return None
+        command_fingerprint = self.function_fingerprints[func_name]
+        return hashlib.sha256(f"{case.command}\0{case.assert_script}\0{command_fingerprint}".encode()).hexdigest()
+
+    def load_fingerprints(self) -> set[str]:
+        with contextlib.suppress(OSError, ValueError):
+            with open(self.fingerprints_path) as fingerprints_file:
+                return set(json.load(fingerprints_file)["passed"])
+        return set()
+
+    def select_changed_cases(self) -> int:
+        """Keeps only the groups of cases that changed or didn't pass last time, with every shell
+        script if any case is kept. Cases that can't be resolved to a command always run.
+
+        Returns:
+            int: Cases kept
+        """
+        passed_fingerprints = self.load_fingerprints()
+        selected_steps: list[Union[ShellScript, list[TestCase]]] = []
+        for step in self.test_steps:
+            if isinstance(step, ShellScript) or any(
+                (fingerprint := self.get_case_fingerprint(case)) is None or fingerprint not in passed_fingerprints
+                for case in step
+            ):
+                selected_steps.append(step)
+
+        selected_cases = sum(len(step) for step in selected_steps if isinstance(step, list))
+        self.test_steps = selected_steps if selected_cases else []
+        return selected_cases
+
+    def record_results(self, results: list[TestResult]) -> None:
+        """Records the fingerprints of passing cases, so `select_changed_cases` skips them until they change"""
+        cases = {case.number: case for case in self.test_pipeline if isinstance(case, TestCase)}
+        passed_fingerprints = self.load_fingerprints()
+        for result in results:
+            if (fingerprint := self.get_case_fingerprint(cases[result.number])) is None:
+                continue
+            if result.passed:
+                passed_fingerprints.add(fingerprint)
+            else:
+                passed_fingerprints.discard(fingerprint)
+        with contextlib.suppress(OSError):
+            write_to_file(self.fingerprints_path, json.dumps({"passed": sorted(passed_fingerprints)}))
 
     def invoke_shell(self, script: ShellScript) -> None:
         py_code = transformer.transform(script.command)
@@ -71,6 +379,154 @@ class Tester:
         code = compile(script, f"test_{self.T.cli.name}.py", "exec")
         exec(code, {}, {"result": result, "result_text": result.output.strip()})
 
+    def run_shell(self, script: ShellScript) -> None:
+        result = ShellResult(command=script.command, timing=Timing())
+        with measure(result.timing):
+            self.invoke_shell(script)
+        self.shell_results.append(result)
+
+    def run_case(self, case: TestCase, timeout: Optional[float] = None) -> TestResult:
+        """Invokes a test case and runs its assertions, failing it if it runs for longer than `timeout` seconds"""
+        result = TestResult(command=case.command, number=case.number)
+        try:
+            with measure(result.timing), time_limit(timeout):
+                test = self.invoke_test(case.command, case.assert_script)
+                invoke_result = next(test)
+                result.output = invoke_result.output
+                if invoke_result.exception:
+                    result.exception = str(invoke_result)
+                next(test, "")
+        except CaseTimeout:
+            result.failure = f"Timeout: still running after {timeout:g}s"
+        except AssertionError:
+            _, _, tb = sys.exc_info()
+            tb_info = traceback.extract_tb(tb)
+            _, line_no, _, _ = tb_info[-1]
+            expr = case.assert_script.split("\n")[line_no - 1]
+            result.failure = f"AssertionError: (line {line_no}) > {expr}"
+        except SyntaxError:
+            result.failure = "Syntax error"
+            result.traceback = traceback.format_exc()
+        except Exception:
+            result.failure = "Exception"
+            result.traceback = traceback.format_exc()
+        return result
+
+    def run_tests(self, jobs: int = 1, timeout: Optional[float] = None) -> Generator[TestResult, None, None]:
+        """Runs the test steps, yielding case results in manifest order. Shell script results are
+        collected in `shell_results`.
+
+        With more than one job, each group of cases runs in a forked child of this
+        process, which has the CLI imported already, with up to `jobs` groups at once.
+        Shell scripts are barriers: they run once every case before them finished.
+
+        Args:
+            jobs (int): Groups of cases to run at once
+            timeout (Optional[float]): Seconds after which a case fails. Cases run in forked
+                children when this process can't interrupt them itself.
+
+        Yields:
+            TestResult: Case result
+        """
+        fork = hasattr(os, "fork") and (jobs > 1 or bool(timeout and not can_time_out()))
+        groups: list[list[TestCase]] = []
+        for step in [*self.test_steps, None]:
+            if isinstance(step, list):
+                groups.append(step)
+                continue
+
+            if fork:
+                yield from self.run_groups_forked(groups, jobs, timeout=timeout)
+            else:
+                for case in (case for group in groups for case in group):
+                    yield self.run_case(case, timeout=timeout)
+            groups = []
+            if step:
+                self.run_shell(step)
+
+    def run_groups_forked(
+        self, groups: list[list[TestCase]], jobs: int, timeout: Optional[float] = None
+    ) -> Generator[TestResult, None, None]:
+        finished: dict[int, list[TestResult]] = {}
+        pending = list(enumerate(groups))
+        next_index = 0
+        with selectors.DefaultSelector() as selector:
+            try:
+                while next_index < len(groups):
+                    while pending and len(selector.get_map()) < jobs:
+                        index, group = pending.pop(0)
+                        pid, read_fd = self.fork_group(group, timeout=timeout)
+                        selector.register(read_fd, selectors.EVENT_READ, (index, pid, group, bytearray()))
+
+                    if next_index in finished:
+                        yield from finished.pop(next_index)
+                        next_index += 1
+                        continue
+
+                    for key, _ in selector.select():
+                        index, pid, group, data = key.data
+                        if chunk := os.read(key.fd, 65536):
+                            data += chunk
+                            continue
+                        selector.unregister(key.fd)
+                        os.close(key.fd)
+                        _, status = os.waitpid(pid, 0)
+                        finished[index] = self.parse_group_results(group, bytes(data), status)
+            finally:
+                # the caller stopped early, e.g. on the first failure
+                for key in list(selector.get_map().values()):
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+                    with contextlib.suppress(OSError):
+                        os.kill(key.data[1], signal.SIGKILL)
+                        os.waitpid(key.data[1], 0)
+
+    def fork_group(self, group: list[TestCase], timeout: Optional[float] = None) -> tuple[int, int]:
+        """Runs a group of cases in a forked child, which writes a JSON line per case result
+
+        Returns:
+            tuple[int, int]: Child pid and the read end of its results pipe
+        """
+        read_fd, write_fd = os.pipe()
+        # buffered output would otherwise be written again by the child
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self.run_group_in_child(group, write_fd, timeout=timeout)
+        os.close(write_fd)
+        return pid, read_fd
+
+    def run_group_in_child(self, group: list[TestCase], write_fd: int, timeout: Optional[float] = None) -> NoReturn:
+        exit_code = 1
+        try:
+            for case in group:
+                data = (self.run_case(case, timeout=timeout).model_dump_json() + "\n").encode()
+                while data:
+                    data = data[os.write(write_fd, data) :]
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+
+    @staticmethod
+    def parse_group_results(group: list[TestCase], data: bytes, status: int) -> list[TestResult]:
+        """Parses the results a child reported, failing the cases it exited before reporting"""
+        results = []
+        for line in data.splitlines():
+            with contextlib.suppress(ValidationError):
+                results.append(TestResult.model_validate_json(line))
+        for case in group[len(results) :]:
+            results.append(
+                TestResult(
+                    command=case.command,
+                    number=case.number,
+                    failure="Exception",
+                    traceback=f"test process exited with code {os.waitstatus_to_exitcode(status)}\n",
+                )
+            )
+        return results
+
     def is_valid_command(self, command: str) -> bool:
         command_name = command.split(" ")[0]
         cmd = Command(name=command_name, run=RunBlock(""))
@@ -1,9 +1,11 @@
+import contextlib
+import copy
 import os
-from typing import Any, TextIO
+from typing import Any, Optional, TextIO
 
 import yaml
 from jinja2 import BaseLoader, Environment, FileSystemLoader
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 from typing_extensions import Self
 
 from cliffy.commander import generate_cli
@@ -14,10 +16,37 @@ from cliffy.manifest import LATEST_SCHEMA_VERSION, IncludeManifest, CLIManifest
 from cliffy.merger import cliffy_merger
 
 
+class CachedInclude(BaseModel):
+    """Resolved include config, valid while none of the manifests it was resolved from change"""
+
+    mtimes: dict[str, int]
+    command_config: dict[str, Any]
+    include_paths: list[str]
+
+    def is_current(self) -> bool:
+        return all(get_mtime(path) == mtime for path, mtime in self.mtimes.items())
+
+
+def get_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
 class Transformer:
     """Loads command manifest and transforms it into a CLI"""
 
-    __slots__ = ("manifest_io", "command_config", "manifest_version", "includes_config", "manifest", "cli")
+    __slots__ = (
+        "manifest_io",
+        "include_cache",
+        "include_paths",
+        "command_config",
+        "manifest_version",
+        "includes_config",
+        "manifest",
+        "cli",
+    )
 
     def __init__(
         self,
@@ -25,8 +54,21 @@ class Transformer:
         *,
         as_include: bool = False,
         validate_requires: bool = True,
+        include_cache: Optional[dict[str, CachedInclude]] = None,
     ) -> None:
+        """
+        Args:
+            manifest_io (TextIO): Manifest to transform
+            as_include (bool): Validate the manifest as an include rather than a full CLI manifest
+            validate_requires (bool): Check the manifest requirements are installed
+            include_cache (Optional[dict[str, CachedInclude]]): Resolved includes by real path, reused while their
+                manifests are unchanged and updated with re-resolved ones. Lets repeated transforms of a manifest
+                re-parse only the includes that changed.
+        """
         self.manifest_io = manifest_io
+        self.include_cache = include_cache
+        # real paths of all manifests included directly or transitively, in resolution order
+        self.include_paths: list[str] = []
         self.command_config = self.load_manifest(manifest_io)
         self.manifest_version = self.command_config.pop("manifestVersion", LATEST_SCHEMA_VERSION)
         if self.command_config.get("includes"):
@@ -66,17 +108,70 @@ class Transformer:
                 )
 
     def resolve_includes(self) -> dict[str, Any]:
-        include_transforms = map(self.resolve_include_by_path, set(self.command_config["includes"]))
         merged_config: dict[str, Any] = {}
-        for transformed_include in include_transforms:
-            cliffy_merger.merge(merged_config, transformed_include.command_config)
+        for path in dict.fromkeys(self.command_config["includes"]):
+            include = self.resolve_include(path)
+            for include_path in include.include_paths:
+                if include_path not in self.include_paths:
+                    self.include_paths.append(include_path)
+            # merging mutates nested values, keep the cached config intact
+            cliffy_merger.merge(merged_config, copy.deepcopy(include.command_config))
 
         return merged_config
 
+    def resolve_include(self, path: str) -> CachedInclude:
+        """Resolves an include, reusing its cached config if its manifests are unchanged
+
+        Args:
+            path (str): Include manifest path
+
+        Returns:
+            CachedInclude: Resolved include, with its own path first in `include_paths`
+        """
+        real_path = os.path.realpath(path)
+        if self.include_cache is not None and (cached := self.include_cache.get(real_path)) and cached.is_current():
+            return cached
+
+        # stat before reading, so a change while resolving invalidates the cache entry
+        mtime = get_mtime(real_path)
+        T = self.resolve_include_by_path(path, include_cache=self.include_cache)
+        include = CachedInclude(
+            mtimes={real_path: mtime},
+            command_config=copy.deepcopy(T.command_config),
+            include_paths=[real_path, *T.include_paths],
+        )
+        if self.include_cache is not None:
+            # nested includes were cached while resolving this one
+            for include_path in T.include_paths:
+                include.mtimes[include_path] = self.include_cache[include_path].mtimes[include_path]
+            self.include_cache[real_path] = include
+        return include
+
     @classmethod
-    def resolve_include_by_path(cls, path: str) -> Self:
+    def resolve_include_by_path(cls, path: str, include_cache: Optional[dict[str, CachedInclude]] = None) -> Self:
         with open(path, "r") as m:
-            return cls(m, as_include=True)
+            return cls(m, as_include=True, include_cache=include_cache)
+
+    @classmethod
+    def get_include_paths(cls, manifest_path: str) -> list[str]:
+        """Finds the real paths of all manifests a manifest includes, directly or transitively,
+        without validating or transforming them. Includes that can't be loaded are still listed.
+
+        Args:
+            manifest_path (str): Manifest path
+
+        Returns:
+            list[str]: Included manifest real paths
+        """
+        include_paths: list[str] = []
+        pending = [manifest_path]
+        while pending:
+            with contextlib.suppress(Exception, SystemExit), open(pending.pop(0), "r") as manifest_io:
+                for path in cls.load_manifest(manifest_io).get("includes") or []:
+                    if (real_path := os.path.realpath(path)) not in include_paths:
+                        include_paths.append(real_path)
+                        pending.append(path)
+        return include_paths
 
     @staticmethod
     def load_manifest(manifest_io: TextIO) -> dict[str, Any]:
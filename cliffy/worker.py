@@ -0,0 +1,208 @@
+"""Warm worker process that runs reloaded CLIs for `cli dev --run-cli`.
+
+The worker keeps the CLI framework and everything the CLI imported loaded between
+reloads. For each run it executes the newly compiled module in itself, so its
+imports stay warm, and forks a child to call the CLI, so a crashing or hanging
+command never takes down the worker or the watcher. Output goes straight to the
+terminal the worker shares with `cli dev`, and exit codes come back over a pipe.
+"""
+
+import contextlib
+import marshal
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+from queue import Queue
+from types import ModuleType
+from typing import Optional
+
+from cliffy.daemon import INT_FORMAT, INT_SIZE, call_cli
+from cliffy.helper import compile_code, get_code_filename, import_module_from_code, out_err
+
+WORKER_STOP_TIMEOUT = 5
+# not run with `-m`, which would make click name the CLIs `python -m cliffy.<name>`
+WORKER_BOOTSTRAP = "import sys; from cliffy.worker import serve; serve(int(sys.argv[1]), int(sys.argv[2]))"
+
+
+def read_exact(fd: int, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            raise EOFError("worker pipe closed")
+        data += chunk
+    return data
+
+
+def write_message(fd: int, payload: bytes) -> None:
+    data = struct.pack(INT_FORMAT, len(payload)) + payload
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def read_message(fd: int) -> bytes:
+    return read_exact(fd, struct.unpack(INT_FORMAT, read_exact(fd, INT_SIZE))[0])
+
+
+class CLIWorker:
+    """Parent side of a warm worker process, restarted on the next run if it dies"""
+
+    __slots__ = ("process", "request_fd", "cli_name", "exit_codes")
+
+    def __init__(self) -> None:
+        self.process: Optional[subprocess.Popen] = None
+        self.request_fd = -1
+        self.cli_name = ""
+        # exit codes of finished runs, in order
+        self.exit_codes: Queue[int] = Queue()
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(os, "fork")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        request_read, request_write = os.pipe()
+        reply_read, reply_write = os.pipe()
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", WORKER_BOOTSTRAP, str(request_read), str(reply_write)],
+            pass_fds=(request_read, reply_write),
+        )
+        os.close(request_read)
+        os.close(reply_write)
+        self.request_fd = request_write
+        threading.Thread(target=self.read_replies, args=(reply_read,), daemon=True).start()
+
+    def stop(self) -> None:
+        if self.request_fd != -1:
+            with contextlib.suppress(OSError):
+                os.close(self.request_fd)
+            self.request_fd = -1
+        if self.process:
+            try:
+                self.process.wait(timeout=WORKER_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def run(self, cli_name: str, code: str, args: Optional[tuple] = None) -> None:
+        """Runs a CLI in the worker, replacing any run still in progress. Returns without waiting for it.
+
+        Args:
+            cli_name (str): CLI name
+            code (str): Generated CLI code
+            args (Optional[tuple]): CLI arguments, or None to only load the CLI and warm up its imports
+        """
+        self.cli_name = cli_name
+        request = {
+            "cli_name": cli_name,
+            "code": code,
+            # compiled here, where it's cached across reloads
+            "code_object": compile_code(code, get_code_filename(cli_name)),
+            "args": None if args is None else list(args),
+        }
+        if not self.is_alive():
+            self.stop()
+            self.start()
+        try:
+            write_message(self.request_fd, marshal.dumps(request))
+        except OSError:
+            # died since the check, e.g. while loading the previous CLI
+            self.stop()
+            self.start()
+            write_message(self.request_fd, marshal.dumps(request))
+
+    def read_replies(self, reply_fd: int) -> None:
+        with contextlib.suppress(EOFError, OSError):
+            while True:
+                exit_code = struct.unpack(INT_FORMAT, read_exact(reply_fd, INT_SIZE))[0]
+                self.exit_codes.put(exit_code)
+                if exit_code:
+                    out_err(f"~ {self.cli_name} exited with {exit_code}")
+        os.close(reply_fd)
+
+
+def load_module(request: dict) -> Optional[ModuleType]:
+    try:
+        return import_module_from_code(request["cli_name"], request["code"], code_object=request["code_object"])
+    except BaseException:
+        traceback.print_exc()
+        return None
+
+
+def run_child(module: ModuleType, cli_name: str, args: list[str]) -> None:
+    """Runs the CLI in a forked child. Never returns."""
+    exit_code = 1
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        sys.argv = [cli_name, *args]
+        exit_code = call_cli(module.cli)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        with contextlib.suppress(Exception):
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def stop_child(pid: int) -> None:
+    with contextlib.suppress(OSError):
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+def serve(request_fd: int, reply_fd: int) -> None:
+    """Serves run requests until the parent closes the request pipe"""
+    # the framework import dominates a CLI's startup, load it before the first run
+    for framework in ("typer", "rich_click"):
+        with contextlib.suppress(ImportError):
+            __import__(framework)
+    # Ctrl+C in the terminal is for the watcher and the running command
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    child_pid = 0
+    child_done = threading.Event()
+    module: Optional[ModuleType] = None
+
+    def wait_child(pid: int) -> None:
+        _, status = os.waitpid(pid, 0)
+        exit_code = os.waitstatus_to_exitcode(status)
+        # runs stopped for a newer one aren't reported
+        if exit_code != -signal.SIGTERM:
+            with contextlib.suppress(OSError):
+                os.write(reply_fd, struct.pack(INT_FORMAT, exit_code))
+        child_done.set()
+
+    try:
+        while True:
+            request = marshal.loads(read_message(request_fd))
+            if child_pid and not child_done.is_set():
+                with contextlib.suppress(OSError):
+                    os.kill(child_pid, signal.SIGTERM)
+                child_done.wait()
+
+            if module:
+                sys.modules.pop(module.__name__, None)
+            module = load_module(request)
+            if request["args"] is None:
+                continue
+            if not module:
+                os.write(reply_fd, struct.pack(INT_FORMAT, 1))
+                continue
+
+            child_done.clear()
+            child_pid = os.fork()
+            if child_pid == 0:
+                run_child(module, request["cli_name"], request["args"])
+            threading.Thread(target=wait_child, args=(child_pid,), daemon=True).start()
+    except EOFError:
+        if child_pid and not child_done.is_set():
+            stop_child(child_pid)
@@ -1,6 +1,20 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
 import pytest
 from click.testing import CliRunner
-from cliffy.ai import ai
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+
+from cliffy import ai as cliffy_ai
+from cliffy.ai import AIResponse, ResponseCache, ai, complete_prompts, render_manifest_schema
+from cliffy.manifest import CLIManifest, Command
+from cliffy.transformer import Transformer
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
 
 
 @pytest.fixture
@@ -8,6 +22,16 @@ def runner():
     return CliRunner()
 
 
+@pytest.fixture(autouse=True)
+def ai_cache_dir(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "ai-cache")
+    monkeypatch.setattr(cliffy_ai, "AI_CACHE_DIR", cache_dir)
+    monkeypatch.setattr(cliffy_ai, "SCHEMA_CACHE_DIR", str(tmp_path / "schema-cache"))
+    cliffy_ai.get_manifest_schema.cache_clear()
+    yield cache_dir
+    cliffy_ai.get_manifest_schema.cache_clear()
+
+
 def test_generate_command(runner, tmp_path_factory):
     tmp_dir = tmp_path_factory.mktemp("data")
     result = runner.invoke(ai, ["generate", "test_cli", "This is a test CLI description.", "-m", "test", "-o", tmp_dir])
@@ -19,3 +43,170 @@ def test_ask_command(runner):
     result = runner.invoke(ai, ["ask", "What is cliffy?", "-m", "test"])
     assert result.exit_code == 0
     assert "token usage:" in result.output
+
+
+def test_ask_command_reuses_cached_response(runner):
+    first = runner.invoke(ai, ["ask", "What is cliffy?", "-m", "test"])
+    cached = runner.invoke(ai, ["ask", "What is cliffy?", "-m", "test"])
+    uncached = runner.invoke(ai, ["ask", "What is cliffy?", "-m", "test", "--cache-ttl", "0"])
+
+    assert "token usage:" in first.output
+    assert "token usage (1 cached, no tokens used):" in cached.output
+    assert "token usage:" in uncached.output
+
+
+def test_system_prompts_are_built_once():
+    assert cliffy_ai.get_generate_system_prompt() is cliffy_ai.get_generate_system_prompt()
+    assert cliffy_ai.get_manifest_schema("minimal") in cliffy_ai.get_ask_system_prompt("minimal")
+
+
+def test_complete_prompts_runs_concurrently_and_caches(ai_cache_dir):
+    in_flight = peak = 0
+    calls = []
+
+    async def respond(messages, info):
+        nonlocal in_flight, peak
+        prompt = messages[-1].parts[-1].content
+        calls.append(prompt)
+        if prompt == "fail":
+            raise ValueError("model failed")
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return ModelResponse(parts=[TextPart(f"answer to {prompt}")])
+
+    model = FunctionModel(respond)
+    cache = ResponseCache(ai_cache_dir)
+    prompts = ["a", "b", "c", "d", "fail"]
+
+    responses = complete_prompts(model, "system", prompts, cache=cache, concurrency=2)
+    cached_responses = complete_prompts(model, "system", prompts, cache=cache, concurrency=2)
+    other_system_prompt = complete_prompts(model, "other system", ["a"], cache=cache)
+
+    assert [response.data for response in responses[:4]] == ["answer to a", "answer to b", "answer to c", "answer to d"]
+    assert isinstance(responses[4], ValueError)
+    assert peak == 2
+    assert all(response.cached for response in cached_responses[:4])
+    # only the failed prompt is sent again
+    assert calls[5:] == ["fail", "a"]
+    assert not other_system_prompt[0].cached
+
+
+def test_response_cache_expires_and_prunes_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=200)
+    response = AIResponse(data="x" * 50, request_tokens=1, response_tokens=2)
+    for key in ("old", "middle", "new"):
+        cache.put(key, response)
+    old_time = time.time() - 30
+    os.utime(cache.get_path("old"), (old_time, old_time))
+    os.utime(cache.get_path("middle"), (old_time + 1, old_time + 1))
+    expired_time = time.time() - 120
+    cache.put("expired", response)
+    os.utime(cache.get_path("expired"), (expired_time, expired_time))
+
+    expired = cache.get("expired")
+    cache.prune()
+
+    assert expired is None
+    assert not os.path.exists(cache.get_path("expired"))
+    # least recently used entries go first once the cache is over its size cap
+    assert not os.path.exists(cache.get_path("old"))
+    assert cache.get("middle") == response.model_copy(update={"cached": True})
+    assert cache.get("new").cached
+
+
+def test_generate_command_from_file(runner, tmp_path):
+    requests_path = tmp_path / "requests.txt"
+    requests_path.write_text("# CLIs to generate\nfirst A first CLI\n\nsecond A second CLI\n")
+
+    result = runner.invoke(
+        ai, ["generate", "--from", str(requests_path), "-m", "test", "-o", str(tmp_path), "--concurrency", "2"]
+    )
+
+    assert result.exit_code == 0
+    assert "first.yaml" in result.output
+    assert (tmp_path / "first.yaml").exists()
+    assert (tmp_path / "second.yaml").exists()
+
+
+def test_generate_command_requires_a_request(runner):
+    result = runner.invoke(ai, ["generate", "-m", "test"])
+    assert result.exit_code == 1
+    assert "missing a CLI name and a description, or --from" in result.output
+
+
+def test_render_manifest_schema_details():
+    schema = CLIManifest.model_json_schema()
+
+    full = render_manifest_schema(schema, "full")
+    compact = render_manifest_schema(schema, "compact")
+    minimal = render_manifest_schema(schema, "minimal")
+
+    assert full == json.dumps(schema)
+    compact_schema = json.loads(compact)
+    assert "title" not in compact_schema["properties"]["name"]
+    assert compact_schema["properties"]["name"]["description"] == schema["properties"]["name"]["description"]
+    assert compact_schema["$defs"]["Command"]["properties"]["params"]["description"] == (
+        "A list of parameters for the command."
+    )
+    # fields named like schema keywords are kept
+    assert "default" in compact_schema["$defs"]["CommandParam"]["properties"]
+    assert compact_schema["$defs"]["SimpleCommandParam"]["description"].startswith("Build params with key")
+    assert "interface CLIManifest {\n  manifestVersion?: string;\n  name: string;" in minimal
+    assert "  commands: Record<string, Command | RunBlock | RunBlockList> | Command[];" in minimal
+    assert "type RunBlockList = RunBlock[];" in minimal
+    assert len(minimal) < len(compact) < len(full) * 2 / 3
+
+
+def test_manifest_schema_is_cached_on_disk(tmp_path):
+    schema = cliffy_ai.get_manifest_schema("compact")
+    cache_files = list((tmp_path / "schema-cache").iterdir())
+    cache_files[0].write_text("cached schema")
+    (tmp_path / "schema-cache" / "old-version-compact.txt").write_text("stale")
+    cliffy_ai.get_manifest_schema.cache_clear()
+
+    cached_schema = cliffy_ai.get_manifest_schema("compact")
+    cliffy_ai.get_manifest_schema.cache_clear()
+    cliffy_ai.get_manifest_schema("minimal")
+
+    assert [path.name for path in cache_files] == [f"{cliffy_ai.get_schema_cache_key()}-compact.txt"]
+    assert json.loads(schema)
+    assert cached_schema == "cached schema"
+    assert not (tmp_path / "schema-cache" / "old-version-compact.txt").exists()
+
+
+def test_preview_reports_token_estimate(runner):
+    result = runner.invoke(ai, ["ask", "What is cliffy?", "--preview", "--schema-detail", "minimal"])
+
+    schema_tokens = cliffy_ai.estimate_tokens(cliffy_ai.get_manifest_schema("minimal"))
+    assert f"~{schema_tokens} for the minimal schema" in result.output
+
+
+@pytest.mark.parametrize("schema_detail", ["full", "compact", "minimal"])
+@pytest.mark.parametrize("example", ["hello.yaml", "todo.yaml", "town.yaml"])
+def test_generate_with_schema_detail_keeps_manifest_fields(runner, tmp_path, monkeypatch, schema_detail, example):
+    seen_prompts = []
+
+    def respond(messages, info):
+        system_prompt = messages[0].parts[0].content
+        seen_prompts.append(system_prompt)
+        return ModelResponse(parts=[TextPart("```yaml\n" + (EXAMPLES_DIR / example).read_text() + "```")])
+
+    # the --model option only takes model names, so swap in the function model
+    complete_prompts_with_name = cliffy_ai.complete_prompts
+    monkeypatch.setattr(
+        cliffy_ai,
+        "complete_prompts",
+        lambda model, *args, **kwargs: complete_prompts_with_name(FunctionModel(respond), *args, **kwargs),
+    )
+    result = runner.invoke(
+        ai, ["generate", "generated", "A CLI", "-o", str(tmp_path), "--schema-detail", schema_detail]
+    )
+
+    assert result.exit_code == 0, result.output
+    # every manifest and command field the model can use is described at every detail
+    for field in [*CLIManifest.model_fields, *Command.model_fields]:
+        assert field in seen_prompts[0]
+    with open(tmp_path / "generated.yaml") as manifest:
+        assert Transformer(manifest).manifest.commands
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from cliffy.bencher import Bencher, BenchmarkBaseline, BenchmarkResult, percentile
+from cliffy.cli import cli
+
+MANIFEST = """
+manifestVersion: v3
+name: benched
+version: 0.1.0
+commands:
+  echo: |
+    print("echo")
+  fail: |
+    raise SystemExit("broken")
+benchmarks:
+  - echo
+  - command: echo --help
+    mode: both
+    warmup: 0
+    iterations: 2
+"""
+
+
+@pytest.fixture
+def manifest_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "benched.yaml").write_text(MANIFEST)
+    return "benched.yaml"
+
+
+def test_percentile_uses_nearest_rank():
+    # Arrange
+    values = [float(value) for value in range(1, 101)]
+
+    # Assert
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3
+
+
+def test_run_benchmarks_times_warm_and_cold_runs(manifest_path):
+    # Arrange
+    bencher = Bencher(manifest_path)
+
+    # Act
+    results = list(bencher.run_benchmarks())
+
+    # Assert
+    assert [result.name for result in results] == ["warm echo", "warm echo --help", "cold echo --help"]
+    assert [len(result.runs) for result in results] == [20, 2, 2]
+    assert all(not result.failures for result in results)
+    assert list(results[0].stats) == ["min", "mean", "p50", "p95", "p99"]
+
+
+def test_run_benchmarks_fails_thresholds_and_errors(manifest_path, tmp_path):
+    # Arrange
+    (tmp_path / "benched.yaml").write_text(
+        MANIFEST.split("benchmarks:")[0]
+        + "benchmarks:\n  - command: echo\n    iterations: 2\n    p50: 0.000001\n  - fail\n"
+    )
+    bencher = Bencher(manifest_path)
+
+    # Act
+    threshold, error = list(bencher.run_benchmarks())
+
+    # Assert
+    assert threshold.failures[0].startswith("p50 ")
+    assert "over the 1e-06ms threshold" in threshold.failures[0]
+    assert error.runs == []
+    assert error.failures == ["exited with 1: broken"]
+
+
+def test_baseline_reports_regressions(tmp_path):
+    # Arrange
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps({"benchmarks": {"warm echo": {"p50_ms": 1.0, "p95_ms": 2.0}}}))
+    baseline = BenchmarkBaseline(str(baseline_path), max_regression=10)
+    regressed = BenchmarkResult(command="echo", mode="warm", runs=[1.05, 3.0])
+    new = BenchmarkResult(command="echo", mode="cold", runs=[100.0])
+
+    # Act
+    baseline.check(regressed)
+    baseline.check(new)
+    baseline.save()
+
+    # Assert
+    assert regressed.failures == ["p95 3.0ms regressed more than 10% from the 2.0ms baseline"]
+    assert not new.failures
+    saved = json.loads(baseline_path.read_text())["benchmarks"]
+    # existing entries are kept until the baseline is updated
+    assert saved == {"cold echo": {"p50_ms": 100.0, "p95_ms": 100.0}, "warm echo": {"p50_ms": 1.0, "p95_ms": 2.0}}
+
+
+def test_bench_command_saves_baseline_and_fails_regressions(manifest_path, tmp_path):
+    # Act
+    first = CliRunner().invoke(cli, ["bench", manifest_path])
+    baseline = json.loads((tmp_path / "benched.bench.json").read_text())
+    baseline["benchmarks"]["warm echo"] = {"p50_ms": 0.000001, "p95_ms": 0.000001}
+    (tmp_path / "benched.bench.json").write_text(json.dumps(baseline))
+    regressed = CliRunner().invoke(cli, ["bench", manifest_path])
+
+    # Assert
+    assert first.exit_code == 0
+    assert "All benchmarks passed" in first.output
+    assert "Saved baseline to benched.bench.json" in first.output
+    assert set(baseline["benchmarks"]) == {"warm echo", "warm echo --help", "cold echo --help"}
+    assert regressed.exit_code == 1
+    assert "benchmarks failed" in regressed.output
+
+
+def test_bench_command_requires_benchmarks(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "empty.yaml").write_text(MANIFEST.split("benchmarks:")[0])
+
+    # Act
+    result = CliRunner().invoke(cli, ["bench", "empty.yaml"])
+
+    # Assert
+    assert result.exit_code == 1
+    assert "Missing benchmarks section in empty.yaml" in result.output
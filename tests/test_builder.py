@@ -0,0 +1,326 @@
+import os
+import subprocess
+import sys
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from cliffy.builder import (
+    BuildTarget,
+    build_target,
+    build_targets,
+    get_build_requirements,
+    get_imported_modules,
+    get_layer_key,
+    get_site_packages_layer,
+    get_size_report,
+    link_fleet_clis,
+    link_tree,
+    normalize_requirements,
+    package_zipapp,
+    prune_site_packages,
+    strip_site_packages,
+)
+
+
+@pytest.mark.parametrize(
+    "deps, expected",
+    [
+        (["typer", "Tabulate"], ["tabulate", "typer"]),
+        (["tabulate", "typer", "tabulate"], ["tabulate", "typer"]),
+        (["six < 1.0.0", "Rich_Click>=1.6"], ["rich-click>=1.6", "six<1.0.0"]),
+    ],
+)
+def test_normalize_requirements(deps, expected):
+    assert normalize_requirements(deps) == expected
+
+
+def test_layer_key_ignores_requirement_order():
+    assert get_layer_key(normalize_requirements(["typer", "rich"])) == get_layer_key(
+        normalize_requirements(["Rich", "typer"])
+    )
+    assert get_layer_key(["typer"]) != get_layer_key(["typer", "rich"])
+
+
+def test_layer_key_includes_wheelhouse(tmp_path: Path):
+    wheelhouse = tmp_path / "wheels"
+    wheelhouse.mkdir()
+    offline_key = get_layer_key(["typer"], str(wheelhouse))
+
+    (wheelhouse / "typer-1.0-py3-none-any.whl").write_text("")
+
+    assert get_layer_key(["typer"]) != offline_key
+    assert get_layer_key(["typer"], str(wheelhouse)) != offline_key
+
+
+def test_site_packages_layer_cached(mocker: MockerFixture, tmp_path: Path):
+    # Arrange
+    mocker.patch("cliffy.builder.CLIFFY_CACHE_DIR", str(tmp_path))
+
+    def fake_install(args):
+        target = Path(args[args.index("--target") + 1])
+        (target / "typer").mkdir()
+        (target / "typer" / "__init__.py").write_text("")
+
+    mock_install = mocker.patch("cliffy.builder.pip.install", side_effect=fake_install)
+
+    # Act
+    layer = get_site_packages_layer(["typer"])
+    cached_layer = get_site_packages_layer(["Typer"])
+
+    # Assert
+    assert layer == cached_layer
+    mock_install.assert_called_once()
+    assert mock_install.call_args.args[0][2:] == ["typer"]
+    assert (layer / "typer" / "__init__.py").exists()
+    # no staging dirs left behind
+    assert [p.name for p in (tmp_path / "layers").iterdir()] == [layer.name]
+
+    # Act
+    (layer / "typer" / "old.py").write_text("")
+    refreshed_layer = get_site_packages_layer(["typer"], refresh=True)
+    wheelhouse_layer = get_site_packages_layer(["typer"], wheelhouse=str(tmp_path))
+
+    # Assert
+    assert refreshed_layer == layer
+    assert not (layer / "typer" / "old.py").exists()
+    assert wheelhouse_layer != layer
+    assert mock_install.call_count == 3
+    assert mock_install.call_args.args[0][2:] == ["--no-index", "--find-links", str(tmp_path), "typer"]
+    assert sorted(p.name for p in (tmp_path / "layers").iterdir()) == sorted([layer.name, wheelhouse_layer.name])
+
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    link_tree(layer, str(dist))
+    assert (dist / "typer" / "__init__.py").exists()
+
+
+def test_site_packages_layer_install_failure(mocker: MockerFixture, tmp_path: Path):
+    # Arrange
+    mocker.patch("cliffy.builder.CLIFFY_CACHE_DIR", str(tmp_path))
+    mocker.patch("cliffy.builder.pip.install", side_effect=SystemExit(1))
+
+    # Act & Assert
+    with pytest.raises(SystemExit):
+        get_site_packages_layer(["not-a-real-package"])
+
+    assert list((tmp_path / "layers").iterdir()) == []
+
+
+def write_script(directory: Path, cli_name: str, code: str = "import typer\n") -> str:
+    script_path = directory / f"{cli_name}_script.py"
+    script_path.write_text(f"## Generated {cli_name} on {datetime.now()}\n{code}")
+    return str(script_path)
+
+
+def fake_build_cli(cli_name, output_dir, **kwargs):
+    Path(output_dir, cli_name).write_text(cli_name)
+    return MagicMock(exit_code=0, stdout="")
+
+
+def test_build_target_captures_failures(mocker: MockerFixture, tmp_path: Path):
+    # Arrange
+    def failing_build(**kwargs):
+        print("ERROR: No matching distribution found")
+        raise SystemExit(3)
+
+    mocker.patch("cliffy.builder.build_cli", side_effect=failing_build)
+
+    # Act
+    outcome = build_target(BuildTarget(cli_name="broken", script_path=write_script(tmp_path, "broken")))
+
+    # Assert
+    assert outcome.cli_name == "broken"
+    assert outcome.exit_code == 3
+    assert "No matching distribution" in outcome.output
+
+
+def test_build_targets_sequential(mocker: MockerFixture, tmp_path: Path):
+    # Arrange
+    mock_build_cli = mocker.patch("cliffy.builder.build_cli", side_effect=fake_build_cli)
+    targets = [
+        BuildTarget(cli_name=name, script_path=write_script(tmp_path, name), deps=["rich"], output_dir=str(tmp_path))
+        for name in ("a", "b")
+    ]
+
+    # Act
+    outcomes = list(build_targets(targets, jobs=1))
+
+    # Assert
+    assert [outcome.cli_name for outcome in outcomes] == ["a", "b"]
+    assert all(outcome.exit_code == 0 for outcome in outcomes)
+    assert mock_build_cli.call_args.kwargs["deps"] == ["rich"]
+
+
+def test_build_targets_skips_unchanged(mocker: MockerFixture, tmp_path: Path):
+    # Arrange
+    mock_build_cli = mocker.patch("cliffy.builder.build_cli", side_effect=fake_build_cli)
+    target = BuildTarget(cli_name="hello", script_path=write_script(tmp_path, "hello"), output_dir=str(tmp_path))
+    list(build_targets([target]))
+
+    # Act & Assert
+    # regenerated code only differs in its generated timestamp
+    target.script_path = write_script(tmp_path, "hello")
+    assert [outcome.skipped for outcome in build_targets([target])] == [True]
+    assert [outcome.skipped for outcome in build_targets([target], force=True)] == [False]
+    assert mock_build_cli.call_args.kwargs["refresh_layer"]
+    assert [outcome.skipped for outcome in build_targets([target.model_copy(update={"prune": True})])] == [False]
+
+    target.script_path = write_script(tmp_path, "hello", code="import typer\nprint('changed')\n")
+    assert [outcome.skipped for outcome in build_targets([target])] == [False]
+
+    (tmp_path / "hello").write_text("modified output")
+    assert [outcome.skipped for outcome in build_targets([target])] == [False]
+    assert mock_build_cli.call_count == 5
+
+
+def test_link_fleet_clis(tmp_path: Path):
+    # Arrange
+    fleet_path = tmp_path / "fleet"
+    fleet_path.write_text("")
+    (tmp_path / "hello").symlink_to("old-fleet")
+    (tmp_path / "town").write_text("standalone zipapp")
+
+    # Act
+    links, skipped = link_fleet_clis(str(fleet_path), ["hello", "town"])
+
+    # Assert
+    assert os.readlink(tmp_path / "hello") == "old-fleet"
+    assert links == []
+    assert skipped == [str(tmp_path / "hello"), str(tmp_path / "town")]
+    assert (tmp_path / "town").read_text() == "standalone zipapp"
+
+    # Act
+    (tmp_path / "hello").unlink()
+    (tmp_path / "town").unlink()
+    links, skipped = link_fleet_clis(str(fleet_path), ["hello", "town"])
+    relinked, _ = link_fleet_clis(str(fleet_path), ["hello", "town"])
+
+    # Assert
+    assert links == relinked == [str(tmp_path / "hello"), str(tmp_path / "town")]
+    assert skipped == []
+    for link in links:
+        assert os.path.realpath(link) == str(fleet_path.resolve())
+
+
+def test_strip_site_packages(tmp_path: Path):
+    # Arrange
+    for path in ["pkg/__init__.py", "pkg/tests/test_pkg.py", "pkg/docs/index.md", "pkg/__pycache__/x.pyc", "bin/pkg"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+
+    # Act
+    strip_site_packages(str(tmp_path))
+
+    # Assert
+    assert sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*")) == [
+        "pkg",
+        os.path.join("pkg", "__init__.py"),
+    ]
+
+
+def test_package_zipapp_fast_start_runs_without_extraction(tmp_path: Path):
+    # Arrange
+    site_packages = tmp_path / "site-packages"
+    (site_packages / "hello" / "tests").mkdir(parents=True)
+    (site_packages / "hello" / "__init__.py").write_text("def cli():\n    print('hello from ' + __file__)\n")
+    (site_packages / "hello" / "tests" / "test_hello.py").write_text("")
+    output_file = tmp_path / "hello"
+
+    # Act
+    result = package_zipapp(str(site_packages), "hello.cli", str(output_file), sys.executable, "fast-start")
+
+    # Assert
+    assert result.exit_code == 0
+    names = zipfile.ZipFile(output_file).namelist()
+    assert "hello/__init__.pyc" in names
+    assert not any("tests" in name for name in names)
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in zipfile.ZipFile(output_file).infolist())
+    run = subprocess.run([sys.executable, str(output_file)], capture_output=True, text=True)
+    assert f"hello from {output_file}" in run.stdout
+
+
+def test_get_imported_modules():
+    source = """
+import os.path, typer
+from rich.console import Console
+from . import sibling
+
+def lazy():
+    try:
+        import tabulate
+    except ImportError:
+        pass
+    return importlib.import_module("yaml.loader")
+"""
+    assert get_imported_modules(source) == {"os", "typer", "rich", "tabulate", "yaml"}
+    assert get_imported_modules("def broken(:") == set()
+
+
+@pytest.mark.parametrize(
+    "code, deps, expected",
+    [
+        ("import typer\n", ["tabulate"], ["typer", "tabulate"]),
+        ("import rich_click as click\n", ["tabulate"], ["rich-click", "tabulate"]),
+        ("print('no framework')\n", [], ["typer"]),
+    ],
+)
+def test_get_build_requirements(tmp_path: Path, code, deps, expected):
+    script_path = tmp_path / "cli.py"
+    script_path.write_text(code)
+    assert get_build_requirements(str(script_path), deps) == expected
+
+
+def write_distribution(site: Path, name: str, files: dict[str, str]) -> None:
+    for path, code in files.items():
+        (site / path).parent.mkdir(parents=True, exist_ok=True)
+        (site / path).write_text(code)
+    dist_info = site / f"{name}-1.0.dist-info"
+    dist_info.mkdir()
+    records = [*files, f"{dist_info.name}/RECORD"]
+    (dist_info / "RECORD").write_text("".join(f"{record},,\n" for record in records))
+
+
+def test_prune_site_packages(tmp_path: Path):
+    # Arrange
+    (tmp_path / "hello.py").write_text("import typer\n")
+    write_distribution(tmp_path, "typer", {"typer/__init__.py": "from ._util import x\nimport shellingham\n"})
+    write_distribution(tmp_path, "shellingham", {"shellingham/__init__.py": ""})
+    write_distribution(tmp_path, "tabulate", {"tabulate/__init__.py": "", "tabulate/version.py": ""})
+    write_distribution(tmp_path, "six", {"six.py": ""})
+
+    # Act
+    pruned = prune_site_packages(str(tmp_path), ["hello"])
+
+    # Assert
+    assert pruned == ["six", "tabulate"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "hello.py",
+        "shellingham",
+        "shellingham-1.0.dist-info",
+        "typer",
+        "typer-1.0.dist-info",
+    ]
+
+
+def test_get_size_report(tmp_path: Path):
+    # Arrange
+    zipapp_path = tmp_path / "hello"
+    with zipfile.ZipFile(zipapp_path, "w") as archive:
+        archive.writestr("__main__.py", "x" * 10)
+        archive.writestr("site-packages/hello.py", "x" * 20)
+        archive.writestr("site-packages/markdown_it/main.py", "x" * 100)
+        archive.writestr("site-packages/markdown_it/main.pyc", "x" * 50)
+        archive.writestr("site-packages/markdown_it_py-1.0.dist-info/RECORD", "markdown_it/main.py,,\n")
+
+    # Act
+    report = dict(get_size_report(str(zipapp_path)))
+
+    # Assert
+    assert report["hello"] == 20
+    assert report["__main__"] == 10
+    assert report["markdown_it_py"] == 150 + len("markdown_it/main.py,,\n")
@@ -4,6 +4,7 @@ import re
 from click.testing import CliRunner
 
 from cliffy.cli import (
+    LazyGroup,
     cli,
     init_command,
     run_command,
@@ -15,8 +16,11 @@ from cliffy.cli import (
     update_command,
 )
 import os
+import subprocess
+import sys
 from unittest.mock import patch
 
+from cliffy.builder import BuildOutcome
 from cliffy.homer import get_metadata
 from cliffy.manifest import CLIMetadata
 
@@ -130,6 +134,38 @@ def test_build_command():
         assert "not loaded" in result.output
 
 
+@patch("cliffy.builder.build_targets")
+def test_build_command_reports_failures(mock_build_targets):
+    mock_build_targets.return_value = [
+        BuildOutcome(cli_name="hello", exit_code=0),
+        BuildOutcome(cli_name="town", exit_code=1, output="pip failed"),
+    ]
+    runner = CliRunner()
+    result = runner.invoke(build_command, ["examples/hello.yaml", "examples/town.yaml", "-j", "2"])
+    assert result.exit_code == 1
+    assert "hello built" in result.output
+    assert "pip failed" in result.output
+    assert "1 of 2 builds failed: town" in result.output
+    assert mock_build_targets.call_args.kwargs["jobs"] == 2
+
+
+@patch("cliffy.builder.build_fleet")
+def test_build_fleet_rejects_member_name(mock_build_fleet):
+    runner = CliRunner()
+    result = runner.invoke(build_command, ["examples/hello.yaml", "examples/town.yaml", "--fleet", "hello"])
+    assert result.exit_code == 1
+    assert "fleet name hello is also a CLI name" in result.output
+    mock_build_fleet.assert_not_called()
+
+
+@patch("cliffy.cli.build_fleet_zipapp")
+def test_build_fleet_passes_force(mock_build_fleet_zipapp):
+    runner = CliRunner()
+    result = runner.invoke(build_command, ["examples/hello.yaml", "--fleet", "examples-fleet", "--force"])
+    assert result.exit_code == 0
+    assert mock_build_fleet_zipapp.call_args.kwargs["force"] is True
+
+
 def test_manifest_or_cli_converter():
     runner = CliRunner()
     with runner.isolated_filesystem():
@@ -247,31 +283,104 @@ commands:
     assert "Test command" in result.output
 
 
-@patch("cliffy.cli.Reloader")
+@patch("cliffy.reloader.Reloader")
 def test_dev_command_basic(mock_reloader):
     runner = CliRunner()
     result = runner.invoke(cli, ["dev", "examples/hello.yaml"])
     assert result.exit_code == 0
     assert "Watching examples/hello.yaml for changes" in result.output
-    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", None, ())
+    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", None, (), delay=0.25)
 
 
-@patch("cliffy.cli.Reloader")
+@patch("cliffy.reloader.Reloader")
 def test_dev_command_with_run_cli(mock_reloader):
     runner = CliRunner()
     result = runner.invoke(cli, ["dev", "examples/hello.yaml", "--run-cli"])
     assert result.exit_code == 0
     assert "Watching examples/hello.yaml for changes" in result.output
-    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", ())
+    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", (), delay=0.25)
 
 
-@patch("cliffy.cli.Reloader")
+@patch("cliffy.reloader.Reloader")
 def test_dev_command_with_run_cli_and_args(mock_reloader):
     runner = CliRunner()
     result = runner.invoke(cli, ["dev", "examples/hello.yaml", "--run-cli", "--", "-h", "test"])
     assert result.exit_code == 0
     assert "Watching examples/hello.yaml for changes" in result.output
-    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", ("-h", "test"))
+    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", ("-h", "test"), delay=0.25)
+
+
+@patch("cliffy.reloader.Reloader")
+def test_dev_command_with_delay(mock_reloader):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dev", "examples/hello.yaml", "--delay", "1.5"])
+    assert result.exit_code == 0
+    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", None, (), delay=1.5)
+
+
+@patch("cliffy.reloader.MultiReloader")
+def test_dev_command_with_directory(mock_multi_reloader):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dev", "examples/"])
+    assert result.exit_code == 0
+    assert "Watching examples/ for changes" in result.output
+    mock_multi_reloader.watch.assert_called_once_with("examples/", delay=0.25)
+
+
+@patch("cliffy.reloader.MultiReloader")
+def test_dev_command_with_glob(mock_multi_reloader):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dev", "examples/*.yaml", "--delay", "1"])
+    assert result.exit_code == 0
+    mock_multi_reloader.watch.assert_called_once_with("examples/*.yaml", delay=1.0)
+
+
+@patch("cliffy.reloader.MultiReloader")
+def test_dev_command_with_glob_matching_nothing(mock_multi_reloader):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dev", "examples/*.missing"])
+    assert result.exit_code == 1
+    assert "no manifests found" in result.output
+    mock_multi_reloader.watch.assert_not_called()
+
+
+def test_dev_command_run_cli_needs_single_manifest():
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dev", "examples/", "--run-cli"])
+    assert result.exit_code == 1
+    assert "--run-cli needs a single manifest" in result.output
+
+
+@patch("cliffy.reloader.TestWatcher")
+@patch("cliffy.cli.run_manifest_tests")
+def test_test_command_with_watch(mock_run_manifest_tests, mock_test_watcher):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["test", "examples/hello.yaml", "--watch", "-n", "2"])
+    assert result.exit_code == 0
+    assert "Watching examples/hello.yaml for changes" in result.output
+    mock_run_manifest_tests.assert_called_once_with(
+        ("examples/hello.yaml",),
+        exitfirst=False,
+        jobs=2,
+        changed=False,
+        timeout=None,
+        durations=None,
+        junit_xml=None,
+        json_report=None,
+    )
+    manifests, run_tests = mock_test_watcher.watch_tests.call_args.args
+    assert manifests == ["examples/hello.yaml"]
+    run_tests()
+    mock_run_manifest_tests.assert_called_with(
+        ("examples/hello.yaml",),
+        exitfirst=False,
+        jobs=2,
+        changed=True,
+        timeout=None,
+        durations=None,
+        junit_xml=None,
+        json_report=None,
+    )
 
 
 def test_dev_command_nonexistent_file():
@@ -281,13 +390,13 @@ def test_dev_command_nonexistent_file():
     assert "does not exist" in result.output.lower()
 
 
-@patch("cliffy.cli.Reloader")
+@patch("cliffy.reloader.Reloader")
 def test_dev_command_with_empty_args(mock_reloader):
     runner = CliRunner()
     result = runner.invoke(cli, ["dev", "examples/hello.yaml", "--run-cli", "--"])
     assert result.exit_code == 0
     assert "Watching examples/hello.yaml for changes" in result.output
-    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", ())
+    mock_reloader.watch.assert_called_once_with("examples/hello.yaml", "True", (), delay=0.25)
 
 
 def test_dev_command_invalid_file_permissions():
@@ -338,3 +447,29 @@ def test_update_command():
 
         cli_metadata = get_metadata("test-cli-update")
         assert cli_metadata and cli_metadata.version == "5.0.2"
+
+
+def test_cli_imports_heavy_modules_lazily():
+    code = """
+import sys
+from click.testing import CliRunner
+from cliffy.cli import cli
+
+assert CliRunner().invoke(cli, ["list"]).exit_code == 0
+print(sorted(m for m in ("cliffy.ai", "cliffy.builder", "cliffy.reloader", "cliffy.tester") if m in sys.modules))
+"""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_lazy_group_skips_commands_failing_to_import():
+    # Arrange
+    group = LazyGroup(lazy_commands={"missing": "cliffy.not_a_module:cli"})
+
+    # Act
+    result = CliRunner().invoke(group, ["missing"])
+
+    # Assert
+    assert result.exit_code == 2
+    assert "No such command" in result.output
+    assert group.list_commands(None) == ["missing"]
@@ -0,0 +1,171 @@
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import pytest
+
+from click.testing import CliRunner
+
+from cliffy import daemon
+from cliffy.cli import load_command, remove_command
+from cliffy.loader import Loader
+from cliffy.run import forward_if_served
+
+pytestmark = pytest.mark.skipif(not daemon.is_supported(), reason="daemon needs Unix sockets and fork")
+
+
+@pytest.fixture(scope="module")
+def daemon_socket(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("CLIFFY_DAEMON_DIR", str(tmp_path_factory.mktemp("daemon")))
+        monkeypatch.delenv("CLIFFY_NO_DAEMON", raising=False)
+        yield daemon.get_socket_path()
+
+
+def start_daemon(idle_timeout: str = "60", cli_name: Optional[str] = None) -> subprocess.Popen:
+    server_args = ["zygote", "start", cli_name] if cli_name else ["daemon", "start"]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "cliffy", *server_args, "--foreground", "--idle-timeout", idle_timeout],
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(600):
+        if daemon.request_control("ping", cli_name):
+            break
+        time.sleep(0.1)
+    return process
+
+
+@pytest.fixture(scope="module")
+def running_daemon(daemon_socket):
+    process = start_daemon()
+    yield process
+    daemon.request_control("stop")
+    process.wait(timeout=60)
+
+
+def test_forward_without_daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLIFFY_DAEMON_DIR", str(tmp_path))
+    assert daemon.forward("cli", ["--version"]) is None
+
+
+def test_entry_point_skips_daemon_client_without_socket(tmp_path):
+    # Act
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from cliffy.run import forward_if_served; forward_if_served(['cli', '--version']); "
+            "print('cliffy.daemon' in sys.modules)",
+        ],
+        env={**os.environ, "CLIFFY_DAEMON_DIR": str(tmp_path)},
+        capture_output=True,
+        text=True,
+    )
+
+    # Assert
+    assert result.stdout.strip() == "False"
+
+
+def test_forward_if_served_exits_with_daemon_exit_code(running_daemon):
+    with pytest.raises(SystemExit) as exit_info:
+        forward_if_served(["cli", "validate", "missing.yaml"])
+    assert exit_info.value.code == 2
+
+
+def test_forward_runs_in_daemon(running_daemon, capfd, monkeypatch, tmp_path):
+    # Arrange
+    monkeypatch.setenv("CLIFFY_TEST_VAR", "from-client")
+    manifest_path = tmp_path / "hello.yaml"
+    manifest_path.write_text(
+        "name: hello\nversion: 0.1.0\ncommands:\n  env: |\n    import os\n    print(os.environ['CLIFFY_TEST_VAR'], os.getcwd())\n"
+    )
+    monkeypatch.chdir(tmp_path)
+
+    # Act
+    exit_code = daemon.forward("cli", ["run", "hello.yaml", "--", "env"])
+
+    # Assert
+    assert exit_code == 0
+    assert f"from-client {tmp_path}" in capfd.readouterr().out
+    assert daemon.forward("cli", ["validate", "missing.yaml"]) == 2
+    assert "Usage: cli validate" in capfd.readouterr().out
+
+
+def test_forward_declines_different_cache_dir(running_daemon, monkeypatch, tmp_path):
+    monkeypatch.setenv("CLIFFY_CACHE_DIR", str(tmp_path / "client-cache"))
+    assert daemon.forward("cli", ["--version"]) is None
+
+
+def test_connect_rejects_other_users(running_daemon, monkeypatch):
+    monkeypatch.setattr(daemon, "get_peer_uid", lambda conn: os.getuid() + 1)
+    assert daemon.connect() is None
+
+
+def test_socket_dir_must_be_private(tmp_path, monkeypatch):
+    # Arrange
+    socket_dir = tmp_path / "shared"
+    socket_dir.mkdir(mode=0o777)
+    socket_dir.chmod(0o777)
+    monkeypatch.setenv("CLIFFY_DAEMON_DIR", str(socket_dir))
+
+    # Act & Assert
+    with pytest.raises(PermissionError):
+        daemon.make_socket_dir()
+    assert daemon.connect() is None
+
+    # Act
+    monkeypatch.setenv("CLIFFY_DAEMON_DIR", str(tmp_path / "private"))
+
+    # Assert
+    assert daemon.make_socket_dir() == str(tmp_path / "private")
+    assert (tmp_path / "private").stat().st_mode & 0o777 == 0o700
+
+
+def test_forward_bypassed(running_daemon, monkeypatch):
+    monkeypatch.setenv("CLIFFY_NO_DAEMON", "1")
+    assert daemon.forward("cli", ["--version"]) is None
+
+
+def test_daemon_stop_and_idle_timeout(running_daemon, daemon_socket):
+    # Act
+    pid = daemon.request_control("stop")
+
+    # Assert
+    assert pid == running_daemon.pid
+    assert running_daemon.wait(timeout=60) == 0
+    assert not os.path.exists(daemon_socket)
+    assert daemon.request_control("ping") is None
+
+    # Act
+    idle_daemon = start_daemon(idle_timeout="0.5")
+
+    # Assert
+    assert idle_daemon.wait(timeout=60) == 0
+    assert not os.path.exists(daemon_socket)
+
+
+def test_zygote_serves_loaded_cli(daemon_socket, tmp_path, monkeypatch):
+    # Arrange
+    manifest_path = tmp_path / "zygotehello.yaml"
+    manifest_path.write_text(
+        "name: zygotehello\nversion: 0.1.0\ncommands:\n  pids: |\n    import os\n    print(os.getppid(), os.getcwd())\n"
+    )
+    assert CliRunner().invoke(load_command, [str(manifest_path)]).exit_code == 0
+    zygote = start_daemon(cli_name="zygotehello")
+    monkeypatch.chdir(tmp_path)
+
+    # Act
+    result = subprocess.run([Loader.get_cli_script_path("zygotehello"), "pids"], capture_output=True, text=True)
+
+    # Assert
+    assert result.stdout.strip() == f"{zygote.pid} {tmp_path}"
+
+    # Act
+    CliRunner().invoke(remove_command, ["zygotehello"])
+
+    # Assert
+    # a zygote stops once its CLI is removed
+    assert zygote.wait(timeout=60) == 0
+    assert daemon.request_control("ping", "zygotehello") is None
@@ -1,6 +1,12 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+
 import pytest
-from cliffy.doc import DocGenerator
-from cliffy.manifest import CLIManifest, Command, Example, RunBlock, SimpleCommandParam, CommandParam
+from click.testing import CliRunner
+from cliffy.cli import cli
+from cliffy.doc import DocGenerator, SEARCH_INDEX_FILE, generate_site
+from cliffy.manifest import CLIManifest, CLIMetadata, Command, Example, RunBlock, SimpleCommandParam, CommandParam
 
 
 @pytest.fixture
@@ -101,3 +107,133 @@ def test_generate_html(sample_manifest, tmp_path):
     assert "<em>Aliases: sc</em>" in content
     assert "<pre><code>sample_command --param1 value</code></pre>" in content
     assert "<p>Sample example</p>" in content
+
+
+SITE_MANIFEST = """
+manifestVersion: v3
+name: {name}
+version: 0.1.0
+help: {name} CLI
+commands:
+  greet:
+    help: Greets someone
+    params:
+      - name: str
+    run: print(name)
+"""
+
+
+def write_site_cli(tmp_path, name, manifest=SITE_MANIFEST):
+    manifest_path = tmp_path / f"{name}.yaml"
+    manifest_path.write_text(manifest.format(name=name))
+    return CLIMetadata(
+        cli_name=name,
+        runner_path=str(manifest_path),
+        version="0.1.0",
+        loaded=datetime.now(),
+        requires=[],
+        manifest_hash=str(hash(manifest_path.read_text())),
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_generate_site(tmp_path, jobs):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+    clis = [write_site_cli(tmp_path, "alpha"), write_site_cli(tmp_path, "beta")]
+
+    outcomes = list(generate_site(clis, ["md", "html"], str(output_dir), jobs=jobs))
+
+    assert sorted(outcome.cli_name for outcome in outcomes) == ["alpha", "beta"]
+    assert not any(outcome.skipped or outcome.error for outcome in outcomes)
+    assert (output_dir / "alpha.md").read_text().startswith("# alpha v0.1.0")
+    assert (output_dir / "beta.html").exists()
+    assert not (output_dir / "beta.rst").exists()
+    assert "- [alpha](alpha.md) v0.1.0: alpha CLI" in (output_dir / "index.md").read_text()
+    assert '<a href="beta.html">beta</a>' in (output_dir / "index.html").read_text()
+    entries = json.loads((output_dir / SEARCH_INDEX_FILE).read_text())["entries"]
+    assert [(entry["cli"], entry["command"]) for entry in entries] == [
+        ("alpha", ""),
+        ("alpha", "greet"),
+        ("beta", ""),
+        ("beta", "greet"),
+    ]
+    assert entries[1]["help"] == "Greets someone"
+    assert entries[1]["pages"] == {"md": "alpha.md", "html": "alpha.html"}
+
+
+def test_generate_site_skips_unchanged_clis(tmp_path):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+    alpha, beta = write_site_cli(tmp_path, "alpha"), write_site_cli(tmp_path, "beta")
+    list(generate_site([alpha, beta], ["md"], str(output_dir)))
+
+    changed_alpha = write_site_cli(tmp_path, "alpha", SITE_MANIFEST.replace("Greets someone", "Says hi"))
+    outcomes = {outcome.cli_name: outcome for outcome in generate_site([changed_alpha], ["md"], str(output_dir))}
+    unchanged = list(generate_site([changed_alpha], ["md"], str(output_dir)))
+    forced = list(generate_site([changed_alpha], ["md"], str(output_dir), force=True))
+
+    assert not outcomes["alpha"].skipped
+    assert "Says hi" in (output_dir / "alpha.md").read_text()
+    # pages of CLIs no longer documented are removed
+    assert not (output_dir / "beta.md").exists()
+    assert "beta" not in (output_dir / "index.md").read_text()
+    assert unchanged[0].skipped
+    assert unchanged[0].docs.commands["greet"].help == "Says hi"
+    assert not forced[0].skipped
+
+
+def test_generate_site_reports_failed_clis(tmp_path):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+    broken = write_site_cli(tmp_path, "broken", "name: {name}\ncommands: [")
+
+    outcomes = list(generate_site([broken, write_site_cli(tmp_path, "alpha")], ["md"], str(output_dir)))
+
+    assert outcomes[0].error
+    assert not outcomes[1].error
+    assert "broken" not in (output_dir / "index.md").read_text()
+
+
+def test_generate_site_keeps_pages_of_failed_clis(tmp_path):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+    list(generate_site([write_site_cli(tmp_path, "alpha")], ["md"], str(output_dir)))
+    broken_alpha = write_site_cli(tmp_path, "alpha", "name: {name}\ncommands: [")
+
+    failed = list(generate_site([broken_alpha], ["md"], str(output_dir)))
+    retried = list(generate_site([broken_alpha], ["md"], str(output_dir)))
+
+    assert failed[0].error
+    assert (output_dir / "alpha.md").read_text().startswith("# alpha v0.1.0")
+    assert "- [alpha](alpha.md)" in (output_dir / "index.md").read_text()
+    assert "alpha" in {entry["cli"] for entry in json.loads((output_dir / SEARCH_INDEX_FILE).read_text())["entries"]}
+    # kept pages aren't taken for pages of the failed manifest
+    assert retried[0].error
+    assert (output_dir / "alpha.md").exists()
+
+
+def test_generate_site_reserves_index_name(tmp_path):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+
+    outcomes = list(generate_site([write_site_cli(tmp_path, "index")], ["md"], str(output_dir)))
+
+    assert "reserved for the site index" in outcomes[0].error
+    assert (output_dir / "index.md").read_text() == "# CLIs\n\n"
+
+
+def test_docs_command_all(tmp_path):
+    output_dir = tmp_path / "site"
+    output_dir.mkdir()
+    clis = [write_site_cli(tmp_path, "alpha")]
+
+    with patch("cliffy.cli.get_clis", return_value=iter(clis)):
+        result = CliRunner().invoke(cli, ["docs", "--all", "-o", str(output_dir)])
+    with patch("cliffy.cli.get_clis", return_value=iter(clis)):
+        rerun = CliRunner().invoke(cli, ["docs", "--all", "-o", str(output_dir)])
+
+    assert result.exit_code == 0
+    assert "+ alpha documented" in result.output
+    assert sorted(path.name for path in output_dir.glob("alpha.*")) == ["alpha.html", "alpha.md", "alpha.rst"]
+    assert "0 documented, 1 unchanged" in rerun.output
@@ -152,3 +152,79 @@ def test_cli_tests_pass(cli_name):
     result = runner.invoke(test_command, [f"examples/{cli_name}.yaml"])
     assert "All tests passed" in result.output
     assert result.exit_code == 0
+
+
+def test_cli_fleet_build():
+    BUILD_DIR_PATH = "test-builds/fleet"
+    fleet_clis = ["hello", "town", "environ"]
+    runner = CliRunner()
+    result = runner.invoke(
+        build_command,
+        [f"examples/{cli_name}.yaml" for cli_name in fleet_clis] + ["--fleet", "examples-fleet", "-o", BUILD_DIR_PATH],
+    )
+    assert result.exit_code == 0
+
+    fleet_path = os.path.join(os.getcwd(), BUILD_DIR_PATH, "examples-fleet")
+    for cli_name in fleet_clis:
+        for command in CLI_TESTS[cli_name]:
+            environment = None
+            if cli_env_vars := command.get("env"):
+                environment = {**os.environ, **cli_env_vars}
+
+            # dispatch by first argument
+            fleet_result = subprocess.run(
+                [sys.executable, fleet_path, cli_name] + shlex.split(command["args"]),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                encoding="utf-8",
+                env=environment,
+            )
+            assert command["resp"] in fleet_result.stdout
+
+            # dispatch by invoked name
+            if platform.system() != "Windows":
+                linked_result = subprocess.run(
+                    [os.path.join(os.getcwd(), BUILD_DIR_PATH, cli_name)] + shlex.split(command["args"]),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    encoding="utf-8",
+                    env=environment,
+                )
+                assert command["resp"] in linked_result.stdout
+
+
+def test_cli_fast_start_build():
+    BUILD_DIR_PATH = "test-builds/fast-start"
+    runner = CliRunner()
+    result = runner.invoke(build_command, ["examples/hello.yaml", "-o", BUILD_DIR_PATH, "--profile", "fast-start"])
+    assert result.exit_code == 0
+    assert "cold start" in result.output
+
+    executable_path = os.path.join(os.getcwd(), BUILD_DIR_PATH, "hello")
+    for command in CLI_TESTS["hello"]:
+        built_result = subprocess.run(
+            [sys.executable, executable_path] + shlex.split(command["args"]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        assert command["resp"] in built_result.stdout
+
+
+def test_cli_click_build_pruned():
+    BUILD_DIR_PATH = "test-builds"
+    runner = CliRunner()
+    result = runner.invoke(
+        build_command, ["examples/click_hello.yaml", "-o", BUILD_DIR_PATH, "--prune", "--size-report"]
+    )
+    assert result.exit_code == 0
+    assert "rich_click" in result.output
+    assert "typer" not in result.output
+
+    built_result = subprocess.run(
+        [sys.executable, os.path.join(os.getcwd(), BUILD_DIR_PATH, "clickhello"), "hello"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    assert "world" in built_result.stdout
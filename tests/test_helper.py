@@ -1,6 +1,9 @@
 import pytest
 import os
 import platform
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from tempfile import NamedTemporaryFile
@@ -9,7 +12,10 @@ from unittest.mock import patch
 from cliffy.helper import (
     RequirementSpec,
     write_to_file,
+    file_lock,
     import_module_from_path,
+    import_module_from_code,
+    compile_code,
     make_executable,
     delete_temp_files,
     indent_block,
@@ -28,6 +34,8 @@ from cliffy.helper import (
     PYTHON_EXECUTABLE,
     OPERATOR_MAP,
     TEMP_FILES,
+    CODE_CACHE,
+    INSTALLED_PACKAGES_CACHE,
 )
 
 
@@ -61,6 +69,44 @@ def test_write_to_file(path, text, executable):
             pass  # Directory not empty
 
 
+def test_write_to_file_skips_unchanged(tmp_path):
+    # Arrange
+    path = tmp_path / "unchanged.py"
+
+    # Act & Assert
+    assert write_to_file(str(path), "print('hi')")
+    mtime = path.stat().st_mtime_ns
+    assert not write_to_file(str(path), "print('hi')")
+    assert path.stat().st_mtime_ns == mtime
+    assert write_to_file(str(path), "print('bye')")
+    assert path.read_text() == "print('bye')"
+    # temp files are renamed into place
+    assert os.listdir(tmp_path) == ["unchanged.py"]
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    # Arrange
+    lock_path = str(tmp_path / "locks" / "test.lock")
+    events = []
+
+    def hold_lock(name):
+        with file_lock(lock_path):
+            events.append(f"{name} start")
+            time.sleep(0.05)
+            events.append(f"{name} end")
+
+    # Act
+    threads = [threading.Thread(target=hold_lock, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Assert
+    assert events[0].split()[0] == events[1].split()[0]
+    assert events[2].split()[0] == events[3].split()[0]
+
+
 # Parametrized tests for import_module_from_path
 @pytest.mark.parametrize(
     "filepath, expected_module_name",
@@ -94,6 +140,61 @@ def test_import_module_from_path_error(tmpdir):
         import_module_from_path(str(nonexistent_file))
 
 
+def test_compile_code_cached(tmp_path):
+    # Arrange
+    code = "## Generated hello on 2024-01-01 00:00:00\nanswer = 42\n"
+    regenerated_code = code.replace("2024", "2025")
+
+    with patch("cliffy.helper.CLIFFY_CACHE_DIR", str(tmp_path)):
+        # Act
+        code_object = compile_code(code, "<test>")
+        CODE_CACHE.clear()
+        with patch("cliffy.helper.compile") as mock_compile:
+            cached_code_object = compile_code(regenerated_code, "<test>")
+
+    # Assert
+    mock_compile.assert_not_called()
+    assert cached_code_object == code_object
+    assert len(list((tmp_path / "code").iterdir())) == 1
+
+
+def test_compile_code_cache_keeps_latest_source(tmp_path):
+    with patch("cliffy.helper.CLIFFY_CACHE_DIR", str(tmp_path)):
+        # Act
+        for answer in range(3):
+            compile_code(f"answer = {answer}\n", "<hello>")
+        compile_code("answer = 42\n", "<other>")
+        latest_code_object = compile_code("answer = 2\n", "<hello>")
+
+    # Assert
+    # one entry per filename, on disk and in memory
+    assert len(list((tmp_path / "code").iterdir())) == 2
+    namespace: dict = {}
+    exec(latest_code_object, namespace)
+    assert namespace["answer"] == 2
+    assert CODE_CACHE["<hello>"][1] is latest_code_object
+
+
+def test_import_module_from_code():
+    # Act
+    module = import_module_from_code("hello-cli", "def cli():\n    return __name__\n")
+    other_module = import_module_from_code("hello-cli", "def cli():\n    return __name__\n")
+
+    # Assert
+    assert module.__name__.startswith("hello_cli_")
+    assert module.cli() == module.__name__
+    assert module.__name__ != other_module.__name__
+    assert sys.modules[module.__name__] is module
+
+
+def test_import_module_from_code_error():
+    # Act & Assert
+    modules = set(sys.modules)
+    with pytest.raises(ZeroDivisionError):
+        import_module_from_code("broken", "1 / 0\n")
+    assert set(sys.modules) == modules
+
+
 # Test for make_executable
 def test_make_executable(tmpdir):
     # Arrange
@@ -175,13 +276,17 @@ def test_wrap_as_var(text, expected_output):
 @patch("subprocess.check_output")
 def test_get_installed_package_versions(mock_check_output):
     # Arrange
+    INSTALLED_PACKAGES_CACHE.clear()
     mock_check_output.return_value = b"package1==1.0.0\npackage2==2.0.0"
 
     # Act
     installed_packages = get_installed_package_versions()
+    cached_installed_packages = get_installed_package_versions()
 
     # Assert
     assert installed_packages == {"package1": "1.0.0", "package2": "2.0.0"}
+    assert cached_installed_packages == installed_packages
+    mock_check_output.assert_called_once()
 
 
 # Parametrized tests for parse_requirement
@@ -1,25 +1,36 @@
-import json
 import os
-from base64 import b32encode
+import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from pytest_mock import MockerFixture
 
 from cliffy.commander import CLI
-from cliffy.helper import CLIFFY_METADATA_DIR
 from cliffy.homer import (
+    METADATA_DB_NAME,
     get_clis,
     get_metadata,
     get_metadata_bypath,
-    get_metadata_path,
+    get_blob_path,
+    has_metadata,
+    read_blob,
     remove_metadata,
     save_metadata,
+    write_blob,
 )
 from cliffy.manifest import CLIMetadata
 
 
+@pytest.fixture(autouse=True)
+def metadata_dir(mocker: MockerFixture, tmp_path: Path) -> Path:
+    """Isolates each test's metadata store so parallel workers don't see each other's CLIs"""
+    metadata_dir = tmp_path / "metadata"
+    mocker.patch("cliffy.homer.CLIFFY_METADATA_DIR", metadata_dir)
+    return metadata_dir
+
+
 @pytest.mark.parametrize(
     "manifest_path, cli_name, cli_version, requires",
     [
@@ -56,26 +67,22 @@ def test_save_metadata_happy_path(
     # Act
     save_metadata(str(manifest_file), cli)
 
-    encoded_runnerpath = b32encode(cli.name.encode("ascii")).decode("utf-8")
-    expected_metadata_path = f"{CLIFFY_METADATA_DIR}/{encoded_runnerpath}/{cli.name}.json"
-
     # Assert
-    assert get_metadata_path(cli_name) == expected_metadata_path
-    assert os.path.exists(expected_metadata_path)
-    with open(expected_metadata_path, "r") as f:
-        metadata = json.load(f)
-        assert metadata["cli_name"] == cli_name
-        assert metadata["runner_path"] == str(manifest_file.resolve())
-        assert metadata["version"] == cli_version
-        assert metadata["manifest"] == manifest_content
-        assert metadata["requires"] == requires
-        loaded_datetime = datetime.fromisoformat(metadata["loaded"].replace("Z", "+00:00"))
-        assert loaded_datetime > datetime.now() - timedelta(seconds=1)
+    assert has_metadata(cli_name)
+    metadata = get_metadata(cli_name, load_manifest=True)
+    assert metadata
+    assert metadata.cli_name == cli_name
+    assert metadata.runner_path == str(manifest_file.resolve())
+    assert metadata.version == cli_version
+    assert metadata.manifest == manifest_content
+    assert metadata.requires == requires
+    assert metadata.loaded > datetime.now() - timedelta(seconds=1)
 
     remove_metadata(cli_name)
 
-    # metadata file removed
-    assert not os.path.exists(expected_metadata_path)
+    # metadata removed
+    assert not has_metadata(cli_name)
+    assert get_metadata(cli_name) is None
 
     # manifest file not removed
     assert os.path.exists(manifest_file)
@@ -164,11 +171,30 @@ def test_get_metadata_non_existent(mocker: MockerFixture, tmp_path: Path, cli_na
     assert metadata == expected_metadata
 
 
-def test_get_clis(mocker: MockerFixture, tmp_path: Path):
+def test_get_clis(tmp_path: Path):
+    # Arrange
+    manifest_file = tmp_path / "test_manifest.yaml"
+    manifest_file.write_text("name: test")
+    for cli_name in ["test_cli_2", "test_cli_1"]:
+        save_metadata(str(manifest_file), CLI(name=cli_name, version="0.1.0", requires=["test"], code=""))
+
+    # Act
+    clis = {cli.cli_name: cli for cli in get_clis()}
+
+    # Assert
+    for cli_name in ["test_cli_1", "test_cli_2"]:
+        assert clis[cli_name].version == "0.1.0"
+        assert clis[cli_name].requires == ["test"]
+        # listing only reads the summary columns
+        assert clis[cli_name].manifest == ""
+        remove_metadata(cli_name)
+
+
+def test_legacy_metadata_migration(metadata_dir: Path):
     # Arrange
     metadata_files = [
-        f"{CLIFFY_METADATA_DIR}/M53====/test_cli_1.json",
-        f"{CLIFFY_METADATA_DIR}/ONXW2ZJAMNXIW===/test_cli_2.json",
+        metadata_dir / "ORSXG5C7MNWGSXZR" / "test_cli_1.json",
+        metadata_dir / "ORSXG5C7MNWGSXZS" / "test_cli_2.json",
     ]
     metadata = [
         '{"cli_name": "test_cli_1", "runner_path": "/path/to/manifest.json", "version": "0.1.0", "loaded": "2024-07-24T12:00:00Z", "manifest": "{}", "requires": []}',  # noqa: E501
@@ -176,8 +202,8 @@ def test_get_clis(mocker: MockerFixture, tmp_path: Path):
     ]
 
     for i, file_path in enumerate(metadata_files):
-        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
-        Path(file_path).write_text(metadata[i])
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(metadata[i])
 
     # Act
     clis = list(get_clis())
@@ -185,4 +211,95 @@ def test_get_clis(mocker: MockerFixture, tmp_path: Path):
     # Assert
     for cli in metadata:
         expected_metadata = CLIMetadata.model_validate_json(cli)
-        assert expected_metadata in clis
+        migrated_metadata = get_metadata(expected_metadata.cli_name, load_manifest=True)
+        assert migrated_metadata
+        assert migrated_metadata.model_copy(update={"manifest": ""}) in clis
+        assert migrated_metadata.model_dump(exclude={"manifest_hash", "resolved_hash"}) == expected_metadata.model_dump(
+            exclude={"manifest_hash", "resolved_hash"}
+        )
+        assert read_blob(migrated_metadata.manifest_hash) == expected_metadata.manifest
+
+    # legacy layout is cleaned up once migrated
+    for file_path in metadata_files:
+        assert not file_path.exists()
+        assert not file_path.parent.exists()
+    assert (metadata_dir / METADATA_DB_NAME).exists()
+
+
+def test_manifest_blobs_deduplicated(metadata_dir: Path, tmp_path: Path):
+    # Arrange
+    manifest_file = tmp_path / "shared.yaml"
+    manifest_file.write_text("name: shared")
+
+    # Act
+    for cli_name in ["shared_1", "shared_2"]:
+        save_metadata(str(manifest_file), CLI(name=cli_name, version="0.1.0", code=""), resolved_manifest="{}")
+
+    # Assert
+    first, second = get_metadata("shared_1"), get_metadata("shared_2")
+    assert first and second
+    assert first.manifest == ""
+    assert first.manifest_hash == second.manifest_hash
+    assert first.resolved_hash == second.resolved_hash
+    assert read_blob(first.manifest_hash) == "name: shared"
+    assert read_blob(first.resolved_hash) == "{}"
+    assert len(list(metadata_dir.glob("blobs/*/*"))) == 2
+
+    # blobs are kept while referenced and removed with the last reference
+    remove_metadata("shared_1")
+    assert get_blob_path(second.manifest_hash).exists()
+    remove_metadata("shared_2")
+    assert not get_blob_path(second.manifest_hash).exists()
+    assert not get_blob_path(second.resolved_hash).exists()
+
+
+def test_interrupted_blob_write_leaves_no_blob(metadata_dir: Path):
+    # Act
+    with patch("cliffy.homer.os.replace", side_effect=KeyboardInterrupt), pytest.raises(KeyboardInterrupt):
+        write_blob("name: interrupted")
+    digest = write_blob("name: interrupted")
+
+    # Assert
+    assert read_blob(digest) == "name: interrupted"
+    assert [path.name for path in metadata_dir.glob("blobs/*/*")] == [digest]
+
+
+def test_wal_mode_set_once(metadata_dir: Path):
+    # Arrange
+    statements = []
+    sqlite_connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = sqlite_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    # Act
+    with patch("cliffy.homer.sqlite3.connect", side_effect=traced_connect):
+        list(get_clis())
+        store_statements = len(statements)
+        get_metadata("missing")
+
+    # Assert
+    assert any("journal_mode=WAL" in statement for statement in statements[:store_statements])
+    assert not any("journal_mode" in statement for statement in statements[store_statements:])
+    with sqlite3.connect(metadata_dir / METADATA_DB_NAME) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_get_metadata_with_missing_blob(tmp_path: Path, capsys):
+    # Arrange
+    manifest_file = tmp_path / "orphaned.yaml"
+    manifest_file.write_text("name: orphaned")
+    save_metadata(str(manifest_file), CLI(name="orphaned", version="0.1.0", code=""))
+    metadata = get_metadata("orphaned")
+    assert metadata
+    get_blob_path(metadata.manifest_hash).unlink()
+
+    # Act
+    loaded_metadata = get_metadata("orphaned", load_manifest=True)
+
+    # Assert
+    assert loaded_metadata
+    assert loaded_metadata.manifest == ""
+    assert "orphaned metadata is corrupted" in capsys.readouterr().err
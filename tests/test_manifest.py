@@ -1,6 +1,7 @@
 from pydantic import ValidationError
 from cliffy.commanders.typer import TyperCommander
 from cliffy.manifest import (
+    Benchmark,
     CLIManifest,
     Command,
     CommandParam,
@@ -684,3 +685,20 @@ def test_get_raw_template():
 
     raw_template_with_schema = CLIManifest.get_raw_template("test", True)
     assert "# yaml-language-server:" in raw_template_with_schema
+
+
+def test_benchmarks_validation():
+    manifest = CLIManifest(
+        name="test",
+        version="1.0.0",
+        commands={},
+        benchmarks=["hello", {"command": "hello --name Alice", "mode": "both", "p95": 50}],
+    )
+    assert manifest.benchmarks[0] == "hello"
+    assert isinstance(manifest.benchmarks[1], Benchmark)
+    assert manifest.benchmarks[1].modes == ["warm", "cold"]
+    assert manifest.benchmarks[1].iterations == 20
+
+    with pytest.raises(ValidationError) as exc_info:
+        Benchmark(command="hello", mode="hot")
+    assert "Unrecognized benchmark mode hot" in str(exc_info.value)
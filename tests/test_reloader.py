@@ -1,11 +1,13 @@
 import pytest
 import io
+import os
+import threading
 import time
-from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
-from cliffy.reloader import Reloader
-from watchdog.events import FileModifiedEvent
+from cliffy.reloader import ChangeHandler, MultiReloader, ReloadScheduler, Reloader, find_manifests, get_watch_root
+from cliffy.reloader import TestWatcher as ManifestTestWatcher
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileMovedEvent
 
 
 @pytest.mark.parametrize(
@@ -54,9 +56,13 @@ def test_reload_happy_path(
     Reloader.reload(manifest_path, run_cli, run_cli_args)
 
     # Assert
-    MockTransformer.assert_called_once_with(mock_manifest_io)
+    MockTransformer.assert_called_once_with(mock_manifest_io, include_cache=None)
     mock_load_from_cli.assert_called_once_with(MockTransformer.return_value.cli)
-    mock_save_metadata.assert_called_once_with(manifest_path, MockTransformer.return_value.cli)
+    mock_save_metadata.assert_called_once_with(
+        manifest_path,
+        MockTransformer.return_value.cli,
+        resolved_manifest=MockTransformer.return_value.manifest.model_dump_json.return_value,
+    )
     mock_out.assert_called_once_with(f"✨ Reloaded {cli_name} CLI v{cli_version} ✨", fg="green")
     if run_cli:
         mock_cli_runner.assert_called_once_with(cli_name, cli_code, run_cli_args)
@@ -65,32 +71,79 @@ def test_reload_happy_path(
 
 
 @pytest.mark.parametrize(
-    "event, manifest_path",
+    "event, manifest_path, scheduled",
     [
-        (MagicMock(is_directory=True, src_path=""), "manifest.yaml"),  # id: directory_modified
-        (MagicMock(is_directory=False, src_path="other_file.txt"), "manifest.yaml"),  # id: other_file_modified
+        (MagicMock(is_directory=True, src_path=""), "manifest.yaml", False),  # id: directory_modified
+        (MagicMock(is_directory=False, src_path="other_file.txt"), "manifest.yaml", False),  # id: other_file_modified
         (
-            MagicMock(is_directory=False, src_path="manifest.yaml"),
+            FileModifiedEvent(src_path="manifest.yaml"),
             "other_manifest.yaml",
+            False,
         ),  # id: wrong_manifest_modified
-        (MagicMock(is_directory=False, src_path="manifest.yaml"), "manifest.yaml"),  # id: file_modified
+        (MagicMock(is_directory=False, src_path="manifest.yaml"), "manifest.yaml", False),  # id: not_a_modified_event
+        (FileModifiedEvent(src_path="manifest.yaml"), "manifest.yaml", True),  # id: file_modified
     ],
 )
-def test_on_modified(event, manifest_path):
+def test_on_modified(event, manifest_path, scheduled):
     # Arrange
     reloader = Reloader(manifest_path, False, ())
-    reloader.last_modified = datetime.now() - timedelta(seconds=2)
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        reloader.on_modified(event)
+    reloader.scheduler = MagicMock()
 
-        # Assert
-        if (
-            event.is_directory
-            or not str(event.src_path).endswith(manifest_path)
-            or not isinstance(event, FileModifiedEvent)
-        ):
-            mock_thread.assert_not_called()
+    # Act
+    reloader.on_modified(event)
+
+    # Assert
+    assert reloader.scheduler.request.called == scheduled
+
+
+def test_include_changes_schedule_reload(tmp_path):
+    # Arrange
+    manifest_path = tmp_path / "manifest.yaml"
+    include_path = tmp_path / "includes" / "base.yaml"
+    reloader = Reloader(str(manifest_path), False, ())
+    reloader.scheduler = MagicMock()
+
+    # Act & Assert
+    reloader.on_modified(FileModifiedEvent(src_path=str(include_path)))
+    reloader.scheduler.request.assert_not_called()
+
+    reloader.update_watches([str(include_path)])
+    reloader.on_modified(FileModifiedEvent(src_path=str(include_path)))
+    reloader.on_created(FileCreatedEvent(src_path=str(include_path)))
+    reloader.on_moved(FileMovedEvent(src_path=str(tmp_path / "base.yaml.swp"), dest_path=str(manifest_path)))
+    assert reloader.scheduler.request.call_count == 3
+
+
+def test_update_watches_follows_include_graph(tmp_path):
+    # Arrange
+    (tmp_path / "includes").mkdir()
+    (tmp_path / "other").mkdir()
+    reloader = Reloader(str(tmp_path / "manifest.yaml"), False, ())
+    reloader.observer = MagicMock()
+
+    # Act
+    reloader.update_watches([str(tmp_path / "includes" / "base.yaml"), str(tmp_path / "other" / "extra.yaml")])
+    reloader.update_watches([str(tmp_path / "includes" / "base.yaml"), str(tmp_path / "missing" / "extra.yaml")])
+
+    # Assert
+    scheduled = [call.kwargs["path"] for call in reloader.observer.schedule.call_args_list]
+    assert sorted(scheduled) == sorted([str(tmp_path), str(tmp_path / "includes"), str(tmp_path / "other")])
+    reloader.observer.unschedule.assert_called_once()
+    assert sorted(reloader.watches) == [str(tmp_path), str(tmp_path / "includes")]
+
+
+@patch("cliffy.reloader.Transformer")
+def test_run_reload_rewatches_includes_on_failure(MockTransformer, reloader):
+    # Arrange
+    MockTransformer.side_effect = SystemExit(1)
+    MockTransformer.get_include_paths.return_value = ["/includes/new.yaml"]
+
+    # Act
+    with patch("cliffy.reloader.open"), pytest.raises(SystemExit):
+        reloader.run_reload(time.monotonic(), lambda: False)
+
+    # Assert
+    assert "/includes/new.yaml" in reloader.watched_paths
 
 
 @pytest.fixture
@@ -98,17 +151,128 @@ def reloader():
     return Reloader("manifest.yaml", False, ())
 
 
-def test_on_modified_rapid_change(reloader):
+class RecordingReload:
+    """Reload callback recording each call and whether it was superseded by the time it finished"""
+
+    def __init__(self, duration: float = 0) -> None:
+        self.duration = duration
+        self.calls: list[bool] = []
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def __call__(self, requested_at, is_superseded):
+        self.started.set()
+        time.sleep(self.duration)
+        self.calls.append(is_superseded())
+        self.done.set()
+
+
+def wait_for_calls(reload: RecordingReload, count: int, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while len(reload.calls) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_scheduler_coalesces_rapid_requests():
+    # Arrange
+    reload = RecordingReload()
+    scheduler = ReloadScheduler(reload, delay=0.1)
+    scheduler.start()
+
+    # Act
+    for _ in range(5):
+        scheduler.request()
+        time.sleep(0.01)
+    wait_for_calls(reload, 1)
+    time.sleep(0.2)
+
+    # Assert
+    assert reload.calls == [False]
+    scheduler.stop()
+    assert not scheduler.worker.is_alive()
+
+
+def test_scheduler_trailing_edge_applies_last_request():
     # Arrange
-    event = MagicMock(is_directory=False, src_path=reloader.manifest_path)
-    reloader.last_modified = datetime.now()
+    reload = RecordingReload()
+    scheduler = ReloadScheduler(reload, delay=0.05)
+    scheduler.start()
 
-    with patch("threading.Thread") as mock_thread:
+    # Act
+    scheduler.request()
+    wait_for_calls(reload, 1)
+    scheduler.request()
+    wait_for_calls(reload, 2)
+    scheduler.stop()
+
+    # Assert
+    assert reload.calls == [False, False]
+
+
+def test_scheduler_supersedes_in_flight_reload():
+    # Arrange
+    reload = RecordingReload(duration=0.2)
+    scheduler = ReloadScheduler(reload, delay=0)
+    scheduler.start()
+
+    # Act
+    scheduler.request()
+    reload.started.wait(5)
+    # requests during a reload coalesce into one follow-up reload
+    scheduler.request()
+    scheduler.request()
+    wait_for_calls(reload, 2)
+    time.sleep(0.1)
+    scheduler.stop()
+
+    # Assert
+    assert reload.calls == [True, False]
+
+
+@patch("cliffy.reloader.out_err")
+def test_scheduler_survives_reload_errors(mock_out_err):
+    # Arrange
+    reload = MagicMock(side_effect=[Exception("bad manifest"), None])
+    scheduler = ReloadScheduler(reload, delay=0)
+    scheduler.start()
+
+    # Act
+    scheduler.request()
+    time.sleep(0.1)
+    scheduler.request()
+    time.sleep(0.1)
+    scheduler.stop()
+
+    # Assert
+    assert reload.call_count == 2
+    mock_out_err.assert_called_once_with("~ reload failed: bad manifest")
+
+
+@patch("cliffy.reloader.Loader.load_from_cli")
+@patch("cliffy.reloader.Transformer")
+@patch("cliffy.reloader.open")
+def test_reload_skips_superseded_changes(mock_open, MockTransformer, mock_load_from_cli):
+    # Act
+    reloaded = Reloader.reload("manifest.yaml", True, (), is_superseded=lambda: True)
+
+    # Assert
+    assert reloaded is None
+    MockTransformer.assert_called_once()
+    mock_load_from_cli.assert_not_called()
+
+
+@patch("cliffy.reloader.out")
+def test_run_reload_reports_latency(mock_out, reloader):
+    # Arrange
+    with patch.object(Reloader, "reload", return_value=MagicMock(include_paths=[])) as mock_reload:
         # Act
-        reloader.on_modified(event)
+        reloader.run_reload(time.monotonic() - 0.5, lambda: False)
 
-        # Assert
-        mock_thread.assert_not_called()
+    # Assert
+    mock_reload.assert_called_once()
+    message = mock_out.call_args.args[0]
+    assert message.startswith("⏱ reloaded in ")
+    assert int(message.split(", ")[1].split("ms")[0]) >= 500
 
 
 @patch("cliffy.reloader.Observer")
@@ -213,21 +377,6 @@ def test_watch_cleanup_on_multiple_interrupts(MockObserver):
         MockObserver.return_value.join.assert_called_once()
 
 
-def test_on_modified_thread_safety(reloader):
-    # Arrange
-    event = MagicMock(is_directory=False, src_path="manifest.yaml")
-    reloader.last_modified = datetime.now() - timedelta(seconds=0.1)
-
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        for _ in range(5):  # Simulate rapid consecutive modifications
-            reloader.on_modified(event)
-            time.sleep(0.01)
-
-        # Assert
-        assert mock_thread.call_count <= 1  # Should debounce multiple calls
-
-
 @pytest.mark.parametrize(
     "manifest_path",
     [
@@ -245,90 +394,206 @@ def test_reload_invalid_paths(mock_transformer, manifest_path):
     mock_transformer.assert_not_called()
 
 
-def test_thread_daemon_property(reloader):
+@patch("cliffy.reloader.out")
+@patch("cliffy.reloader.save_metadata")
+@patch("cliffy.reloader.Loader.load_from_cli")
+@patch("cliffy.reloader.cli_runner")
+@patch("cliffy.reloader.Transformer")
+@patch("cliffy.reloader.open")
+def test_reload_runs_cli_in_worker(
+    mock_open, MockTransformer, mock_cli_runner, mock_load_from_cli, mock_save_metadata, mock_out
+):
     # Arrange
-    event = FileModifiedEvent(src_path="manifest.yaml")
-    reloader.last_modified = datetime.now() - timedelta(seconds=2)
+    mock_open.return_value = io.StringIO("")
+    MockTransformer.return_value.cli.name = "test_cli"
+    MockTransformer.return_value.cli.code = "print('Hello')"
+    worker = MagicMock()
 
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        reloader.on_modified(event)
+    # Act
+    Reloader.reload("manifest.yaml", True, ("arg1",), worker=worker)
 
-        # Assert
-        mock_thread.assert_called_once()
-        args, kwargs = mock_thread.call_args
-        assert kwargs.get("target") == reloader.reload
-        assert kwargs.get("args") == (reloader.manifest_path, reloader.run_cli, reloader.run_cli_args)
-        mock_thread.return_value.daemon = True
-        mock_thread.return_value.start.assert_called_once()
+    # Assert
+    worker.run.assert_called_once_with("test_cli", "print('Hello')", ("arg1",))
+    mock_cli_runner.assert_not_called()
 
 
-def test_concurrent_modifications(reloader):
+@patch("cliffy.reloader.CLIWorker")
+@patch("cliffy.reloader.Observer")
+@patch("cliffy.reloader.time.sleep")
+def test_watch_manages_worker_when_running_cli(mock_sleep, MockObserver, MockCLIWorker):
     # Arrange
-    event = FileModifiedEvent(src_path="manifest.yaml")
-    reloader.last_modified = datetime.now() - timedelta(seconds=2)
+    mock_sleep.side_effect = KeyboardInterrupt
+    MockCLIWorker.is_supported.return_value = True
 
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        # Simulate concurrent modifications
-        reloader.on_modified(event)
-        reloader.on_modified(event)  # Should be ignored due to timing
+    # Act
+    Reloader.watch("manifest.yaml", True, ())
 
-        # Assert
-        mock_thread.assert_called_once()
+    # Assert
+    MockCLIWorker.return_value.start.assert_called_once()
+    MockCLIWorker.return_value.stop.assert_called_once()
+
+
+def write_manifest(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return str(path)
+
+
+def cli_manifest(name, includes=()):
+    manifest = f"manifestVersion: v3\nname: {name}\nversion: 0.1.0\ncommands:\n  hello: \"print('hello')\"\n"
+    if includes:
+        manifest += "includes:\n" + "".join(f"  - {path}\n" for path in includes)
+    return manifest
+
+
+def test_find_manifests(tmp_path):
+    # Arrange
+    first = write_manifest(tmp_path / "first.yaml", cli_manifest("first"))
+    second = write_manifest(tmp_path / "nested" / "second.yml", cli_manifest("second"))
+    write_manifest(tmp_path / "notes.txt", "not a manifest")
+
+    # Act & Assert
+    assert find_manifests(str(tmp_path)) == [first, second]
+    assert find_manifests(str(tmp_path / "**" / "*.yml")) == [second]
+    assert find_manifests(str(tmp_path / "missing" / "*.yaml")) == []
 
 
 @pytest.mark.parametrize(
-    "time_diff",
+    "target, root",
     [
-        timedelta(milliseconds=500),  # Less than 1 second
-        timedelta(milliseconds=999),  # Just under 1 second
-        timedelta(seconds=0),  # Immediate subsequent modification
+        ("clis/*.yaml", "clis"),
+        ("clis/**/*.yaml", "clis"),
+        ("*.yaml", "."),
+        ("clis/team-*/cli.yaml", "clis"),
     ],
 )
-def test_modification_throttling(reloader, time_diff):
+def test_get_watch_root(target, root):
+    assert get_watch_root(target) == root
+
+
+@patch("cliffy.reloader.out")
+@patch("cliffy.reloader.save_metadata")
+@patch("cliffy.reloader.Loader.load_from_cli")
+def test_multi_reloader_reloads_affected_clis(mock_load_from_cli, mock_save_metadata, mock_out, tmp_path):
     # Arrange
-    event = MagicMock(is_directory=False, src_path="manifest.yaml")
-    reloader.last_modified = datetime.now() - time_diff
+    include = write_manifest(tmp_path / "shared" / "common.yaml", "commands:\n  shared: \"print('shared')\"\n")
+    first = write_manifest(tmp_path / "first.yaml", cli_manifest("first", includes=[include]))
+    write_manifest(tmp_path / "second.yaml", cli_manifest("second"))
+    reloader = MultiReloader(str(tmp_path))
 
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        reloader.on_modified(event)
+    # Act
+    reloader.on_change(include)
+    reloader.on_change(str(tmp_path / "notes.txt"))
+    reloader.run_reload(time.monotonic(), lambda: False)
 
-        # Assert
-        mock_thread.assert_not_called()
+    # Assert
+    # the include isn't reloaded as a CLI of its own
+    assert sorted(reloader.manifests) == sorted([first, str(tmp_path / "second.yaml")])
+    assert [call.args[0].name for call in mock_load_from_cli.call_args_list] == ["first"]
+    assert mock_out.call_args.args[0].startswith("⏱ reloaded first in ")
+
+
+@patch("cliffy.reloader.out")
+@patch("cliffy.reloader.out_err")
+@patch("cliffy.reloader.save_metadata")
+@patch("cliffy.reloader.Loader.load_from_cli")
+def test_multi_reloader_batches_changes_into_one_status_line(
+    mock_load_from_cli, mock_save_metadata, mock_out_err, mock_out, tmp_path
+):
+    # Arrange
+    paths = [write_manifest(tmp_path / f"cli{i}.yaml", cli_manifest(f"cli{i}")) for i in range(4)]
+    broken = write_manifest(tmp_path / "broken.yaml", "name: [unclosed\n")
+    reloader = MultiReloader(str(tmp_path / "*.yaml"))
+
+    # Act
+    for path in [*paths, broken]:
+        reloader.on_change(path)
+    with patch("cliffy.transformer.exit_err", side_effect=SystemExit(1)):
+        reloader.run_reload(time.monotonic(), lambda: False)
+
+    # Assert
+    assert sorted(call.args[0].name for call in mock_load_from_cli.call_args_list) == [f"cli{i}" for i in range(4)]
+    mock_out.assert_called_once()
+    status = mock_out.call_args.args[0]
+    assert status.startswith("⏱ reloaded cli0, cli1, cli2, cli3 in ")
+    assert status.endswith(f"; 1 failed: {broken}")
 
 
-def test_thread_exception_handling(reloader):
+@patch("cliffy.reloader.out")
+@patch("cliffy.reloader.save_metadata")
+@patch("cliffy.reloader.Loader.load_from_cli")
+def test_multi_reloader_requeues_superseded_reloads(mock_load_from_cli, mock_save_metadata, mock_out, tmp_path):
     # Arrange
-    event = FileModifiedEvent(src_path="manifest.yaml")
-    reloader.last_modified = datetime.now() - timedelta(seconds=2)
+    path = write_manifest(tmp_path / "first.yaml", cli_manifest("first"))
+    reloader = MultiReloader(str(tmp_path))
+    reloader.scheduler = MagicMock()
+    reloader.on_change(path)
 
-    with patch("threading.Thread") as mock_thread:
-        mock_thread.return_value.start.side_effect = RuntimeError("Thread error")
+    # Act
+    reloader.run_reload(time.monotonic(), lambda: True)
 
-        # Act & Assert
-        reloader.on_modified(event)  # Should not raise exception
-        mock_thread.assert_called_once()
+    # Assert
+    mock_load_from_cli.assert_not_called()
+    mock_out.assert_not_called()
+    assert reloader.changed_paths == {os.path.realpath(path)}
 
 
-def test_multiple_thread_creation(reloader):
+@patch("cliffy.reloader.out")
+@patch("cliffy.reloader.save_metadata")
+@patch("cliffy.reloader.Loader.load_from_cli")
+def test_multi_reloader_picks_up_new_manifests(mock_load_from_cli, mock_save_metadata, mock_out, tmp_path):
     # Arrange
-    event = FileModifiedEvent(src_path="manifest.yaml")
+    write_manifest(tmp_path / "first.yaml", cli_manifest("first"))
+    reloader = MultiReloader(str(tmp_path))
+    reloader.scheduler = MagicMock()
 
-    with patch("threading.Thread") as mock_thread:
-        # Act
-        # First modification
-        reloader.last_modified = datetime.now() - timedelta(seconds=2)
-        reloader.on_modified(event)
+    # Act
+    added = write_manifest(tmp_path / "nested" / "added.yaml", cli_manifest("added"))
+    reloader.on_change(added)
+    reloader.run_reload(time.monotonic(), lambda: False)
 
-        # Second modification after delay
-        reloader.last_modified = datetime.now() - timedelta(seconds=2)
-        reloader.on_modified(event)
+    # Assert
+    reloader.scheduler.request.assert_called_once()
+    assert [call.args[0].name for call in mock_load_from_cli.call_args_list] == ["added"]
+    assert added in reloader.manifests
 
-        # Assert
-        assert mock_thread.call_count == 2
-        for call in mock_thread.call_args_list:
-            args, kwargs = call
-            assert kwargs.get("target") == reloader.reload
-            assert kwargs.get("args") == (reloader.manifest_path, reloader.run_cli, reloader.run_cli_args)
+
+@patch("cliffy.reloader.Observer")
+def test_multi_reloader_watch_uses_one_recursive_watch(MockObserver, tmp_path):
+    # Arrange
+    include = write_manifest(tmp_path / "outside" / "common.yaml", "commands: {}\n")
+    write_manifest(tmp_path / "clis" / "first.yaml", cli_manifest("first", includes=[include]))
+    write_manifest(tmp_path / "clis" / "second.yaml", cli_manifest("second", includes=[include]))
+
+    # Act
+    with patch("time.sleep", MagicMock(side_effect=KeyboardInterrupt)):
+        MultiReloader.watch(str(tmp_path / "clis"))
+
+    # Assert
+    scheduled = [
+        (call.kwargs["path"], call.kwargs["recursive"]) for call in MockObserver.return_value.schedule.call_args_list
+    ]
+    assert scheduled == [(str(tmp_path / "clis"), True), (str(tmp_path / "outside"), False)]
+    MockObserver.return_value.start.assert_called_once()
+
+
+def test_test_watcher_reruns_tests_and_watches_all_manifests(tmp_path):
+    # Arrange
+    include = write_manifest(tmp_path / "includes" / "common.yaml", "commands: {}\n")
+    first = write_manifest(tmp_path / "first.yaml", cli_manifest("first", includes=[include]))
+    second = write_manifest(tmp_path / "second.yaml", cli_manifest("second"))
+    run_tests = MagicMock(side_effect=SystemExit(1))
+    watcher = ManifestTestWatcher([first, second], run_tests)
+
+    # Act
+    with pytest.raises(SystemExit):
+        watcher.run_reload(time.monotonic(), lambda: False)
+
+    # Assert
+    run_tests.assert_called_once()
+    assert watcher.watched_paths == {first, second, include}
+
+
+def test_change_handler_requires_on_change():
+    with pytest.raises(TypeError):
+        ChangeHandler()  # type: ignore[abstract]
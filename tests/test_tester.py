@@ -0,0 +1,266 @@
+import json
+import os
+from xml.etree import ElementTree
+
+import pytest
+from click.testing import CliRunner
+
+from cliffy.cli import cli
+from cliffy import tester as cliffy_tester
+
+MANIFEST = """
+manifestVersion: v3
+name: tested
+version: 0.1.0
+commands:
+  echo: |
+    print("echo")
+  append: |
+    with open("log.txt", "a") as log:
+        log.write("appended\\n")
+  crash: |
+    import os
+    os._exit(3)
+tests:
+  - echo: assert result.output == "echo\\n"
+  - append: assert result.exit_code == 0
+    echo: assert open("log.txt").read() == "appended\\n"
+  - $ echo setup >> log.txt
+  - echo: assert open("log.txt").read() == "appended\\nsetup\\n"
+  - echo: assert result.output == "wrong"
+"""
+
+
+@pytest.fixture
+def tester(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tested.yaml").write_text(MANIFEST)
+    return cliffy_tester.Tester("tested.yaml")
+
+
+def test_tester_groups_cases_between_shell_scripts(tester):
+    # Assert
+    assert tester.total_cases == 5
+    assert [
+        step.command if not isinstance(step, list) else [case.number for case in step] for step in tester.test_steps
+    ] == [
+        [1],
+        [2, 3],
+        "$ echo setup >> log.txt",
+        [4],
+        [5],
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_run_tests_respects_ordering(tester, jobs):
+    # Act
+    results = list(tester.run_tests(jobs=jobs))
+
+    # Assert
+    assert [result.number for result in results] == [1, 2, 3, 4, 5]
+    assert [result.passed for result in results] == [True, True, True, True, False]
+    assert results[-1].failure == 'AssertionError: (line 1) > assert result.output == "wrong"'
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="parallel tests fork")
+def test_run_tests_isolates_crashing_cases(tester):
+    # Arrange
+    crash = cliffy_tester.TestCase(command="crash", assert_script="assert True", number=6)
+    tester.test_steps = [[crash], [cliffy_tester.TestCase(command="echo", assert_script="assert True", number=7)]]
+
+    # Act
+    results = list(tester.run_tests(jobs=2))
+
+    # Assert
+    assert [result.passed for result in results] == [False, True]
+    assert results[0].failure == "Exception"
+    assert "exited with code 3" in results[0].traceback
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="parallel tests fork")
+def test_test_command_runs_multiple_manifests_in_parallel(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+    first_tests = 'tests:\n  - echo: assert result.output == "echo\\n"\n'
+    (tmp_path / "first.yaml").write_text(
+        MANIFEST.replace("name: tested", "name: first").split("tests:")[0] + first_tests
+    )
+    (tmp_path / "second.yaml").write_text(MANIFEST)
+
+    # Act
+    result = CliRunner().invoke(cli, ["test", "first.yaml", "second.yaml", "-n", "3"])
+
+    # Assert
+    assert result.exit_code == 0
+    assert "Invoking first.yaml tests" in result.output
+    assert "Invoking second.yaml tests" in result.output
+    assert result.output.count("✅") == 5
+    assert "Some tests failed" in result.output
+
+
+def test_function_fingerprints_follow_dependencies():
+    # Arrange
+    code = """
+import re
+PATTERN = "a+"
+
+def helper():
+    return re.compile(PATTERN)
+
+def uses_helper():
+    return helper()
+
+def standalone():
+    return 1
+
+app.command("uses-helper")(uses_helper)
+"""
+
+    # Act
+    fingerprints = cliffy_tester.get_function_fingerprints(code)
+    reformatted = cliffy_tester.get_function_fingerprints("\n\n" + code.replace("return 1", "return  1"))
+    changed_var = cliffy_tester.get_function_fingerprints(code.replace('"a+"', '"b+"'))
+    changed_registration = cliffy_tester.get_function_fingerprints(code.replace('"uses-helper"', '"use"'))
+
+    # Assert
+    assert fingerprints == reformatted
+    assert changed_var["uses_helper"] != fingerprints["uses_helper"]
+    assert changed_var["helper"] != fingerprints["helper"]
+    assert changed_var["standalone"] == fingerprints["standalone"]
+    assert changed_registration["uses_helper"] != fingerprints["uses_helper"]
+    assert changed_registration["helper"] == fingerprints["helper"]
+
+
+def test_resolve_command_func_follows_groups_and_aliases(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "grouped.yaml").write_text(
+        """
+manifestVersion: v3
+name: grouped
+version: 0.1.0
+commands:
+  home: 
+    help: Manage homes
+  home.build|bu: print("build")
+  status-check: print("ok")
+"""
+    )
+    tester = cliffy_tester.Tester("grouped.yaml")
+
+    # Act & Assert
+    assert tester.resolve_command_func("home build 'my home'") == "home_build"
+    assert tester.resolve_command_func("home bu test") == "home_build"
+    assert tester.resolve_command_func("status-check --verbose") == "status_check"
+    assert tester.resolve_command_func("--help") is None
+    assert tester.resolve_command_func("home 'unclosed") is None
+
+
+def test_select_changed_cases_skips_unchanged_passing_cases(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cliffy_tester, "TEST_FINGERPRINTS_DIR", str(tmp_path / "fingerprints"))
+    manifest = """
+manifestVersion: v3
+name: changing
+version: 0.1.0
+commands:
+  first: print("first")
+  second: print("second")
+tests:
+  - first: assert result.output == "first\\n"
+  - second: assert result.output == "second\\n"
+  - first --help: assert result.exit_code == 0
+"""
+    (tmp_path / "changing.yaml").write_text(manifest)
+    tester = cliffy_tester.Tester("changing.yaml")
+    tester.record_results(list(tester.run_tests()))
+
+    # Act
+    unchanged = cliffy_tester.Tester("changing.yaml")
+    unchanged_count = unchanged.select_changed_cases()
+    (tmp_path / "changing.yaml").write_text(manifest.replace('print("second")', 'print("2nd")'))
+    changed = cliffy_tester.Tester("changing.yaml")
+    changed_count = changed.select_changed_cases()
+    changed.record_results(list(changed.run_tests()))
+    failing = cliffy_tester.Tester("changing.yaml")
+
+    # Assert
+    assert unchanged_count == 0
+    assert unchanged.test_steps == []
+    assert changed_count == 1
+    assert [case.command for step in changed.test_steps for case in step] == ["second"]
+    # the failed case keeps running until it passes
+    assert failing.select_changed_cases() == 1
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_tests_times_cases_and_shell_scripts(tester, jobs):
+    # Act
+    results = list(tester.run_tests(jobs=jobs))
+
+    # Assert
+    assert all(result.timing.wall > 0 for result in results)
+    assert all(result.timing.cpu >= 0 and result.timing.children >= 0 for result in results)
+    assert [shell.command for shell in tester.shell_results] == ["$ echo setup >> log.txt"]
+    assert tester.shell_results[0].timing.wall > 0
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_tests_fails_cases_past_the_timeout(tmp_path, monkeypatch, jobs):
+    # Arrange
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "slow.yaml").write_text(
+        MANIFEST.replace("name: tested", "name: slow").split("tests:")[0]
+        + "  sleep: |\n    import time\n    time.sleep(10)\n"
+        + 'tests:\n  - sleep: assert True\n  - echo: assert result.output == "echo\\n"\n'
+    )
+    tester = cliffy_tester.Tester("slow.yaml")
+
+    # Act
+    results = list(tester.run_tests(jobs=jobs, timeout=0.5))
+
+    # Assert
+    assert [result.passed for result in results] == [False, True]
+    assert results[0].failure == "Timeout: still running after 0.5s"
+    assert results[0].timing.wall < 5
+
+
+def test_test_command_writes_reports_and_durations(tester, tmp_path):
+    # Act
+    result = CliRunner().invoke(
+        cli,
+        ["test", "tested.yaml", "--durations", "2", "--junit-xml", "junit.xml", "--json-report", "report.json"],
+    )
+
+    # Assert
+    assert "2 slowest test steps" in result.output
+    junit = ElementTree.parse(tmp_path / "junit.xml").getroot()
+    suite = junit.find("testsuite")
+    assert suite.get("name") == "tested"
+    assert suite.get("tests") == "6"
+    assert suite.get("failures") == "1"
+    assert [case.get("name") for case in suite.iter("testcase")][-1] == "echo"
+    assert suite.findall("testcase")[-1].find("failure") is not None
+    report = json.loads((tmp_path / "report.json").read_text())
+    results = report["manifests"][0]["results"]
+    assert [case["passed"] for case in results] == [True, True, True, True, False]
+    assert all(case["timing"]["wall"] > 0 for case in results)
+
+
+def test_test_command_skips_manifests_without_tests(tester, tmp_path):
+    # Arrange
+    (tmp_path / "untested.yaml").write_text(MANIFEST.replace("name: tested", "name: untested").split("tests:")[0])
+
+    # Act
+    result = CliRunner().invoke(cli, ["test", "untested.yaml", "tested.yaml", "--json-report", "report.json"])
+    only_untested = CliRunner().invoke(cli, ["test", "untested.yaml", "untested.yaml"])
+
+    # Assert
+    assert "Missing tests section in untested.yaml, skipped" in result.output
+    assert "Invoking tested.yaml tests" in result.output
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert [manifest["cli_name"] for manifest in report["manifests"]] == ["tested"]
+    assert only_untested.exit_code == 1
+    assert "Missing tests section in every manifest" in only_untested.output
@@ -70,3 +70,58 @@ def test_resolve_includes():
                 assert transformer.includes_config["name"] == "include-cli"
                 assert transformer.includes_config["version"] == "1.0.0"
                 assert "test-command" in transformer.manifest.commands
+
+
+def write_manifest(path, manifest, mtime_offset=0):
+    path.write_text(yaml.dump(manifest))
+    # make sure rewrites within the filesystem's timestamp resolution still change the mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+    return str(path)
+
+
+def test_include_cache_reresolves_only_changed_includes(tmp_path, mocker):
+    # Arrange
+    nested = write_manifest(tmp_path / "nested.yaml", {"commands": {"nested": "print('nested')"}})
+    first = write_manifest(tmp_path / "first.yaml", {"includes": [nested], "commands": {"first": "print('first')"}})
+    second = write_manifest(tmp_path / "second.yaml", {"commands": {"second": "print('second')"}})
+    main = write_manifest(
+        tmp_path / "main.yaml", {"name": "main-cli", "version": "0.1.0", "includes": [first, second], "commands": {}}
+    )
+    include_cache: dict = {}
+    resolve_spy = mocker.spy(Transformer, "resolve_include_by_path")
+
+    def transform():
+        resolve_spy.reset_mock()
+        with open(main) as f:
+            return Transformer(f, validate_requires=False, include_cache=include_cache)
+
+    # Act & Assert
+    assert transform().include_paths == [first, nested, second]
+    assert resolve_spy.call_count == 3
+
+    T = transform()
+    assert resolve_spy.call_count == 0
+    assert set(T.manifest.commands) == {"first", "nested", "second"}
+
+    write_manifest(tmp_path / "second.yaml", {"commands": {"second-changed": "print('changed')"}}, mtime_offset=10**9)
+    T = transform()
+    assert [call.args[0] for call in resolve_spy.call_args_list] == [second]
+    assert set(T.manifest.commands) == {"first", "nested", "second-changed"}
+
+    # a changed nested include invalidates the includes above it
+    write_manifest(tmp_path / "nested.yaml", {"commands": {"nested-changed": "print('changed')"}}, mtime_offset=10**9)
+    T = transform()
+    assert [call.args[0] for call in resolve_spy.call_args_list] == [first, nested]
+    assert set(T.manifest.commands) == {"first", "nested-changed", "second-changed"}
+
+
+def test_get_include_paths(tmp_path):
+    # Arrange
+    missing = str(tmp_path / "missing.yaml")
+    first = write_manifest(tmp_path / "first.yaml", {"includes": [str(tmp_path / "main.yaml"), missing]})
+    main = write_manifest(tmp_path / "main.yaml", {"name": "main-cli", "includes": [first]})
+
+    # Act & Assert
+    # cycles end and missing includes are still listed, so creating them can trigger a reload
+    assert Transformer.get_include_paths(main) == [first, main, missing]
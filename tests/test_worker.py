@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+
+from cliffy.worker import CLIWorker
+
+pytestmark = pytest.mark.skipif(not CLIWorker.is_supported(), reason="the worker forks")
+
+CLI_CODE = """
+import sys
+
+def cli():
+    print("args:", *sys.argv[1:], flush=True)
+    return int(sys.argv[1]) if sys.argv[1:] else 0
+"""
+
+SLOW_CLI_CODE = """
+import time
+
+def cli():
+    print("started", flush=True)
+    time.sleep(30)
+    print("finished", flush=True)
+"""
+
+
+@pytest.fixture
+def worker():
+    # started by the first run, so it inherits the stdio captured by capfd
+    worker = CLIWorker()
+    yield worker
+    worker.stop()
+
+
+def test_worker_runs_cli(worker, capfd):
+    # Act
+    worker.run("hello", CLI_CODE, ("0", "world"))
+
+    # Assert
+    assert worker.exit_codes.get(timeout=30) == 0
+    assert "args: 0 world" in capfd.readouterr().out
+
+
+def test_worker_reports_exit_codes(worker, capfd):
+    # Act
+    worker.run("hello", CLI_CODE, ("3",))
+
+    # Assert
+    assert worker.exit_codes.get(timeout=30) == 3
+    assert "hello exited with 3" in capfd.readouterr().err
+
+
+def test_worker_survives_crashing_cli(worker, capfd):
+    # Arrange
+    worker.run("crash", "import os\ndef cli():\n    os._exit(7)\n", ())
+    assert worker.exit_codes.get(timeout=30) == 7
+
+    # Act
+    worker.run("hello", CLI_CODE, ("0", "again"))
+
+    # Assert
+    assert worker.exit_codes.get(timeout=30) == 0
+    assert worker.is_alive()
+    assert "args: 0 again" in capfd.readouterr().out
+
+
+def test_worker_reports_broken_code(worker, capfd):
+    # Act
+    worker.run("broken", "raise ValueError('broken cli')\n", ())
+
+    # Assert
+    assert worker.exit_codes.get(timeout=30) == 1
+    assert "broken cli" in capfd.readouterr().err
+
+
+def test_worker_stops_superseded_run(worker, capfd):
+    # Arrange
+    worker.run("slow", SLOW_CLI_CODE, ())
+    deadline = time.monotonic() + 30
+    while "started" not in capfd.readouterr().out and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Act
+    worker.run("hello", CLI_CODE, ("0",))
+
+    # Assert
+    # the superseded run isn't reported
+    assert worker.exit_codes.get(timeout=30) == 0
+    assert worker.exit_codes.empty()
+    assert "finished" not in capfd.readouterr().out
+
+
+def test_worker_restarts_after_dying(worker):
+    # Arrange
+    worker.start()
+    os.kill(worker.process.pid, 9)
+    worker.process.wait()
+
+    # Act
+    worker.run("hello", CLI_CODE, ("0",))
+
+    # Assert
+    assert worker.exit_codes.get(timeout=30) == 0